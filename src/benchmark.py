@@ -0,0 +1,258 @@
+"""
+Benchmarks FaceFolio's detection pipeline on a folder or zip of event photos.
+
+Usage:
+    python src/benchmark.py path/to/photos.zip --policies adaptive fixed --json results.json
+    python src/benchmark.py photos.zip --presets fast balanced accurate --references refs.zip --truth sorted/
+    python src/benchmark.py --index jobs/<job id>/face_index.npz --quantizations float16 int8 pq
+    python src/benchmark.py photos.zip --presets --workers 1 2 4 8 auto
+
+With --references and --truth (a verified sorted output: one folder per person, as
+FaceFolio produces it), every preset is also scored on how well it sorts the photos.
+With --index, a run's face index is stored at each quantization and searched with a
+sample of its own faces; the matches are compared with those of the exact vectors.
+With --workers, the detect and encode stage is timed with each worker setting, and
+automatic sizing is compared with the fastest manual setting.
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+import core
+from face_index import FaceIndex, QUANTIZATIONS
+
+# Faces of the index used as probes when comparing quantizations.
+QUANTIZATION_PROBES = 200
+# Automatic worker sizing should be at most this much slower than the fastest manual setting.
+AUTO_WORKERS_TOLERANCE = 0.05
+
+def benchmark_detection_policy(image_paths, policy_name):
+    """Runs detection only (decode + locate) over the images with one policy and times it."""
+    policy = core.DetectionPolicy(policy_name)
+    burst_tracker = core.BurstTracker()
+    faces = 0
+    images_with_faces = 0
+
+    start = time.perf_counter()
+    for image_path in burst_tracker.order(image_paths):
+        try:
+            with Image.open(image_path) as image:
+                max_dimension, upsample = policy.plan(image.size)
+            image_data, _ = core.load_detection_image(image_path, max_dimension)
+            locations = policy.detect(image_path, image_data, upsample, burst_tracker)
+        except Exception as e:
+            print(f"  > Error processing {image_path.name}: {e}")
+            continue
+        faces += len(locations)
+        images_with_faces += bool(locations)
+    seconds = time.perf_counter() - start
+
+    result = policy.stats()
+    result.update({'seconds': round(seconds, 3),
+                   'images_per_second': round(len(image_paths) / seconds, 3) if seconds else None,
+                   'faces': faces, 'images_with_faces': images_with_faces})
+    return result
+
+def load_truth(truth_dir):
+    """Reads a verified sorted output (one folder per person) into {image file name: set of people}."""
+    truth = {}
+    for person_dir in sorted(Path(truth_dir).iterdir()):
+        if person_dir.is_dir():
+            for path in person_dir.iterdir():
+                if path.suffix.lower() in core.IMAGE_EXTENSIONS:
+                    truth.setdefault(path.name, set()).add(person_dir.name)
+    return truth
+
+def score_sorting(predicted, truth):
+    """Precision, recall and F1 over (image, person) pairs."""
+    predicted_pairs = {(image, person) for image, people in predicted.items() for person in people}
+    true_pairs = {(image, person) for image, people in truth.items() if image in predicted for person in people}
+    hits = len(predicted_pairs & true_pairs)
+    precision = hits / len(predicted_pairs) if predicted_pairs else 1.0
+    recall = hits / len(true_pairs) if true_pairs else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {'precision': round(precision, 4), 'recall': round(recall, 4), 'f1': round(f1, 4)}
+
+def benchmark_preset(image_paths, preset_name, job, reference_dir=None, truth=None):
+    """
+    Runs the full detect and encode stage with one speed/quality preset and times it.
+    With reference photos and a ground truth, the photos are also sorted and scored.
+    """
+    known_encodings, known_names = core.load_reference_encodings(reference_dir, preset_name) if reference_dir else ([], [])
+    predicted = {}
+    faces = 0
+
+    start = time.perf_counter()
+    for image_path, _, face_encodings, face_matches in core.iter_image_faces(lambda *args: None, image_paths, job=job,
+                                                                            preset=preset_name):
+        faces += len(face_encodings)
+        if known_encodings:
+            predicted[image_path.name] = set(core.match_reference_names(face_encodings, face_matches,
+                                                                        known_encodings, known_names))
+    seconds = time.perf_counter() - start
+
+    result = {'preset': preset_name, **core.PRESETS[preset_name], 'images': len(image_paths),
+              'seconds': round(seconds, 3), 'faces': faces,
+              'images_per_second': round(len(image_paths) / seconds, 3) if seconds else None,
+              'faces_per_second': round(faces / seconds, 3) if seconds else None}
+    if known_encodings and truth is not None:
+        result.update(score_sorting(predicted, truth))
+    return result
+
+def benchmark_workers(image_paths, settings, job):
+    """
+    Runs the full detect and encode stage once per worker setting (a number or 'auto') and times
+    it. The auto row also gets 'vs_best_manual': how much slower it was than the fastest manual setting.
+    """
+    # The main process loads the models once up front, so the first setting isn't charged for it.
+    core.load_recognition_models()
+    results = []
+    for setting in settings:
+        resources = core.plan_resources(setting, len(image_paths))
+        faces = 0
+        start = time.perf_counter()
+        for _, _, face_encodings, _ in core.iter_image_faces(lambda *args: None, image_paths, job=job, workers=setting):
+            faces += len(face_encodings)
+        seconds = time.perf_counter() - start
+        results.append({'setting': str(setting), **resources.stats(), 'seconds': round(seconds, 3), 'faces': faces,
+                        'images_per_second': round(len(image_paths) / seconds, 3) if seconds else None})
+
+    manual = [result for result in results if result['mode'] == 'manual']
+    if manual:
+        best = min(manual, key=lambda result: result['seconds'])
+        for result in results:
+            if result['mode'] == 'auto' and best['seconds']:
+                result['vs_best_manual'] = round(result['seconds'] / best['seconds'] - 1, 4)
+                if result['vs_best_manual'] > AUTO_WORKERS_TOLERANCE:
+                    print(f"  > Automatic sizing ({result['workers']} workers) was {result['vs_best_manual']:.1%} "
+                          f"slower than the best manual setting ({best['setting']} workers).")
+    return results
+
+def benchmark_quantization(index, quantization, probes, exact_results, top_k):
+    """
+    Stores the index at one quantization and searches it with every probe. Recall is the share of
+    the images the exact search matched that the quantized search returns too.
+    """
+    with tempfile.TemporaryDirectory() as work_dir:
+        index_path = Path(work_dir) / "face_index.npz"
+        index.quantized(quantization).save(index_path)
+        quantized = FaceIndex.load(index_path)
+
+        start = time.perf_counter()
+        results = [quantized.search(probe, top_k) for probe in probes]
+        seconds = time.perf_counter() - start
+
+    found = sum(len({r['image'] for r in result} & {r['image'] for r in exact})
+                for result, exact in zip(results, exact_results))
+    expected = sum(len(exact) for exact in exact_results)
+    return {'quantization': quantization, 'faces': len(quantized),
+            'bytes_per_face': round(quantized.bytes_per_face, 1),
+            'memory_reduction': round(index.bytes_per_face / quantized.bytes_per_face, 1) if len(quantized) else None,
+            'search_ms': round(seconds * 1000 / len(probes), 3) if probes else None,
+            'recall': round(found / expected, 4) if expected else 1.0}
+
+def benchmark_quantizations(index_path, quantizations, top_k=core.DEFAULT_TOP_K):
+    """Compares quantized storage of a face index with its exact vectors."""
+    index = FaceIndex.load(index_path).quantized('float32')
+    sample = np.random.default_rng(0).permutation(len(index))[:QUANTIZATION_PROBES]
+    probes = [np.asarray(index.encodings[i]) for i in sample]
+    exact_results = [index.search(probe, top_k) for probe in probes]
+    print(f"--- Benchmarking quantizations on {len(index)} faces with {len(probes)} probes ---")
+    return [benchmark_quantization(index, quantization, probes, exact_results, top_k) for quantization in quantizations]
+
+def print_table(results, columns):
+    """Prints a list of result dicts as a plain text table."""
+    widths = [max(len(column), *(len(str(result.get(column))) for result in results)) for column in columns]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for result in results:
+        print("  ".join(str(result.get(column)).ljust(width) for column, width in zip(columns, widths)))
+
+def benchmark_source(args):
+    """
+    Runs the detection policy, preset and worker benchmarks on the event photos. Returns the three
+    result lists, or None without images.
+    """
+    with tempfile.TemporaryDirectory() as work_dir:
+        image_paths = core.collect_images(args.source, Path(work_dir))
+        if not image_paths:
+            print("No images found.")
+            return None
+
+        print(f"--- Benchmarking detection on {len(image_paths)} images ---")
+        results = [benchmark_detection_policy(image_paths, name) for name in args.policies]
+
+        job = core.JobContext(Path(work_dir) / "job")
+        preset_results = []
+        if args.presets:
+            reference_dir = None
+            if args.references:
+                job.extracted_references_dir.mkdir(parents=True)
+                reference_dir = core.prepare_references(args.references, job)
+            truth = load_truth(args.truth) if args.truth else None
+            print(f"--- Benchmarking presets on {len(image_paths)} images ---")
+            preset_results = [benchmark_preset(image_paths, name, job, reference_dir, truth) for name in args.presets]
+
+        worker_results = []
+        if args.workers:
+            print(f"--- Benchmarking worker settings on {len(image_paths)} images ---")
+            worker_results = benchmark_workers(image_paths, args.workers, job)
+    return results, preset_results, worker_results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark FaceFolio's face detection pipeline.")
+    parser.add_argument('source', nargs='?', help="Folder or .zip of event photos.")
+    parser.add_argument('--policies', nargs='+', default=core.DETECTION_POLICIES, choices=core.DETECTION_POLICIES,
+                        help="Detection policies to compare.")
+    parser.add_argument('--presets', nargs='*', default=list(core.PRESETS), choices=list(core.PRESETS),
+                        help="Speed/quality presets to compare (pass none to skip).")
+    parser.add_argument('--references', help="Reference photos (.zip or folder) for scoring the presets.")
+    parser.add_argument('--truth', help="Verified sorted output (one folder per person) to score the presets against.")
+    parser.add_argument('--workers', nargs='*', default=[], type=core.parse_workers,
+                        help="Worker settings to compare, e.g. 1 2 4 auto.")
+    parser.add_argument('--index', help="Face index (.npz) of a run, to compare quantizations on.")
+    parser.add_argument('--quantizations', nargs='+', default=QUANTIZATIONS[1:], choices=QUANTIZATIONS,
+                        help="Quantizations to compare with the exact vectors of --index.")
+    parser.add_argument('--json', dest='json_path', help="Also write the results to this JSON file.")
+    args = parser.parse_args(argv)
+    if bool(args.references) != bool(args.truth):
+        parser.error("--references and --truth are only used together.")
+    if not args.source and not args.index:
+        parser.error("Give event photos, a face index (--index), or both.")
+
+    quantization_results = benchmark_quantizations(args.index, args.quantizations) if args.index else []
+    results, preset_results, worker_results = [], [], []
+    if args.source:
+        source_results = benchmark_source(args)
+        if source_results is None:
+            return 1
+        results, preset_results, worker_results = source_results
+
+    if results:
+        print_table(results, ['policy', 'images', 'seconds', 'images_per_second', 'faces', 'images_with_faces',
+                              'mean_working_megapixels', 'retries', 'retry_hits'])
+    if preset_results:
+        print()
+        print_table(preset_results, ['preset', 'detector', 'landmarks', 'jitters', 'resolution', 'seconds',
+                                     'images_per_second', 'faces', 'faces_per_second', 'precision', 'recall', 'f1'])
+    if worker_results:
+        print()
+        print_table(worker_results, ['setting', 'workers', 'threads_per_worker', 'cores', 'memory_mb', 'seconds',
+                                     'images_per_second', 'faces', 'vs_best_manual'])
+    if quantization_results:
+        print()
+        print_table(quantization_results, ['quantization', 'faces', 'bytes_per_face', 'memory_reduction',
+                                           'search_ms', 'recall'])
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump({'detection_policies': results, 'presets': preset_results, 'workers': worker_results,
+                       'quantizations': quantization_results}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
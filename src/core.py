@@ -1,45 +1,258 @@
-import face_recognition
 from PIL import Image
+import numpy as np
+import copy
+import heapq
+import json
+import multiprocessing
+import os
 import shutil
+import threading
+import time
+import uuid
 import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
 from pathlib import Path
 
+from face_index import FaceIndex, DEFAULT_QUANTIZATION, DEFAULT_TOP_K, exact_vectors_path, image_root
+from face_store import FaceStore, DEFAULT_TOLERANCE, NEIGHBOUR_DISTANCE_CAP
+from portrait_pack import PortraitPack
+from shared_encodings import SharedEncodingMatrix, SharedEncodingReader
+from zip_append import append_entries
+
+# --- Recognition Models ---
+
+class _NotLoaded:
+    """Stands in for face_recognition until first use, so importing core stays cheap."""
+
+    def __getattr__(self, name):
+        return getattr(load_recognition_models(), name)
+
+# Importing face_recognition loads dlib and every model file, which takes seconds. It is
+# deferred until the first detection (or an explicit load_recognition_models() call).
+face_recognition = _NotLoaded()
+_models_lock = threading.Lock()
+
+def load_recognition_models():
+    """Imports face_recognition, which loads dlib's models, unless that already happened. Returns the module."""
+    global face_recognition
+    with _models_lock:
+        if isinstance(face_recognition, _NotLoaded):
+            start = time.perf_counter()
+            import face_recognition as module
+            face_recognition = module
+            print(f"--- Face recognition models loaded in {time.perf_counter() - start:.2f}s ---")
+    return face_recognition
+
+# --- Speed/Quality Presets ---
+
+# detector:   face_recognition's 'hog' detector, or the far slower but more robust 'cnn' one (on CPU).
+# landmarks:  the 'small' (5-point) or 'large' (68-point) landmark model used to align faces for encoding.
+# jitters:    how many randomly distorted copies of each face are encoded and averaged.
+# resolution: scales the detection resolution; below 1.0 the smallest faces may be missed.
+# burst_reuse: search burst frames only around the previous frame's faces (see BurstTracker).
+PRESETS = {
+    'fast':     {'detector': 'hog', 'landmarks': 'small', 'jitters': 1, 'resolution': 0.75, 'burst_reuse': True},
+    'balanced': {'detector': 'hog', 'landmarks': 'small', 'jitters': 1, 'resolution': 1.0, 'burst_reuse': True},
+    'accurate': {'detector': 'cnn', 'landmarks': 'large', 'jitters': 3, 'resolution': 1.0, 'burst_reuse': False},
+}
+# 'balanced' keeps face_recognition's own model defaults, but its results differ from v1.0.0,
+# which searched every photo in full at full size with one upsample and encoded every face found:
+# the adaptive DetectionPolicy, the DETECTION_MAX_DIMENSION cap, the FaceQualityGate and burst
+# reuse all apply on top of it. The 'fixed' policy with a gate of 0 size and 0 sharpness comes
+# closest, at the 1600px cap and still reusing burst locations.
+DEFAULT_PRESET = 'balanced'
+
+def get_preset(name):
+    if name not in PRESETS:
+        raise ValueError(f"Unknown preset '{name}'. Choose from: {', '.join(PRESETS)}")
+    return PRESETS[name]
+
 # --- File System Setup ---
-TEMP_DIR = Path("temp_files")
-EXTRACTED_EVENTS_DIR = TEMP_DIR / "extracted_events"
-EXTRACTED_REFERENCES_DIR = TEMP_DIR / "extracted_references"
-UNKNOWN_PORTRAITS_DIR = TEMP_DIR / "unknown_portraits"
-OUTPUT_DIR = Path("output")
-DOWNLOAD_ZIP_PATH = Path("FaceFolio_Sorted.zip")
+
+# Jobs created with JobContext.create() get their own workspace under this folder.
+JOBS_ROOT = Path("jobs")
 
 IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.bmp', '.gif']
 
-def setup_directories():
-    """Cleans up old files and creates a fresh directory structure."""
-    print("--- Setting up directories ---")
-    for path in [TEMP_DIR, OUTPUT_DIR]:
+# Discovery and the tagging screen may both be first to open a job's portrait pack.
+_portraits_lock = threading.Lock()
+
+class JobContext:
+    """
+    The workspace and output locations of one run. Every workflow function takes a
+    job, so several jobs can run side by side as long as their roots differ.
+    """
+
+    def __init__(self, root, job_id=None):
+        self.root = Path(root)
+        self.job_id = job_id
+        self.temp_dir = self.root / "temp_files"
+        self.extracted_events_dir = self.temp_dir / "extracted_events"
+        self.extracted_references_dir = self.temp_dir / "extracted_references"
+        self.portrait_pack_path = self.temp_dir / "portraits.pack"
+        self.filtered_faces_path = self.temp_dir / "filtered_faces.json"
+        self.output_dir = self.root / "output"
+        self.download_zip_path = self.root / "FaceFolio_Sorted.zip"
+        self.face_index_path = self.root / "face_index.npz"
+        self.sort_manifest_path = self.root / "sort_manifest.json"
+        self.report_path = self.root / "run_report.jsonl"
+        self.report = None            # the RunReport of the detection run in progress
+        self.governor = None          # the MemoryGovernor of the detection run in progress
+        self.output_names = {}        # event photo -> its file name in the sorted output (see collect_images)
+        self.event_root = None        # the folder event photos are named relative to (see collect_images)
+        self._portraits = None
+
+    @property
+    def portraits(self):
+        """The run's PortraitPack, opened on first use."""
+        with _portraits_lock:
+            if self._portraits is None:
+                self._portraits = PortraitPack(self.portrait_pack_path)
+            return self._portraits
+
+    def close_portraits(self):
+        """Closes the portrait pack, e.g. before its files are moved away."""
+        with _portraits_lock:
+            if self._portraits is not None:
+                self._portraits.close()
+                self._portraits = None
+
+    @classmethod
+    def create(cls, jobs_root=JOBS_ROOT):
+        """Creates a job with a fresh, uniquely named workspace under jobs_root."""
+        sweep_trash(jobs_root)
+        job_id = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+        return cls(Path(jobs_root) / job_id, job_id)
+
+    def __repr__(self):
+        return f"JobContext({str(self.root)!r})"
+
+# The desktop app keeps using the working directory, as it always has.
+DEFAULT_JOB = JobContext(Path("."))
+
+# Workspaces being deleted are renamed to this prefix first. It is FaceFolio's own, because the
+# desktop app's workspace is the working directory, which may hold other programs' folders.
+TRASH_PREFIX = ".facefolio-trash-"
+
+def _remove_in_background(paths):
+    """Deletes directory trees on a daemon thread so the caller does not wait for them."""
+    def remove():
+        for path in paths:
+            shutil.rmtree(path, ignore_errors=True)
+    thread = threading.Thread(target=remove, name="workspace-cleanup", daemon=True)
+    thread.start()
+    return thread
+
+def sweep_trash(root):
+    """
+    Deletes, in the background, the TRASH_PREFIX folders under root that a process exited or was
+    interrupted before deleting. Returns the cleanup thread, or None if there was nothing to do.
+    """
+    stale = [path for path in Path(root).glob(f"{TRASH_PREFIX}*") if path.is_dir()]
+    return _remove_in_background(stale) if stale else None
+
+def setup_directories(job=None):
+    """Moves old files out of the way, deletes them in the background and creates a fresh directory structure."""
+    job = job or DEFAULT_JOB
+    print(f"--- Setting up directories in '{job.root}' ---")
+    job.root.mkdir(parents=True, exist_ok=True)
+    job.output_names = {}
+    job.event_root = None
+
+    # Renaming is instant; the actual deletion of a large old tree happens off the critical path.
+    # Trash left behind by an earlier run that exited mid-cleanup is picked up again here.
+    sweep_trash(job.root)
+    job.close_portraits()
+    trash = []
+    for path in [job.temp_dir, job.output_dir]:
+        if path.exists():
+            trash.append(job.root / f"{TRASH_PREFIX}{uuid.uuid4().hex}")
+            path.rename(trash[-1])
+    if trash:
+        _remove_in_background(trash)
+    for path in [job.download_zip_path, job.face_index_path, exact_vectors_path(job.face_index_path),
+                 job.sort_manifest_path, job.report_path]:
         if path.exists():
-            shutil.rmtree(path)
-    if DOWNLOAD_ZIP_PATH.exists():
-        DOWNLOAD_ZIP_PATH.unlink()
+            path.unlink()
         
-    for path in [TEMP_DIR, EXTRACTED_EVENTS_DIR, EXTRACTED_REFERENCES_DIR, UNKNOWN_PORTRAITS_DIR, OUTPUT_DIR]:
+    for path in [job.temp_dir, job.extracted_events_dir, job.extracted_references_dir, job.output_dir]:
         path.mkdir(exist_ok=True)
     print("Directories are ready.")
 
-def extract_zip(zip_path, extract_to):
-    """Extracts a zip file and returns a list of the extracted image paths."""
+def discard_job(job):
+    """Removes a job's whole workspace in the background."""
+    job.close_portraits()
+    if job.root.exists():
+        trash = job.root.with_name(f"{TRASH_PREFIX}{job.root.name}")
+        job.root.rename(trash)
+        return _remove_in_background([trash])
+
+# Archives are extracted by this many threads, each reading through its own handle on the
+# zip file. Decompression releases the GIL, so the threads really do run side by side.
+EXTRACT_THREADS = min(4, os.cpu_count() or 1)
+
+def _flattened_names(paths):
+    """
+    Returns the file name each path gets when they are all flattened into one folder: a name
+    that is already taken gets a _2, _3, ... suffix instead of overwriting.
+    """
+    taken = set()
+    names = []
+    for path in map(Path, paths):
+        name, n = path.name, 1
+        while name.lower() in taken:
+            n += 1
+            name = f"{path.stem}_{n}{path.suffix}"
+        taken.add(name.lower())
+        names.append(name)
+    return names
+
+def _split_ranges(members, parts):
+    """Cuts the members into up to `parts` contiguous ranges holding similar amounts of compressed data."""
+    total = sum(member.compress_size for member in members)
+    ranges, start, size = [], 0, 0
+    for i, member in enumerate(members):
+        size += member.compress_size
+        if len(ranges) < parts - 1 and size >= total * (len(ranges) + 1) / parts:
+            ranges.append((start, i + 1))
+            start = i + 1
+    if start < len(members):
+        ranges.append((start, len(members)))
+    return ranges
+
+def _extract_range(zip_path, members, targets):
+    """Extracts members to their target paths through a handle of its own."""
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        for member, target_path in zip(members, targets):
+            with zip_ref.open(member) as source, open(target_path, 'wb') as target:
+                shutil.copyfileobj(source, target, 1024 * 1024)
+
+def extract_zip(zip_path, extract_to, threads=EXTRACT_THREADS):
+    """Extracts the images in a zip file and returns a list of the extracted image paths."""
     print(f"Extracting '{zip_path}' to '{extract_to}'...")
-    image_paths = []
     try:
+        start = time.perf_counter()
         with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            for member in zip_ref.infolist():
-                if not member.is_dir() and Path(member.filename).suffix.lower() in IMAGE_EXTENSIONS:
-                    extracted_path = extract_to / Path(member.filename).name
-                    with zip_ref.open(member) as source, open(extracted_path, 'wb') as target:
-                        shutil.copyfileobj(source, target)
-                    image_paths.append(extracted_path)
-        print("Extraction complete.")
+            members = [member for member in zip_ref.infolist()
+                       if not member.is_dir() and Path(member.filename).suffix.lower() in IMAGE_EXTENSIONS]
+        image_paths = [extract_to / name for name in _flattened_names(member.filename for member in members)]
+        renamed = sum(path.name != Path(member.filename).name for member, path in zip(members, image_paths))
+        if renamed:
+            print(f"  > {renamed} file(s) share a name with another file in the archive and were renamed.")
+
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            futures = [executor.submit(_extract_range, zip_path, members[first:last], image_paths[first:last])
+                       for first, last in _split_ranges(members, threads)]
+            for future in futures:
+                future.result()
+
+        seconds = max(time.perf_counter() - start, 1e-6)
+        read_mb = sum(member.compress_size for member in members) / 1e6
+        written_mb = sum(member.file_size for member in members) / 1e6
+        print(f"Extraction complete: {len(members)} images in {seconds:.1f}s using {threads} thread(s), "
+              f"read {read_mb / seconds:.1f} MB/s, wrote {written_mb / seconds:.1f} MB/s.")
         return image_paths
     except Exception as e:
         print(f"An error occurred during extraction: {e}")
@@ -48,11 +261,1219 @@ def extract_zip(zip_path, extract_to):
 def _is_image_file(path):
     return path.suffix.lower() in IMAGE_EXTENSIONS
 
+def collect_images(source, extract_to, job=None):
+    """
+    Returns the images of a .zip (extracted into extract_to) or of a folder, searched recursively.
+    With a job, it also records the file name each image gets in the sorted output: photos of a
+    folder that share a name with one in another subfolder get a suffix, as in an archive. The
+    job's event_root is set to the folder the images are named relative to in the face index,
+    the run report and shard files: the source folder, or the one the archive was extracted to.
+    """
+    source = Path(source)
+    if source.is_dir():
+        image_paths = sorted(path for path in source.rglob('*') if _is_image_file(path))
+    else:
+        image_paths = extract_zip(source, extract_to)
+    if job is not None:
+        job.event_root = source if source.is_dir() else Path(extract_to)
+        job.output_names = {path: name for path, name in zip(image_paths, _flattened_names(image_paths))
+                            if name != path.name}
+        if job.output_names:
+            print(f"  > {len(job.output_names)} photo(s) share a name with one in another folder and will be renamed.")
+    return image_paths
+
+def output_name(image_path, job=None):
+    """The file name an event photo gets in the sorted output."""
+    return (job or DEFAULT_JOB).output_names.get(image_path, image_path.name)
+
+# --- Image Decoding ---
+
+# Longest side, in pixels, that face detection runs at. Larger images are decoded
+# at reduced size (JPEGs directly in the DCT domain via Pillow's draft mode).
+DETECTION_MAX_DIMENSION = 1600
+# Faces smaller than this at detection scale are encoded from a larger decode.
+ENCODING_MIN_FACE_SIZE = 100
+# Faces in saved portraits are decoded at no less than this size.
+PORTRAIT_MIN_FACE_SIZE = 200
+# Decodes made to encode small faces never exceed this many pixels; faces that would need
+# more are encoded from this resolution instead.
+MAX_DECODE_PIXELS = 40_000_000
+# Around each small face, this much of the face size (per side) is kept from the larger decode.
+FACE_REGION_MARGIN = 0.6
+
+def _decode_at_least(image_path, requested_size):
+    """
+    Decodes an image at no less than requested_size. For JPEGs, draft mode lets the
+    decoder skip straight to the smallest 1/2, 1/4 or 1/8 scale that is big enough.
+    Returns the decoded RGB image and its scale factor relative to the full image.
+    """
+    with Image.open(image_path) as image:
+        full_width = image.width
+        if requested_size[0] < image.width and requested_size[1] < image.height:
+            image.draft('RGB', requested_size)
+        decoded = image.convert('RGB')
+    return decoded, full_width / decoded.width
+
+def _decoded_pixels(image_path, requested_size):
+    """How many pixels _decode_at_least will produce, read from the header alone."""
+    with Image.open(image_path) as image:
+        if requested_size[0] < image.width and requested_size[1] < image.height:
+            image.draft('RGB', requested_size)
+        return image.width * image.height
+
+def _detection_size(full_size, max_dimension):
+    full_width, full_height = full_size
+    ratio = min(1.0, max_dimension / max(full_width, full_height))
+    return max(1, round(full_width * ratio)), max(1, round(full_height * ratio))
+
+def load_detection_image(image_path, max_dimension=DETECTION_MAX_DIMENSION):
+    """Decodes an image at detection resolution and returns (RGB array, scale factor to full size)."""
+    with Image.open(image_path) as image:
+        full_width, full_height = image.size
+    target = _detection_size((full_width, full_height), max_dimension)
+
+    decoded, _ = _decode_at_least(image_path, target)
+    if decoded.width > target[0]:
+        decoded = decoded.resize(target, Image.BILINEAR)
+    return np.asarray(decoded), full_width / decoded.width
+
+def _scale_location(location, scale):
+    return tuple(int(round(value * scale)) for value in location)
+
+def _align_faces(image_data, locations, landmarks):
+    """
+    Cuts an aligned chip around each face: exactly the input dlib's face encoder works on.
+    face_recognition.face_encodings does the same internally, one image at a time.
+    """
+    api = load_recognition_models().api
+    shapes = api._raw_face_landmarks(image_data, locations, landmarks)
+    return [api.dlib.get_face_chip(image_data, shape, size=FACE_CHIP_SIZE, padding=FACE_CHIP_PADDING)
+            for shape in shapes]
+
+def _face_chips(image_data, scale, locations, preset=PRESETS[DEFAULT_PRESET]):
+    """
+    Aligns the faces that are large enough at detection scale. Returns the chips (None for
+    the rest) and the indices of the faces that need a larger decode (see _reread_face_chips).
+    """
+    chips = [None] * len(locations)
+    small = [i for i, (top, right, bottom, left) in enumerate(locations)
+             if scale > 1 and min(bottom - top, right - left) < ENCODING_MIN_FACE_SIZE]
+    large = [i for i in range(len(locations)) if i not in small]
+    if large:
+        for i, chip in zip(large, _align_faces(image_data, [locations[i] for i in large], preset['landmarks'])):
+            chips[i] = chip
+    return chips, small
+
+def _reread_size(detection_size, scale, locations, small):
+    """The size to decode at so the smallest of the small faces reaches ENCODING_MIN_FACE_SIZE, within MAX_DECODE_PIXELS."""
+    width, height = detection_size
+    smallest = min(min(locations[i][2] - locations[i][0], locations[i][1] - locations[i][3]) for i in small)
+    upscale = min(scale, ENCODING_MIN_FACE_SIZE / max(smallest, 1),
+                  max(1.0, (MAX_DECODE_PIXELS / (width * height)) ** 0.5))
+    return int(width * upscale), int(height * upscale)
+
+def _reread_face_chips(image_path, detection_size, scale, locations, small, chips, preset=PRESETS[DEFAULT_PRESET]):
+    """
+    Cuts the small faces from a single, larger decode that is only as big as the smallest
+    such face requires. Only a padded region around each face is kept as an array; the
+    decode itself is dropped as soon as the regions are cut.
+    """
+    decoded, decoded_scale = _decode_at_least(image_path, _reread_size(detection_size, scale, locations, small))
+    relative_scale = scale / decoded_scale
+    regions = []
+    for i in small:
+        top, right, bottom, left = _scale_location(locations[i], relative_scale)
+        margin_y, margin_x = int((bottom - top) * FACE_REGION_MARGIN), int((right - left) * FACE_REGION_MARGIN)
+        y0, x0 = max(0, top - margin_y), max(0, left - margin_x)
+        y1, x1 = min(decoded.height, bottom + margin_y), min(decoded.width, right + margin_x)
+        regions.append((np.asarray(decoded.crop((x0, y0, x1, y1))), (top - y0, right - x0, bottom - y0, left - x0)))
+    del decoded
+
+    for i, (region, location) in zip(small, regions):
+        chips[i] = _align_faces(region, [location], preset['landmarks'])[0]
+    return chips
+
+# --- Batched Encoding ---
+
+# dlib's face encoder works on aligned 150x150 chips with 25% padding around the face.
+FACE_CHIP_SIZE = 150
+FACE_CHIP_PADDING = 0.25
+# Chips from consecutive images are collected until there are about this many, then encoded in one call.
+ENCODING_BATCH_SIZE = 32
+
+class EncodingBatcher:
+    """
+    Collects the face chips of several images and runs dlib's encoder network on all of
+    them in one call, instead of once per image. Images come back out in the order they
+    went in, as soon as the batch holding their faces has been encoded.
+    """
+
+    def __init__(self, jitters=1, batch_size=ENCODING_BATCH_SIZE):
+        self.jitters = jitters
+        self.batch_size = batch_size
+        self.pending = []             # (item, chips) waiting for the next batch
+        self.pending_chips = 0
+        self.faces = 0
+        self.batches = 0
+        self.seconds = 0.0
+
+    def add(self, item, chips):
+        """Queues an image's chips. Returns the (item, encodings, error) tuples that are finished now."""
+        self.pending.append((item, chips))
+        self.pending_chips += len(chips)
+        return self.flush() if self.pending_chips >= self.batch_size else []
+
+    def flush(self):
+        """Encodes whatever is queued and returns it as (item, encodings, error) tuples."""
+        pending, self.pending, self.pending_chips = self.pending, [], 0
+        chips = [chip for _, item_chips in pending for chip in item_chips]
+        try:
+            encodings = self._encode(chips)
+        except Exception:
+            # One bad chip should not cost the whole batch: fall back to encoding image by image.
+            return [self._encode_alone(item, item_chips) for item, item_chips in pending]
+
+        finished, offset = [], 0
+        for item, item_chips in pending:
+            finished.append((item, encodings[offset:offset + len(item_chips)], None))
+            offset += len(item_chips)
+        return finished
+
+    def merge(self, other):
+        """Adds the counters of another batcher, e.g. one that ran in a worker process."""
+        self.faces += other.faces
+        self.batches += other.batches
+        self.seconds += other.seconds
+
+    def summary(self):
+        per_face = self.seconds / self.faces * 1000 if self.faces else 0
+        return (f"Encoding: {self.faces} face(s) in {self.batches} batch(es), "
+                f"{per_face:.1f} ms per face ({self.jitters} jitter(s)).")
+
+    def _encode(self, chips):
+        if not chips:
+            return []
+        start = time.perf_counter()
+        descriptors = load_recognition_models().api.face_encoder.compute_face_descriptor(chips, self.jitters)
+        self.seconds += time.perf_counter() - start
+        self.faces += len(chips)
+        self.batches += 1
+        return [np.array(descriptor) for descriptor in descriptors]
+
+    def _encode_alone(self, item, chips):
+        try:
+            return item, self._encode(chips), None
+        except Exception as e:
+            return item, None, str(e)
+
+# --- Face Quality Gate ---
+
+# Faces smaller than this many pixels (in the full-size image) are not encoded.
+MIN_FACE_SIZE = 40
+# Faces whose Laplacian variance falls below this are considered too blurry to encode.
+MIN_FACE_SHARPNESS = 10.0
+
+def _sharpness(face_pixels):
+    """Variance of the Laplacian of a face crop: a cheap focus measure."""
+    gray = face_pixels.astype(np.float32).mean(axis=2)
+    if gray.shape[0] < 3 or gray.shape[1] < 3:
+        return 0.0
+    laplacian = (4 * gray[1:-1, 1:-1] - gray[:-2, 1:-1] - gray[2:, 1:-1]
+                 - gray[1:-1, :-2] - gray[1:-1, 2:])
+    return float(laplacian.var())
+
+class FaceQualityGate:
+    """
+    Drops faces that are too small or too blurry before they reach the encoder.
+    Dropped faces are kept in `filtered` so they can be written out and revisited.
+    """
+
+    def __init__(self, min_face_size=MIN_FACE_SIZE, min_sharpness=MIN_FACE_SHARPNESS):
+        self.min_face_size = min_face_size
+        self.min_sharpness = min_sharpness
+        self.passed = 0
+        self.filtered = []
+
+    def filter(self, image_path, image_data, locations, scale):
+        """Returns the detection-scale locations that pass the gate."""
+        kept = []
+        for location in locations:
+            top, right, bottom, left = location
+            size = int(min(bottom - top, right - left) * scale)
+            sharpness = _sharpness(image_data[top:bottom, left:right])
+
+            reason = None
+            if size < self.min_face_size:
+                reason = "too small"
+            elif sharpness < self.min_sharpness:
+                reason = "too blurry"
+
+            if reason:
+                self.filtered.append({'path': str(image_path), 'location': list(_scale_location(location, scale)),
+                                      'reason': reason, 'size': size, 'sharpness': round(sharpness, 2)})
+            else:
+                kept.append(location)
+        self.passed += len(kept)
+        return kept
+
+    def merge(self, other):
+        """Adds the results of another gate, e.g. one that ran in a worker process."""
+        self.passed += other.passed
+        self.filtered.extend(other.filtered)
+
+    def summary(self):
+        return (f"Quality gate: {len(self.filtered)} face(s) skipped "
+                f"(min size {self.min_face_size}px, min sharpness {self.min_sharpness}), {self.passed} encoded.")
+
+    def save(self, path):
+        """Writes the filtered faces to a JSON file."""
+        with open(path, 'w') as f:
+            json.dump(self.filtered, f, indent=2)
+
+# --- Burst Detection ---
+
+# Consecutive frames shot less than this many seconds apart may belong to one burst.
+BURST_MAX_GAP_SECONDS = 2.0
+# Mean absolute difference (0-255) between downscaled grayscale frames above which
+# two frames are treated as different scenes, even inside the time window.
+BURST_MAX_FRAME_DIFFERENCE = 12.0
+# The same, for any one block of the frame away from the previous faces. Someone walking
+# into an otherwise still burst changes a few blocks a lot but the whole frame very little.
+BURST_MAX_BLOCK_DIFFERENCE = 20.0
+# How far around a previous face to search, as a fraction of the face size.
+BURST_SEARCH_MARGIN = 0.6
+# Force a full detection pass after this many reused frames so new faces are picked up.
+BURST_MAX_REUSED_FRAMES = 5
+
+_EXIF_IFD_POINTER = 0x8769
+_EXIF_DATETIME = 306
+_EXIF_DATETIME_ORIGINAL = 36867
+_EXIF_SUBSEC_TIME_ORIGINAL = 37521
+_SIGNATURE_SIZE = (64, 64)
+# Side of the square blocks (in signature pixels) whose differences are compared.
+_SIGNATURE_BLOCK = 4
+
+def _read_capture_time(image_path):
+    """Returns the EXIF capture time of an image, or None if it is not available."""
+    try:
+        with Image.open(image_path) as image:
+            exif = image.getexif()
+            exif_ifd = exif.get_ifd(_EXIF_IFD_POINTER)
+    except Exception:
+        return None
+
+    stamp = exif_ifd.get(_EXIF_DATETIME_ORIGINAL) or exif.get(_EXIF_DATETIME)
+    if not stamp:
+        return None
+    try:
+        capture_time = datetime.strptime(str(stamp).strip('\x00 '), "%Y:%m:%d %H:%M:%S")
+    except ValueError:
+        return None
+
+    subsec = ''.join(c for c in str(exif_ifd.get(_EXIF_SUBSEC_TIME_ORIGINAL, '')) if c.isdigit())
+    if subsec:
+        capture_time = capture_time.replace(microsecond=int(subsec[:6].ljust(6, '0')))
+    return capture_time
+
+def _frame_signature(image_data):
+    """Builds a tiny grayscale thumbnail used to compare consecutive frames."""
+    thumbnail = Image.fromarray(image_data).convert('L').resize(_SIGNATURE_SIZE, Image.BILINEAR)
+    return np.asarray(thumbnail, dtype=np.float32)
+
+class BurstTracker:
+    """
+    Reuses face locations across the frames of a burst.
+
+    Frames that were shot within BURST_MAX_GAP_SECONDS of the previous one and look
+    nearly identical, also block by block away from the previous faces, only get searched
+    around the previous frame's faces. If any of those faces cannot be found again, the
+    frame falls back to full detection. With reuse off, every frame is detected in full.
+    """
+
+    def __init__(self, detector='hog', reuse=True):
+        self.detector = detector
+        self.reuse = reuse
+        self.capture_times = {}
+        self.previous = None
+        self.reused_frames = 0
+        self.searched = 0
+        self.fallbacks = 0
+
+    def order(self, image_paths):
+        """Orders images by capture time so that burst frames end up next to each other."""
+        for image_path in image_paths:
+            if image_path not in self.capture_times:
+                self.capture_times[image_path] = _read_capture_time(image_path)
+        timed = sorted((p for p in image_paths if self.capture_times[p]), key=lambda p: (self.capture_times[p], p.name))
+        untimed = sorted((p for p in image_paths if not self.capture_times[p]), key=lambda p: p.name)
+        return timed + untimed
+
+    def face_locations(self, image_path, image_data, upsample=1):
+        """Returns face locations for a frame, searching near the previous frame's faces when possible."""
+        if image_path not in self.capture_times:
+            self.capture_times[image_path] = _read_capture_time(image_path)
+        capture_time = self.capture_times[image_path]
+        signature = _frame_signature(image_data)
+
+        locations = None
+        if self.reuse and self._continues_burst(capture_time, signature, image_data.shape):
+            self.searched += 1
+            locations = self._search_previous_faces(image_data, upsample)
+            if locations is None:
+                self.fallbacks += 1
+            else:
+                self.reused_frames += 1
+
+        if locations is None:
+            locations = face_recognition.face_locations(image_data, upsample, self.detector)
+            self.reused_frames = 0
+
+        self.previous = {'capture_time': capture_time, 'signature': signature,
+                         'shape': image_data.shape, 'locations': locations}
+        return locations
+
+    def remember_locations(self, locations):
+        """Replaces the locations carried over to the next frame (e.g. after a retry)."""
+        if self.previous:
+            self.previous['locations'] = locations
+
+    def merge(self, other):
+        """Adds the counters of another tracker, e.g. one that ran in a worker process."""
+        self.searched += other.searched
+        self.fallbacks += other.fallbacks
+
+    def summary(self):
+        reused = self.searched - self.fallbacks
+        return (f"Burst reuse: {reused} frame(s) searched around previous faces, "
+                f"{self.fallbacks} fell back to full detection.")
+
+    def _continues_burst(self, capture_time, signature, shape):
+        previous = self.previous
+        if not previous or not previous['locations'] or capture_time is None or previous['capture_time'] is None:
+            return False
+        if self.reused_frames >= BURST_MAX_REUSED_FRAMES or shape != previous['shape']:
+            return False
+        gap = abs((capture_time - previous['capture_time']).total_seconds())
+        if gap > BURST_MAX_GAP_SECONDS:
+            return False
+        difference = np.abs(signature - previous['signature'])
+        if float(np.mean(difference)) > BURST_MAX_FRAME_DIFFERENCE:
+            return False
+        return self._largest_block_difference(difference, shape) <= BURST_MAX_BLOCK_DIFFERENCE
+
+    def _largest_block_difference(self, difference, shape):
+        """The largest mean difference of a signature block outside the previous faces' search windows."""
+        rows, columns = difference.shape[0] // _SIGNATURE_BLOCK, difference.shape[1] // _SIGNATURE_BLOCK
+        blocks = difference.reshape(rows, _SIGNATURE_BLOCK, columns, _SIGNATURE_BLOCK).mean(axis=(1, 3))
+        outside = np.ones(blocks.shape, dtype=bool)
+        height, width = shape[:2]
+        for location in self.previous['locations']:
+            # Changes near a previous face are the search's business: it finds the face again or falls back.
+            y0, y1, x0, x1 = _search_window(location, height, width)
+            # In blocks, rounded outwards.
+            first_row, last_row = y0 * rows // height, -(-y1 * rows // height)
+            first_column, last_column = x0 * columns // width, -(-x1 * columns // width)
+            outside[first_row:last_row, first_column:last_column] = False
+        return float(blocks[outside].max()) if outside.any() else 0.0
+
+    def _search_previous_faces(self, image_data, upsample):
+        """Runs detection only inside padded windows around the previous faces; None on any miss."""
+        height, width = image_data.shape[:2]
+        locations = []
+        for location in self.previous['locations']:
+            y0, y1, x0, x1 = _search_window(location, height, width)
+            candidates = face_recognition.face_locations(image_data[y0:y1, x0:x1], upsample, self.detector)
+            if not candidates:
+                return None
+
+            # Every face in the window is kept, so one that stepped in next to a previous face is not lost.
+            # A face found again through an overlapping window is only kept once.
+            for t, r, b, l in candidates:
+                candidate = (t + y0, r + x0, b + y0, l + x0)
+                if all(_overlap(candidate, kept) <= 0.5 for kept in locations):
+                    locations.append(candidate)
+        return locations
+
+def _search_window(location, height, width):
+    """The (y0, y1, x0, x1) window around a face that the next burst frame is searched in."""
+    top, right, bottom, left = location
+    pad_y = int((bottom - top) * BURST_SEARCH_MARGIN)
+    pad_x = int((right - left) * BURST_SEARCH_MARGIN)
+    return max(0, top - pad_y), min(height, bottom + pad_y), max(0, left - pad_x), min(width, right + pad_x)
+
+def _overlap(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes."""
+    height = min(a[2], b[2]) - max(a[0], b[0])
+    width = min(a[1], b[1]) - max(a[3], b[3])
+    if height <= 0 or width <= 0:
+        return 0.0
+    intersection = height * width
+    union = (a[2] - a[0]) * (a[1] - a[3]) + (b[2] - b[0]) * (b[1] - b[3]) - intersection
+    return intersection / union
+
+# --- Detection Policy ---
+
+# The HOG detector scans an 80x80 window, so it finds faces of about this size
+# at 0 upsamples, half of it at 1 upsample, and so on.
+HOG_MIN_FACE_SIZE = 80
+# The adaptive policy aims to find faces down to this fraction of the image's shorter side
+# (but never smaller than the quality gate's minimum face size).
+TARGET_MIN_FACE_FRACTION = 0.04
+MAX_UPSAMPLE = 2
+# Upper bound for the longest side of the image the adaptive policy works on.
+ADAPTIVE_MAX_DIMENSION = 4000
+# An empty image is only retried at a higher upsample if that stays under this many pixels.
+RETRY_MAX_PIXELS = 16_000_000
+
+DETECTION_POLICIES = ['adaptive', 'fixed']
+
+class DetectionPolicy:
+    """
+    Chooses the working scale and upsample count for each image.
+
+    'fixed' detects at DETECTION_MAX_DIMENSION with one upsample, whatever the image.
+    'adaptive' picks the cheapest scale/upsample combination that still finds faces of
+    the target minimum size, preferring a larger decode over upsampling, and retries
+    images where nothing was found at one more upsample.
+
+    The speed/quality preset picks the detector and encoder models, and scales the
+    resolution both policies work at.
+    """
+
+    def __init__(self, name='adaptive', min_face_size=MIN_FACE_SIZE, preset=DEFAULT_PRESET):
+        if name not in DETECTION_POLICIES:
+            raise ValueError(f"Unknown detection policy '{name}'. Choose from: {', '.join(DETECTION_POLICIES)}")
+        self.name = name
+        self.min_face_size = min_face_size
+        self.preset_name = preset
+        self.preset = get_preset(preset)
+        self.images = 0
+        self.working_pixels = 0
+        self.upsample_counts = {}
+        self.retries = 0
+        self.retry_hits = 0
+
+    def plan(self, image_size):
+        """Returns (max_dimension, upsample) for an image of the given full size."""
+        width, height = image_size
+        resolution = self.preset['resolution']
+        if self.name == 'fixed':
+            return round(DETECTION_MAX_DIMENSION * resolution), 1
+
+        target = max(self.min_face_size, TARGET_MIN_FACE_FRACTION * min(width, height)) / resolution
+        needed = HOG_MIN_FACE_SIZE / target
+        scale = min(1.0, needed, ADAPTIVE_MAX_DIMENSION * resolution / max(width, height))
+        upsample = 0
+        while scale * 2 ** upsample < needed and upsample < MAX_UPSAMPLE:
+            upsample += 1
+        return max(1, round(max(width, height) * scale)), upsample
+
+    def detect(self, image_path, image_data, upsample, burst_tracker):
+        """Runs detection (through the burst tracker) and the empty-image retry."""
+        self.images += 1
+        self.working_pixels += image_data.shape[0] * image_data.shape[1] * 4 ** upsample
+        self.upsample_counts[upsample] = self.upsample_counts.get(upsample, 0) + 1
+
+        locations = burst_tracker.face_locations(image_path, image_data, upsample)
+        retry_pixels = image_data.shape[0] * image_data.shape[1] * 4 ** (upsample + 1)
+        if (not locations and self.name == 'adaptive' and upsample < MAX_UPSAMPLE
+                and retry_pixels <= RETRY_MAX_PIXELS):
+            self.retries += 1
+            self.working_pixels += retry_pixels
+            locations = face_recognition.face_locations(image_data, upsample + 1, self.preset['detector'])
+            if locations:
+                self.retry_hits += 1
+                burst_tracker.remember_locations(locations)
+        return locations
+
+    def merge(self, other):
+        """Adds the counters of another policy, e.g. one that ran in a worker process."""
+        self.images += other.images
+        self.working_pixels += other.working_pixels
+        for upsample, count in other.upsample_counts.items():
+            self.upsample_counts[upsample] = self.upsample_counts.get(upsample, 0) + count
+        self.retries += other.retries
+        self.retry_hits += other.retry_hits
+
+    def stats(self):
+        """Returns the policy's counters as a plain dict (used by the benchmark)."""
+        return {'policy': self.name, 'preset': self.preset_name, 'images': self.images,
+                'mean_working_megapixels': round(self.working_pixels / max(self.images, 1) / 1e6, 3),
+                'upsample_counts': dict(sorted(self.upsample_counts.items())),
+                'retries': self.retries, 'retry_hits': self.retry_hits}
+
+    def summary(self):
+        stats = self.stats()
+        return (f"Detection policy '{self.name}' ({self.preset_name}): "
+                f"{stats['mean_working_megapixels']} MP per image on average, "
+                f"upsamples {stats['upsample_counts']}, {self.retries} retried ({self.retry_hits} found faces).")
+
+# --- Memory Governor ---
+
+# Default budget for decoded image data held at once, across all worker processes of a run.
+DEFAULT_MEMORY_LIMIT_MB = 4096
+
+class MemoryGovernor:
+    """
+    Caps the memory held by decoded images at any one time, across threads and worker
+    processes. Before decoding, an image reserves an estimate of what decoding and
+    detecting it will take, and waits until that fits in the budget. An image larger than
+    the whole budget is admitted once nothing else is in flight.
+
+    The counters live in shared memory, so a governor handed to worker processes when
+    they start (see _init_detection_worker) keeps one budget for all of them. A process
+    that dies mid-image never gives its reservation back, so pools hand their workers a
+    scoped() view and reclaim() what is left on it once the workers are gone.
+    """
+
+    def __init__(self, limit_mb=DEFAULT_MEMORY_LIMIT_MB):
+        self.limit_mb = limit_mb
+        self._limit = int(limit_mb * 1e6)
+        # Created for the context detection workers are started in (see _worker_context).
+        self._condition = _worker_context.Condition()
+        self._in_flight = _worker_context.RawValue('q', 0)
+        self._peak = _worker_context.RawValue('q', 0)
+        self._waits = _worker_context.RawValue('q', 0)
+        self._held = None             # what is reserved through this view, if it is a scoped() one
+
+    def scoped(self):
+        """A view of this governor, sharing its budget, that keeps count of what is reserved through it."""
+        view = copy.copy(self)
+        view._held = _worker_context.RawValue('q', 0)
+        return view
+
+    def reclaim(self):
+        """
+        Gives back to the budget whatever is still reserved through this scoped view, as held
+        by processes that died mid-image. Only call it once every holder is gone. Returns the bytes.
+        """
+        with self._condition:
+            leaked = self._held.value
+            self._held.value = 0
+            self._in_flight.value -= leaked
+            self._condition.notify_all()
+        return leaked
+
+    @contextmanager
+    def reserve(self, nbytes):
+        """Blocks until nbytes fit in the budget and holds them for the duration of the block."""
+        with self._condition:
+            def fits():
+                return self._in_flight.value == 0 or self._in_flight.value + nbytes <= self._limit
+            if not fits():
+                self._waits.value += 1
+                self._condition.wait_for(fits)
+            self._in_flight.value += nbytes
+            self._peak.value = max(self._peak.value, self._in_flight.value)
+            if self._held is not None:
+                self._held.value += nbytes
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._in_flight.value -= nbytes
+                if self._held is not None:
+                    self._held.value -= nbytes
+                self._condition.notify_all()
+
+    def summary(self):
+        return (f"Memory governor: at most {self._peak.value / 1e6:.0f} MB of decoded images in flight "
+                f"(limit {self.limit_mb} MB), {self._waits.value} image(s) waited for budget.")
+
+def _detection_bytes(image_path, image_size, max_dimension, upsample):
+    """Estimates the memory needed to decode and detect one image: the decode, its resized copy and dlib's upsampled copy."""
+    target = _detection_size(image_size, max_dimension)
+    target_pixels = target[0] * target[1]
+    return 3 * (_decoded_pixels(image_path, target) + 2 * target_pixels + target_pixels * 4 ** upsample)
+
+# --- Detection Pipeline ---
+
+def _lap(timings, stage, start):
+    """Adds the time since start to a stage's timing (in seconds) and returns the current time."""
+    now = time.perf_counter()
+    timings[stage] = timings.get(stage, 0.0) + now - start
+    return now
+
+def _detect_and_align(image_path, policy, burst_tracker, quality_gate, governor, timings):
+    """
+    Finds and aligns the faces in one image. Returns (full-size locations, face chips) for encoding.
+    The time each stage takes is added to timings, also for the stages done before an error.
+    """
+    start = time.perf_counter()
+    with Image.open(image_path) as image:
+        image_size = image.size
+    max_dimension, upsample = policy.plan(image_size)
+
+    with governor.reserve(_detection_bytes(image_path, image_size, max_dimension, upsample)):
+        start = _lap(timings, 'wait', start)
+        image_data, scale = load_detection_image(image_path, max_dimension)
+        start = _lap(timings, 'decode', start)
+        face_locations = policy.detect(image_path, image_data, upsample, burst_tracker)
+        face_locations = quality_gate.filter(image_path, image_data, face_locations, scale)
+        start = _lap(timings, 'detect', start)
+        chips, small = _face_chips(image_data, scale, face_locations, policy.preset)
+        detection_size = (image_data.shape[1], image_data.shape[0])
+        del image_data
+    start = _lap(timings, 'align', start)
+
+    # The larger decode for small faces gets its own reservation, after the detection image is gone.
+    if small:
+        reread_size = _reread_size(detection_size, scale, face_locations, small)
+        with governor.reserve(3 * _decoded_pixels(image_path, reread_size)):
+            start = _lap(timings, 'wait', start)
+            chips = _reread_face_chips(image_path, detection_size, scale, face_locations, small, chips, policy.preset)
+        _lap(timings, 'align', start)
+    return [_scale_location(location, scale) for location in face_locations], chips
+
+def _batch_encode(batcher, item=None, chips=None):
+    """
+    Queues an image's (image_path, face_locations, timings) item and chips with the batcher, or
+    flushes it without an item. Returns the finished items; the encoding time of a batch is
+    shared out over their timings by face count.
+    """
+    seconds = batcher.seconds
+    finished = batcher.add(item, chips) if item is not None else batcher.flush()
+    faces = sum(len(face_locations) for (_, face_locations, _), _, _ in finished)
+    for (_, face_locations, timings), _, _ in finished:
+        timings['encode'] = (batcher.seconds - seconds) * len(face_locations) / faces if faces else 0.0
+    return finished
+
+def _finish_detection_run(job, policy, burst_tracker, quality_gate, batcher, governor, resources):
+    """Prints the detection summary, adds it to the run report and records the faces the quality gate skipped."""
+    job.report.finish(resources=resources.stats(), detection=policy.stats(), filtered_faces=len(quality_gate.filtered))
+    print(resources.summary())
+    print(policy.summary())
+    print(burst_tracker.summary())
+    print(quality_gate.summary())
+    print(batcher.summary())
+    print(governor.summary())
+    if job.temp_dir.exists():
+        quality_gate.save(job.filtered_faces_path)
+
+# Progressive discovery first processes this share of the images, spread evenly over the event.
+PREVIEW_SAMPLE_FRACTION = 0.1
+
+def stratified_order(image_paths, sample_fraction):
+    """
+    Moves an evenly spread sample of the images (the middle one of every 1/sample_fraction in
+    order) to the front, so the first results already cover the whole event. The rest keep their order.
+    """
+    if sample_fraction <= 0 or len(image_paths) < 2:
+        return list(image_paths)
+    step = max(1, round(1 / sample_fraction))
+    sample = list(image_paths[step // 2::step])
+    sampled = set(sample)
+    return sample + [path for path in image_paths if path not in sampled]
+
+def _stratified_sample_size(image_count, sample_fraction):
+    """How many images stratified_order moves to the front."""
+    if sample_fraction <= 0 or image_count < 2:
+        return 0
+    step = max(1, round(1 / sample_fraction))
+    return len(range(step // 2, image_count, step))
+
+def iter_image_faces(progress_callback, image_paths, quality_gate=None, detection_policy='adaptive', job=None,
+                     workers=1, gallery=None, match_distance=DEFAULT_TOLERANCE, preset=DEFAULT_PRESET, governor=None,
+                     sample_fraction=0.0):
+    """
+    The detect/encode stage shared by every workflow. Yields (image_path, face_locations,
+    face_encodings, face_matches) for each image that could be read, in burst-aware order.
+
+    With workers > 1 (or 'auto', see plan_resources) the images are processed in a pool of
+    worker processes. If a shared gallery is given as well, the workers also compare every
+    face with it: face_matches then holds one (rows searched, indices, distances) tuple per
+    face, listing the gallery rows within match_distance. Otherwise face_matches is None.
+
+    Decoding is throttled by a MemoryGovernor; pass one to share its budget with other runs.
+    With a sample_fraction, a stratified sample of the images is processed first (see stratified_order).
+    Every image's outcome goes to the job's run report (see RunReport).
+    """
+    job = job or DEFAULT_JOB
+    governor = governor or MemoryGovernor()
+    total_images = len(image_paths)
+    quality_gate = quality_gate or FaceQualityGate()
+    policy = DetectionPolicy(detection_policy, quality_gate.min_face_size, preset)
+    burst_tracker = BurstTracker(policy.preset['detector'], policy.preset['burst_reuse'])
+    batcher = EncodingBatcher(policy.preset['jitters'])
+    ordered_paths = stratified_order(burst_tracker.order(image_paths), sample_fraction)
+    resources = plan_resources(workers, total_images, preset)
+    report = job.report = RunReport(job.report_path, job.event_root or image_root(image_paths))
+    # Portraits saved while the run is consumed decode from the same budget.
+    job.governor = governor
+
+    try:
+        if resources.workers > 1:
+            results = _detect_in_pool(ordered_paths, resources.workers, policy, burst_tracker, quality_gate, batcher,
+                                      governor, gallery, match_distance,
+                                      _stratified_sample_size(len(ordered_paths), sample_fraction),
+                                      resources.threads_per_worker)
+            for i, (image_path, face_locations, face_encodings, face_matches, error, timings) in enumerate(results):
+                progress_callback(i + 1, total_images, image_path.name)
+                if error:
+                    print(f"  > Error processing {image_path.name}: {error}")
+                    report.failed(image_path, error, timings)
+                    continue
+                report.detected(image_path, face_locations, timings)
+                yield image_path, face_locations, face_encodings, face_matches
+        else:
+            # Encodings arrive a batch at a time, so an image is yielded once its batch is encoded.
+            for i, image_path in enumerate(ordered_paths):
+                progress_callback(i + 1, total_images, image_path.name)
+                timings = {}
+                try:
+                    face_locations, chips = _detect_and_align(image_path, policy, burst_tracker, quality_gate,
+                                                              governor, timings)
+                except Exception as e:
+                    print(f"  > Error processing {image_path.name}: {e}")
+                    report.failed(image_path, str(e), timings)
+                    continue
+                yield from _encoded_images(_batch_encode(batcher, (image_path, face_locations, timings), chips), report)
+            yield from _encoded_images(_batch_encode(batcher), report)
+
+        _finish_detection_run(job, policy, burst_tracker, quality_gate, batcher, governor, resources)
+    finally:
+        report.close()
+        job.report = job.governor = None
+
+def _encoded_images(finished, report):
+    """Turns a batcher's finished (item, encodings, error) tuples into iter_image_faces results."""
+    for (image_path, face_locations, timings), face_encodings, error in finished:
+        if error:
+            print(f"  > Error encoding faces in {image_path.name}: {error}")
+            report.failed(image_path, error, timings)
+            continue
+        report.detected(image_path, face_locations, timings)
+        yield image_path, face_locations, face_encodings, None
+
+# --- Run Report ---
+
+# Report records are written out in batches of this many.
+REPORT_BUFFER_RECORDS = 256
+
+class RunReport:
+    """
+    The per-image results of a detection run, as JSON Lines: one 'image' record per image with
+    its faces, their identities, any error and the milliseconds each stage took, then one 'run'
+    record with the totals. A face's identity is the reference name and/or the discovered person
+    it was matched to, with the match distance. The workflow consuming iter_image_faces adds
+    those (see identified) before the next image comes in, when the record is written.
+    Records are buffered and written out in batches. Images are named relative to root, as
+    in the face index and shard files; without a root, by their full path.
+    """
+
+    def __init__(self, path, root=None):
+        self.path = Path(path)
+        self.root = Path(root).resolve() if root is not None else None
+        self.images = 0
+        self.faces = 0
+        self.errors = 0
+        self.stage_seconds = {}
+        self._pending = None
+        self._buffer = []
+        # Runs outside a prepared workspace (e.g. benchmarks) may not have created the job root yet.
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'w', encoding='utf-8')
+
+    def detected(self, image_path, face_locations, timings):
+        """Starts the record of an image whose faces were found and encoded."""
+        self._commit()
+        self._pending = {'type': 'image', 'image': self._name(image_path), 'error': None,
+                         'faces': [{'location': [int(value) for value in location]} for location in face_locations],
+                         'timings': timings}
+
+    def failed(self, image_path, error, timings):
+        """Records an image that could not be processed."""
+        self._commit()
+        self.errors += 1
+        self._pending = {'type': 'image', 'image': self._name(image_path), 'error': error, 'faces': [],
+                         'timings': timings}
+
+    def identified(self, image_path, identities, seconds):
+        """Adds each face's identity ({'name', 'person', 'distance'}) to the image's record, and the time matching took."""
+        record = self._pending
+        if record is None or record['image'] != self._name(image_path):
+            return
+        for face, identity in zip(record['faces'], identities):
+            distance = identity.get('distance')
+            face.update(identity, distance=round(float(distance), 4) if distance is not None else None)
+        record['timings']['match'] = record['timings'].get('match', 0.0) + seconds
+
+    def finish(self, **details):
+        """Writes the last image's record and a 'run' record with the totals and the given details."""
+        self._commit()
+        self._write({'type': 'run', 'images': self.images, 'faces': self.faces, 'errors': self.errors,
+                     'ms': {stage: round(seconds * 1000, 1) for stage, seconds in self.stage_seconds.items()},
+                     **details})
+
+    def close(self):
+        self._commit()
+        self._flush()
+        self._file.close()
+
+    def _name(self, image_path):
+        if self.root is not None:
+            try:
+                return Path(image_path).resolve().relative_to(self.root).as_posix()
+            except ValueError:
+                pass
+        return str(image_path)
+
+    def _commit(self):
+        record, self._pending = self._pending, None
+        if record is None:
+            return
+        self.images += 1
+        self.faces += len(record['faces'])
+        timings = record.pop('timings')
+        for stage, seconds in timings.items():
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+        record['ms'] = {stage: round(seconds * 1000, 1) for stage, seconds in timings.items()}
+        self._write(record)
+
+    def _write(self, record):
+        self._buffer.append(json.dumps(record, separators=(',', ':')))
+        if len(self._buffer) >= REPORT_BUFFER_RECORDS:
+            self._flush()
+
+    def _flush(self):
+        if self._buffer:
+            self._file.write('\n'.join(self._buffer) + '\n')
+            self._buffer = []
+
+# --- Resource Sizing ---
+
+# Pass as workers to size the worker pool from the machine (see plan_resources).
+AUTO_WORKERS = 'auto'
+# Memory a detection worker needs besides its decoded images (those are budgeted by the
+# MemoryGovernor): the interpreter, NumPy and dlib's models, by detector.
+WORKER_MEMORY_MB = {'hog': 400, 'cnn': 1200}
+# The thread count variables that NumPy's and dlib's BLAS and OpenMP runtimes read.
+THREAD_LIMIT_VARIABLES = ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS',
+                          'NUMEXPR_NUM_THREADS']
+
+# How many runs share this machine at once (e.g. the jobs of a JobQueue). Automatic sizing
+# gives each of them an equal share of the cores and memory.
+_concurrent_runs = 1
+
+def set_concurrent_runs(count):
+    global _concurrent_runs
+    _concurrent_runs = max(1, count)
+
+def parse_workers(value):
+    """Reads a worker setting: a positive number of processes or 'auto'. Raises ValueError otherwise."""
+    if value == AUTO_WORKERS:
+        return value
+    workers = int(value)
+    if workers < 1:
+        raise ValueError(f"Workers must be a positive number or '{AUTO_WORKERS}', got {value}.")
+    return workers
+
+def available_cores():
+    """The cores this process may run on."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def available_memory_mb():
+    """Memory the system can give to new processes without swapping, or None where it cannot be read."""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') // 2 ** 20
+    except (AttributeError, ValueError, OSError):
+        return None
+
+class ResourcePlan:
+    """The worker processes a run uses and the BLAS/OpenMP threads each of them may start."""
+
+    def __init__(self, mode, workers, threads_per_worker, cores, memory_mb):
+        self.mode = mode
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker
+        self.cores = cores
+        self.memory_mb = memory_mb
+
+    def stats(self):
+        """Returns the plan as a plain dict (used by the benchmark)."""
+        return {'mode': self.mode, 'workers': self.workers, 'threads_per_worker': self.threads_per_worker,
+                'cores': self.cores, 'memory_mb': self.memory_mb}
+
+    def summary(self):
+        memory = f"{self.memory_mb} MB" if self.memory_mb is not None else "unknown"
+        return (f"Resources ({self.mode}): {self.workers} worker process(es) with {self.threads_per_worker} "
+                f"BLAS thread(s) each, on {self.cores} core(s) with {memory} of memory available.")
+
+def plan_resources(workers, image_count, preset=DEFAULT_PRESET):
+    """
+    Sizes a run's worker pool. With workers='auto' it takes one worker per core, as long as the
+    workers fit in the available memory and there are chunks of images for them; a number is
+    used as given. Either way each worker's BLAS/OpenMP threads are capped to its share of the
+    cores, so NumPy and dlib threads inside the workers don't oversubscribe the CPU.
+    """
+    cores = max(1, available_cores() // _concurrent_runs)
+    memory_mb = available_memory_mb()
+    if memory_mb is not None:
+        memory_mb //= _concurrent_runs
+    if workers == AUTO_WORKERS:
+        by_memory = memory_mb // WORKER_MEMORY_MB[get_preset(preset)['detector']] if memory_mb is not None else cores
+        chunks = -(-image_count // PARALLEL_CHUNK_SIZE)
+        count = max(1, min(cores, by_memory, chunks))
+    else:
+        count = parse_workers(workers)
+    return ResourcePlan('auto' if workers == AUTO_WORKERS else 'manual', count, max(1, cores // count), cores,
+                        memory_mb)
+
+@contextmanager
+def _thread_limit_environment(threads):
+    """
+    Sets the thread count variables for processes started inside the block, and restores them
+    after. BLAS and OpenMP runtimes read them once, when they load, so a worker must have them
+    in its environment from the start.
+    """
+    saved = {name: os.environ.get(name) for name in THREAD_LIMIT_VARIABLES}
+    os.environ.update({name: str(threads) for name in THREAD_LIMIT_VARIABLES})
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+def _limit_threads(threads):
+    """Caps the threads of the BLAS/OpenMP runtimes this process has already loaded."""
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(threads)
+
+# --- Parallel Detection ---
+
+# Worker processes get contiguous runs of burst-ordered images, so frames of one burst
+# mostly still go through the same burst tracker one after another.
+PARALLEL_CHUNK_SIZE = 8
+# A run is also cut once its estimated cost reaches the total divided by this many chunks
+# per worker, so one very large image never shares a chunk with others.
+CHUNKS_PER_WORKER = 4
+# Rough relative costs, in detection pixels: reading the file, decoding a pixel, and
+# running the detector over one working pixel (at 4x per upsample).
+COST_PER_FILE_BYTE = 0.5
+COST_PER_DECODED_PIXEL = 1.0
+COST_PER_DETECTION_PIXEL = 4.0
+
+# Detection workers are started fresh rather than forked. A forked worker inherits NumPy's and
+# dlib's runtimes already loaded with the parent's thread counts (and, in the app, the loaded
+# models and the GUI); a fresh one loads them after _thread_limit_environment took effect.
+_worker_context = multiprocessing.get_context('spawn')
+
+# Shared galleries a worker process has attached to, by descriptor.
+_worker_galleries = {}
+# The run's memory governor, handed to each worker process when it starts.
+_worker_governor = None
+
+def _init_detection_worker(governor, threads):
+    global _worker_governor
+    _worker_governor = governor
+    _limit_threads(threads)
+
+def _match_gallery(gallery, face_encodings, match_distance):
+    """Compares faces with a shared gallery from inside a worker process."""
+    reader = _worker_galleries.get(gallery)
+    if reader is None:
+        reader = _worker_galleries[gallery] = SharedEncodingReader(gallery)
+    return [reader.neighbours(encoding, match_distance) for encoding in face_encodings]
+
+def _detect_chunk(image_paths, detection_policy, preset, min_face_size, min_sharpness, gallery, match_distance):
+    """Runs in a worker process: detects, encodes and (optionally) matches a run of images."""
+    quality_gate = FaceQualityGate(min_face_size, min_sharpness)
+    policy = DetectionPolicy(detection_policy, min_face_size, preset)
+    burst_tracker = BurstTracker(policy.preset['detector'], policy.preset['burst_reuse'])
+    batcher = EncodingBatcher(policy.preset['jitters'])
+    finished = []
+    for image_path in image_paths:
+        timings = {}
+        try:
+            face_locations, chips = _detect_and_align(image_path, policy, burst_tracker, quality_gate,
+                                                      _worker_governor, timings)
+        except Exception as e:
+            finished.append(((image_path, None, timings), None, str(e)))
+            continue
+        finished.extend(_batch_encode(batcher, (image_path, face_locations, timings), chips))
+    finished.extend(_batch_encode(batcher))
+
+    results = []
+    for (image_path, face_locations, timings), face_encodings, error in finished:
+        face_matches = None
+        if gallery and not error:
+            start = time.perf_counter()
+            face_matches = _match_gallery(gallery, face_encodings, match_distance)
+            _lap(timings, 'match', start)
+        results.append((image_path, face_locations, face_encodings, face_matches, error, timings))
+    burst_tracker.previous = None
+    return results, policy, burst_tracker, quality_gate, batcher
+
+def estimate_image_cost(image_path, policy):
+    """
+    Estimates the work one image takes from its file size and header dimensions, without
+    decoding it. Unreadable images cost their file size (they fail quickly anyway).
+    """
+    try:
+        cost = os.path.getsize(image_path) * COST_PER_FILE_BYTE
+    except OSError:
+        return 0.0
+    try:
+        with Image.open(image_path) as image:
+            max_dimension, upsample = policy.plan(image.size)
+            target = _detection_size(image.size, max_dimension)
+            if target[0] < image.width and target[1] < image.height:
+                image.draft('RGB', target)
+            decoded_pixels = image.width * image.height
+    except Exception:
+        return cost
+    detection_pixels = target[0] * target[1] * 4 ** upsample
+    return cost + decoded_pixels * COST_PER_DECODED_PIXEL + detection_pixels * COST_PER_DETECTION_PIXEL
+
+def plan_chunks(costs, workers, leading=0):
+    """
+    Cuts burst-ordered images (given by their estimated costs) into contiguous chunks of at most
+    PARALLEL_CHUNK_SIZE images and about 1/(workers * CHUNKS_PER_WORKER) of the total cost each.
+    Returns (chunks as (start, stop) ranges, chunk costs, dispatch order).
+
+    Chunks are dispatched largest first, so the slowest work starts early and the small chunks
+    fill in the gaps at the end. The first `leading` images (a progressive preview sample)
+    are chunked and dispatched on their own, ahead of the rest.
+    """
+    target = sum(costs) / max(1, workers * CHUNKS_PER_WORKER)
+    chunks, chunk_costs = [], []
+    for first, last in ((0, leading), (leading, len(costs))):
+        start, total = first, 0.0
+        for i in range(first, last):
+            if i > start and (i - start == PARALLEL_CHUNK_SIZE or total + costs[i] > target):
+                chunks.append((start, i))
+                chunk_costs.append(total)
+                start, total = i, 0.0
+            total += costs[i]
+        if last > start:
+            chunks.append((start, last))
+            chunk_costs.append(total)
+    order = sorted(range(len(chunks)), key=lambda c: (chunks[c][0] >= leading, -chunk_costs[c], c))
+    return chunks, chunk_costs, order
+
+def _estimated_wall_time(chunk_costs, order, workers):
+    """Simulates the pool: each chunk, in dispatch order, goes to the worker that frees up first."""
+    finish_times = [0.0] * workers
+    for c in order:
+        heapq.heappush(finish_times, heapq.heappop(finish_times) + chunk_costs[c])
+    return max(finish_times)
+
+def _detect_in_pool(image_paths, workers, policy, burst_tracker, quality_gate, batcher, governor, gallery,
+                    match_distance, leading=0, threads=1):
+    """
+    Yields (image_path, locations, encodings, matches, error, timings) in order while a process pool works ahead.
+
+    Chunks go into the pool largest first (see plan_chunks). Idle workers take the next chunk
+    from the pool's shared queue, so no worker sits idle while work is left. Results that finish
+    early wait until every chunk before them has been yielded.
+    """
+    costs = [estimate_image_cost(image_path, policy) for image_path in image_paths]
+    chunks, chunk_costs, order = plan_chunks(costs, workers, leading)
+    ideal = sum(costs) / workers
+    if ideal:
+        print(f"--- Scheduled {len(chunks)} chunks largest first on {workers} workers: estimated wall time "
+              f"{_estimated_wall_time(chunk_costs, order, workers) / ideal:.0%} of the ideal "
+              f"(in order: {_estimated_wall_time(chunk_costs, range(len(chunks)), workers) / ideal:.0%}) ---")
+
+    descriptor = gallery.descriptor if gallery is not None else None
+    with _detection_pool(workers, governor, threads) as executor:
+        futures = {}
+        for c in order:
+            start, stop = chunks[c]
+            futures[c] = executor.submit(_detect_chunk, image_paths[start:stop], policy.name, policy.preset_name,
+                                         quality_gate.min_face_size, quality_gate.min_sharpness, descriptor,
+                                         match_distance)
+        for c in range(len(chunks)):
+            results, chunk_policy, chunk_tracker, chunk_gate, chunk_batcher = futures.pop(c).result()
+            policy.merge(chunk_policy)
+            burst_tracker.merge(chunk_tracker)
+            quality_gate.merge(chunk_gate)
+            batcher.merge(chunk_batcher)
+            yield from results
+
+@contextmanager
+def _detection_pool(workers, governor, threads):
+    """
+    A pool of detection worker processes that share the governor and start with their threads
+    capped. Budget held by workers that died mid-image is given back once the pool is shut down.
+    """
+    pool_governor = governor.scoped()
+    with _thread_limit_environment(threads):
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=_worker_context,
+                                       initializer=_init_detection_worker, initargs=(pool_governor, threads))
+        try:
+            yield executor
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            reclaimed = pool_governor.reclaim()
+            if reclaimed:
+                print(f"  > Reclaimed {reclaimed / 1e6:.0f} MB of decode budget from worker processes that exited mid-image.")
+
+# --- Face Index ---
+
+def index_image_faces(image_faces, job=None, preset=DEFAULT_PRESET, quantization=DEFAULT_QUANTIZATION):
+    """
+    Passes (image_path, face_locations, face_encodings, face_matches) tuples through unchanged and,
+    once they are exhausted, writes every image and face seen to the job's face index, with the
+    encodings stored at the given quantization (see face_index.QUANTIZATIONS).
+    """
+    job = job or DEFAULT_JOB
+    indexed = []
+    for image_path, face_locations, face_encodings, face_matches in image_faces:
+        indexed.append((image_path, face_locations, face_encodings))
+        yield image_path, face_locations, face_encodings, face_matches
+    index = FaceIndex.build(indexed, preset, quantization, job.event_root)
+    index.save(job.face_index_path)
+    print(f"--- Indexed {len(index)} faces in {len(index.images)} images at '{job.face_index_path}' "
+          f"({quantization}, {index.bytes_per_face:.0f} bytes per face) ---")
+
+def _first_face_encoding(image_path, settings):
+    """Encodes the first face found in a photo of one person, or returns None."""
+    image = face_recognition.load_image_file(image_path)
+    locations = face_recognition.face_locations(image, 1, settings['detector'])
+    encodings = face_recognition.face_encodings(image, locations, settings['jitters'], settings['landmarks'])
+    return encodings[0] if encodings else None
+
+def search_face_index(index_path, probe_paths, top_k=DEFAULT_TOP_K, max_distance=DEFAULT_TOLERANCE):
+    """
+    Finds the indexed images showing the person in the probe photos. Probes are encoded with
+    the preset the index was built with. Returns (results as in FaceIndex.search, search time in ms).
+    """
+    index = FaceIndex.load(index_path)
+    settings = get_preset(index.preset)
+    probes = []
+    for probe_path in probe_paths:
+        encoding = _first_face_encoding(probe_path, settings)
+        if encoding is None:
+            print(f"  > Warning: No face found in {Path(probe_path).name}.")
+        else:
+            probes.append(encoding)
+    if not probes:
+        raise WorkflowError("No face found in the probe photos.")
+
+    start = time.perf_counter()
+    results = index.search(probes, top_k, max_distance)
+    return results, (time.perf_counter() - start) * 1000
+
 # --- Workflow 1: Reference-Based Sorting ---
 
-def load_reference_encodings(ref_dir):
+def load_reference_encodings(ref_dir, preset=DEFAULT_PRESET):
     """Loads reference images and creates known face encodings."""
     print("--- Loading reference photos ---")
+    settings = get_preset(preset)
     known_face_encodings = []
     known_face_names = []
 
@@ -62,10 +1483,9 @@ def load_reference_encodings(ref_dir):
         name = image_path.stem
         print(f"Processing reference: {name}")
         try:
-            image = face_recognition.load_image_file(image_path)
-            encodings = face_recognition.face_encodings(image)
-            if encodings:
-                known_face_encodings.append(encodings[0])
+            encoding = _first_face_encoding(image_path, settings)
+            if encoding is not None:
+                known_face_encodings.append(encoding)
                 known_face_names.append(name)
                 print(f"  > Found face for {name}.")
             else:
@@ -75,122 +1495,564 @@ def load_reference_encodings(ref_dir):
             
     return known_face_encodings, known_face_names
 
-def find_and_sort_faces_by_reference(progress_callback, image_paths, known_encodings, known_names):
-    """Iterates through event photos, finds faces, and sorts them by reference."""
+def find_and_sort_faces_by_reference(progress_callback, image_paths, known_encodings, known_names, quality_gate=None,
+                                     detection_policy='adaptive', job=None, workers=1, preset=DEFAULT_PRESET,
+                                     governor=None, index_quantization=DEFAULT_QUANTIZATION):
+    """
+    Iterates through event photos, finds faces, and sorts them by reference. Faces that match
+    no reference are grouped into people as they go; returns that FaceStore for a tagging step.
+    """
+    with _reference_image_faces(progress_callback, image_paths, known_encodings, quality_gate, detection_policy, job,
+                                workers, preset, governor, index_quantization) as image_faces:
+        return sort_faces_by_reference(image_faces, known_encodings, known_names, job)
+
+@contextmanager
+def _reference_image_faces(progress_callback, image_paths, known_encodings, quality_gate, detection_policy, job,
+                           workers, preset, governor, index_quantization):
+    """Yields the (image, faces) stream of the event photos, detected for matching against known_encodings."""
     print("--- Sorting event photos by reference ---")
-    total_images = len(image_paths)
+    # Worker processes match against one shared copy of the references instead of a copy per task.
+    gallery = SharedEncodingMatrix(known_encodings) if workers != 1 else None
+    try:
+        image_faces = iter_image_faces(progress_callback, image_paths, quality_gate, detection_policy, job,
+                                       workers, gallery, preset=preset, governor=governor)
+        yield index_image_faces(image_faces, job, preset, index_quantization)
+    finally:
+        if gallery is not None:
+            gallery.close()
+
+def match_reference_faces(face_encodings, face_matches, known_encodings):
+    """Returns, for each face, the index of the first reference it matches, or None."""
+    return [match for match, _ in match_reference_distances(face_encodings, face_matches, known_encodings)]
+
+def match_reference_distances(face_encodings, face_matches, known_encodings):
+    """Returns, for each face, (index of the first reference it matches, distance to it), or (None, None)."""
+    matched = []
+    for n, face_encoding in enumerate(face_encodings):
+        if face_matches:
+            # Already compared in a worker: the references within tolerance, in order.
+            _, matches, distances = face_matches[n]
+        else:
+            distances = face_recognition.face_distance(known_encodings, face_encoding)
+            matches = np.flatnonzero(distances <= DEFAULT_TOLERANCE)
+            distances = distances[matches]
+        matched.append((int(matches[0]), float(distances[0])) if len(matches) else (None, None))
+    return matched
 
-    for i, image_path in enumerate(image_paths):
-        progress_callback(i + 1, total_images, image_path.name)
+def match_reference_names(face_encodings, face_matches, known_encodings, known_names):
+    """Returns the names of the reference people found among an image's faces, in face order."""
+    names = []
+    for match in match_reference_faces(face_encodings, face_matches, known_encodings):
+        if match is not None and known_names[match] not in names:
+            names.append(known_names[match])
+    return names
+
+def sort_faces_by_reference(image_faces, known_encodings, known_names, job=None):
+    """
+    Copies each image into the folder of every reference person found in it. Faces that match
+    no reference are grouped into unknown people, with a portrait saved for each new one, from
+    the encodings already computed. Returns the FaceStore of unknown people.
+    """
+    job = job or DEFAULT_JOB
+    unknown_store = FaceStore()
+    for image_path, face_locations, face_encodings, face_matches in image_faces:
         try:
-            image = face_recognition.load_image_file(image_path)
-            face_locations = face_recognition.face_locations(image)
-            face_encodings = face_recognition.face_encodings(image, face_locations)
-            
-            people_found_in_image = set()
-            for face_encoding in face_encodings:
-                matches = face_recognition.compare_faces(known_encodings, face_encoding)
-                if True in matches:
-                    name = known_names[matches.index(True)]
-                    if name not in people_found_in_image:
-                        person_dir = OUTPUT_DIR / name
-                        person_dir.mkdir(exist_ok=True)
-                        shutil.copy2(image_path, person_dir)
-                        people_found_in_image.add(name)
-            
+            start = time.perf_counter()
+            matched = match_reference_distances(face_encodings, face_matches, known_encodings)
+            people_found_in_image = []
+            identities = []
+            for location, face_encoding, (match, distance) in zip(face_locations, face_encodings, matched):
+                if match is None:
+                    face_index, is_new_person = unknown_store.add_face(image_path, location, face_encoding)
+                    person = unknown_store.assignments[face_index]
+                    identities.append({'name': None, 'person': person,
+                                       'distance': unknown_store.match_distance(face_index)})
+                    if is_new_person:
+                        _save_portrait_or_warn(image_path, location, face_index, job)
+                else:
+                    identities.append({'name': known_names[match], 'person': None, 'distance': distance})
+                    if known_names[match] not in people_found_in_image:
+                        people_found_in_image.append(known_names[match])
+            if job.report is not None:
+                job.report.identified(image_path, identities, time.perf_counter() - start)
+
+            for name in people_found_in_image:
+                person_dir = job.output_dir / name
+                person_dir.mkdir(exist_ok=True)
+                shutil.copy2(image_path, person_dir / output_name(image_path, job))
+
             if not people_found_in_image:
                  print(f"  > No known faces found in {image_path.name}.")
         except Exception as e:
             print(f"  > Error processing {image_path.name}: {e}")
 
-def copy_reference_photos(ref_dir):
+    print(f"--- {len(unknown_store)} face(s) matched no reference: {len(unknown_store.people)} unknown people ---")
+    return unknown_store
+
+def copy_reference_photos(ref_dir, job=None):
     """Copies reference photos into their corresponding output folders."""
     print("--- Copying reference photos to output folders ---")
+    job = job or DEFAULT_JOB
     for image_path in ref_dir.rglob('*'):
         if not _is_image_file(image_path):
             continue
         name = image_path.stem
-        person_dir = OUTPUT_DIR / name
+        person_dir = job.output_dir / name
         if person_dir.exists():
             shutil.copy2(image_path, person_dir)
 
 # --- Workflow 2: Automatic Discovery ---
 
-def find_unique_faces(progress_callback, image_paths, tolerance=0.6):
-    """Analyzes all event photos to discover unique individuals."""
+def find_unique_faces(progress_callback, image_paths, tolerance=DEFAULT_TOLERANCE, quality_gate=None,
+                      detection_policy='adaptive', job=None, workers=1, preset=DEFAULT_PRESET, governor=None,
+                      index_quantization=DEFAULT_QUANTIZATION, known_encodings=None, known_names=None, listener=None,
+                      sample_fraction=0.0):
+    """
+    Analyzes all event photos to discover unique individuals. Returns a FaceStore.
+    With reference encodings and names, the references are known people from the start
+    (hybrid mode): every face joins a reference person or a newly discovered one in the same pass.
+
+    For progressive discovery, pass a listener (see discover_people) and a sample_fraction:
+    a stratified sample of the event is then processed first and results stream out as they come.
+    """
     print("--- Discovering unique faces in event photos ---")
-    discovered_encodings = []
-    all_face_metadata = []
-    total_images = len(image_paths)
+    # Worker processes compare new faces with the faces discovered so far, which are
+    # published to shared memory as discovery goes on. The references are its first rows.
+    gallery = SharedEncodingMatrix(known_encodings) if workers != 1 else None
+    try:
+        image_faces = iter_image_faces(progress_callback, image_paths, quality_gate, detection_policy, job,
+                                       workers, gallery, NEIGHBOUR_DISTANCE_CAP, preset, governor, sample_fraction)
+        image_faces = index_image_faces(image_faces, job, preset, index_quantization)
+        return discover_people(image_faces, tolerance, job, gallery, known_encodings, known_names, listener)
+    finally:
+        if gallery is not None:
+            gallery.close()
 
-    for i, image_path in enumerate(image_paths):
-        progress_callback(i + 1, total_images, image_path.name)
+def discover_people(image_faces, tolerance=DEFAULT_TOLERANCE, job=None, gallery=None, known_encodings=None,
+                    known_names=None, listener=None):
+    """
+    Groups already encoded faces into people, saving a portrait for each new person. Returns a FaceStore,
+    seeded with the reference people if any are given. Every face is also appended to the shared gallery,
+    if one is given (holding the references already), for worker processes to match against.
+
+    A listener's face_added(face_store, face_index, is_new_person) is called for every face,
+    once its portrait (if it started a new person) has been saved.
+    """
+    job = job or DEFAULT_JOB
+    face_store = FaceStore(tolerance)
+    if known_names:
+        face_store.seed(known_names, known_encodings)
+    for image_path, face_locations, face_encodings, face_matches in image_faces:
         try:
-            image_data = face_recognition.load_image_file(image_path)
-            face_locations = face_recognition.face_locations(image_data)
-            face_encodings = face_recognition.face_encodings(image_data, face_locations)
-
-            if not face_encodings:
-                continue
-
-            for j, face_encoding in enumerate(face_encodings):
-                all_face_metadata.append({'path': image_path, 'encoding': face_encoding})
-                matches = face_recognition.compare_faces(discovered_encodings, face_encoding, tolerance)
-                if True not in matches:
-                    discovered_encodings.append(face_encoding)
-                    _save_portrait(image_path, face_locations[j], len(discovered_encodings) - 1)
+            identities = []
+            seconds = 0.0
+            for n, (location, face_encoding) in enumerate(zip(face_locations, face_encodings)):
+                start = time.perf_counter()
+                neighbours = face_matches[n] if face_matches else None
+                face_index, is_new_person = face_store.add_face(image_path, location, face_encoding, neighbours)
+                if gallery is not None:
+                    gallery.append(face_encoding)
+                person = face_store.assignments[face_index]
+                identities.append({'name': face_store.known_names.get(person), 'person': person,
+                                   'distance': face_store.match_distance(face_index)})
+                seconds += time.perf_counter() - start
+                if is_new_person:
+                    _save_portrait_or_warn(image_path, location, face_index, job)
+                if listener is not None:
+                    listener.face_added(face_store, face_index, is_new_person)
+            if job.report is not None:
+                job.report.identified(image_path, identities, seconds)
         except Exception as e:
             print(f"  > Error processing {image_path.name}: {e}")
-            
-    print(f"--- Discovery complete. Found {len(discovered_encodings)} unique people. ---")
-    return discovered_encodings, all_face_metadata
 
-def _save_portrait(image_path, location, person_index):
-    """Helper function to crop and save a face portrait."""
+    if face_store.seeded:
+        print(f"--- Discovery complete. Found {len(face_store.unnamed_people)} unique people "
+              f"besides {len(face_store.known_names)} reference people. ---")
+    else:
+        print(f"--- Discovery complete. Found {len(face_store.people)} unique people. ---")
+    return face_store
+
+def read_portrait(face_index, job=None):
+    """Returns the JPEG data of the portrait cropped from a given face, or None if it has none."""
+    return (job or DEFAULT_JOB).portraits.read(face_index)
+
+def _save_portrait(image_path, location, face_index, job=None):
+    """
+    Helper function to crop a face portrait and add it to the job's portrait pack. The image is
+    decoded within MAX_DECODE_PIXELS, and through the memory governor of a run in progress.
+    """
+    job = job or DEFAULT_JOB
     top, right, bottom, left = location
-    image = Image.open(image_path)
-    face_image = image.crop((left, top, right, bottom))
-    
+    with Image.open(image_path) as image:
+        full_width, full_height = image.size
+    shrink = min(1.0, PORTRAIT_MIN_FACE_SIZE / max(min(bottom - top, right - left), 1),
+                 (MAX_DECODE_PIXELS / (full_width * full_height)) ** 0.5)
+    size = (max(1, int(full_width * shrink)), max(1, int(full_height * shrink)))
+    with job.governor.reserve(3 * _decoded_pixels(image_path, size)) if job.governor else nullcontext():
+        image, scale = _decode_at_least(image_path, size)
+        top, right, bottom, left = _scale_location(location, 1 / scale)
+        face_image = image.crop((left, top, right, bottom))
+        del image
+
     padding = 20
     padded_image = Image.new(face_image.mode, (face_image.width + 2*padding, face_image.height + 2*padding), (255, 255, 255, 0))
     padded_image.paste(face_image, (padding, padding))
 
-    portrait_path = UNKNOWN_PORTRAITS_DIR / f"person_{person_index}.png"
-    padded_image.save(portrait_path)
+    job.portraits.add(face_index, padded_image)
 
-def sort_photos_by_discovered_faces(progress_callback, all_face_metadata, discovered_encodings, user_names, tolerance=0.6):
-    """Sorts photos based on the names provided by the user."""
+def _save_portrait_or_warn(image_path, location, face_index, job=None):
+    """Saves a portrait; a failure only costs the portrait, not the rest of the image's faces."""
+    try:
+        _save_portrait(image_path, location, face_index, job)
+    except Exception as e:
+        print(f"  > Error saving portrait from {image_path.name}: {e}")
+
+def save_missing_portraits(progress_callback, face_store, job=None):
+    """Saves portraits for people whose first face does not have one yet (e.g. after re-clustering)."""
+    # Reference people have no face in the event to crop, and need no portrait.
+    portraits = (job or DEFAULT_JOB).portraits
+    missing = [i for i in face_store.representatives
+               if i is not None and face_store.faces[i]['path'] is not None and i not in portraits]
+    for n, face_index in enumerate(missing):
+        face = face_store.faces[face_index]
+        progress_callback(n + 1, len(missing), face['path'].name)
+        _save_portrait_or_warn(face['path'], face['location'], face_index, job)
+    return len(missing)
+
+def sort_photos_by_discovered_faces(progress_callback, face_store, user_names, job=None):
+    """
+    Sorts photos based on the names provided by the user (keyed by person id). People seeded
+    from references always keep their reference name.
+    """
     print("--- Sorting photos based on user tags ---")
-    name_map = {idx: name for idx, name in user_names.items() if name}
+    job = job or DEFAULT_JOB
+    name_map = {idx: name for idx, name in {**user_names, **face_store.known_names}.items() if name}
     
     # Use a set to track which photos have been processed to avoid duplicate progress updates
     processed_photos = set()
-    total_photos = len(set(meta['path'] for meta in all_face_metadata))
+    total_photos = len(set(face['path'] for face in face_store.faces[face_store.seeded:]))
     
-    for metadata in all_face_metadata:
-        image_path = metadata['path']
+    for face, person_index in zip(face_store.faces, face_store.assignments):
+        image_path = face['path']
+        if image_path is None:
+            continue
         if image_path not in processed_photos:
             progress_callback(len(processed_photos) + 1, total_photos, image_path.name)
             processed_photos.add(image_path)
 
-        face_encoding = metadata['encoding']
-        matches = face_recognition.compare_faces(discovered_encodings, face_encoding, tolerance)
-        if True in matches:
-            match_index = matches.index(True)
-            if match_index in name_map:
-                name = name_map[match_index]
-                person_dir = OUTPUT_DIR / name
-                person_dir.mkdir(exist_ok=True)
-                if not (person_dir / image_path.name).exists():
-                    shutil.copy2(image_path, person_dir)
+        if person_index in name_map:
+            name = name_map[person_index]
+            person_dir = job.output_dir / name
+            person_dir.mkdir(exist_ok=True)
+            target = person_dir / output_name(image_path, job)
+            if not target.exists():
+                shutil.copy2(image_path, target)
+
+# --- Progressive Sorting ---
+
+class ProgressiveSorter:
+    """
+    Lets the operator tag people while discovery is still running. It listens to discover_people:
+    new people are collected for the tagging screen as soon as their portrait exists, and a photo
+    is copied into a person's folder as soon as the person is named and the photo is processed.
+    Copies run on one background thread so neither discovery nor the UI waits for them.
+
+    The copies made along the way are a preview. finish() brings the output in line with the
+    final names and clusters, removing copies that no longer apply (e.g. after a rename or a
+    re-clustering) and adding the missing ones.
+    """
+
+    def __init__(self, job=None):
+        self.job = job or DEFAULT_JOB
+        self.face_store = None
+        self.new_people = []          # people discovered so far, ready to show
+        self._names = {}              # person id -> name entered during discovery
+        self._copied = set()          # (image path, name) copies made along the way
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="progressive-sort")
+
+    def face_added(self, face_store, face_index, is_new_person):
+        with self._lock:
+            self.face_store = face_store
+            person = face_store.assignments[face_index]
+            if is_new_person and person not in face_store.known_names:
+                self.new_people.append(person)
+            name = self._names.get(person) or face_store.known_names.get(person)
+            if name:
+                self._copy(face_store.faces[face_index]['path'], name)
+
+    def name_person(self, person, name):
+        """Applies a tag entered during discovery to the person's photos processed so far, and to later ones."""
+        with self._lock:
+            self._names[person] = name
+            if self.face_store is not None and name:
+                for face_index in self.face_store.faces_of(person):
+                    self._copy(self.face_store.faces[face_index]['path'], name)
+
+    def finish(self, progress_callback, face_store, user_names):
+        """Waits for pending copies, then sorts with the final names exactly as sort_photos_by_discovered_faces would."""
+        self._executor.shutdown(wait=True)
+        names = {person: name for person, name in {**user_names, **face_store.known_names}.items() if name}
+        wanted = {(face['path'], names[person]) for face, person in zip(face_store.faces, face_store.assignments)
+                  if face['path'] is not None and person in names}
+        stale = self._copied - wanted
+        wanted_files = {(name, output_name(image_path, self.job)) for image_path, name in wanted}
+        for image_path, name in stale:
+            # A same-named photo may be wanted in that folder.
+            file_name = output_name(image_path, self.job)
+            if (name, file_name) not in wanted_files:
+                (self.job.output_dir / name / file_name).unlink(missing_ok=True)
+        for name in {name for _, name in stale}:
+            person_dir = self.job.output_dir / name
+            if person_dir.is_dir() and not any(person_dir.iterdir()):
+                person_dir.rmdir()
+        if stale:
+            print(f"--- Removed {len(stale)} preview copies that no longer match the tags ---")
+        sort_photos_by_discovered_faces(progress_callback, face_store, user_names, job=self.job)
+
+    def _copy(self, image_path, name):
+        if image_path is None or (image_path, name) in self._copied:
+            return
+        self._copied.add((image_path, name))
+        self._executor.submit(self._copy_now, image_path, name)
+
+    def _copy_now(self, image_path, name):
+        try:
+            person_dir = self.job.output_dir / name
+            person_dir.mkdir(exist_ok=True)
+            target = person_dir / output_name(image_path, self.job)
+            if not target.exists():
+                shutil.copy2(image_path, target)
+        except Exception as e:
+            print(f"  > Error copying {image_path.name}: {e}")
 
 # --- Finalization ---
 
+class WorkflowError(Exception):
+    """A workflow ran but could not produce a result, e.g. because no reference faces were found."""
+
 def create_download_zip(output_dir, download_path):
     """Creates a final zip file of the sorted output directory."""
     print(f"--- Creating final zip file at '{download_path}' ---")
+    # Written with zipfile rather than shutil.make_archive, which changes the process-wide
+    # working directory on older Pythons and would break jobs running alongside. Photos are
+    # already compressed, so they are stored as they are.
     try:
-        shutil.make_archive(str(download_path.with_suffix('')), 'zip', str(output_dir))
+        with zipfile.ZipFile(download_path, 'w', zipfile.ZIP_STORED) as zip_file:
+            for path in sorted(Path(output_dir).rglob('*')):
+                zip_file.write(path, path.relative_to(output_dir))
         print("Zip file created successfully.")
     except Exception as e:
         print(f"Error creating zip file: {e}")
+
+# --- Incremental Re-sort ---
+
+SORT_MANIFEST_VERSION = 1
+
+def plan_output(face_store, user_names, reference_dir=None, job=None):
+    """
+    The sorted output as {person name: {file name: source photo}}, laid out the way
+    sort_photos_by_discovered_faces and copy_reference_photos do it.
+    """
+    names = {person: name for person, name in {**user_names, **face_store.known_names}.items() if name}
+    plan = {}
+    for face, person in zip(face_store.faces, face_store.assignments):
+        if face['path'] is not None and person in names:
+            plan.setdefault(names[person], {}).setdefault(output_name(face['path'], job), str(face['path']))
+    if reference_dir is not None:
+        for image_path in Path(reference_dir).rglob('*'):
+            if _is_image_file(image_path) and image_path.stem in plan:
+                plan[image_path.stem][image_path.name] = str(image_path)
+    return plan
+
+def write_sort_manifest(job, face_store, user_names, reference_dir=None):
+    """Records what a finished sort put in the output, so later tag edits can be applied as a diff (see resort_photos)."""
+    _save_sort_manifest(job, plan_output(face_store, user_names, reference_dir, job))
+
+def _save_sort_manifest(job, plan):
+    with open(job.sort_manifest_path, 'w') as f:
+        json.dump({'version': SORT_MANIFEST_VERSION, 'people': plan}, f)
+
+def resort_photos(progress_callback, face_store, user_names, job, reference_dir=None):
+    """
+    Applies tag edits made after a sort as a diff against its manifest. A folder whose photos
+    all go to a name without a folder yet is renamed; otherwise only the photos whose folder
+    changed are moved, copied or removed. In the output folder that is all the work a retag
+    costs, and the zip is changed in place by the same diff (see _update_download_zip): only
+    the changed photos are read and appended, including every photo of a renamed folder.
+    Returns the number of photos that changed.
+    """
+    print("--- Re-sorting photos after tag edits ---")
+    with open(job.sort_manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get('version') != SORT_MANIFEST_VERSION:
+        raise ValueError(f"'{job.sort_manifest_path}' has unsupported version {manifest.get('version')}.")
+    old = manifest['people']
+    new = plan_output(face_store, user_names, reference_dir, job)
+
+    vacated = {tuple(sorted(files.items())): name for name, files in old.items() if name not in new}
+    renames = {}
+    for name, files in new.items():
+        old_name = vacated.pop(tuple(sorted(files.items())), None) if name not in old else None
+        if old_name is not None:
+            renames[old_name] = name
+    for old_name, name in renames.items():
+        (job.output_dir / old_name).rename(job.output_dir / name)
+    current = {renames.get(name, name): files for name, files in old.items()}
+
+    removed = [(name, file_name) for name, files in current.items() for file_name, source in files.items()
+               if new.get(name, {}).get(file_name) != source]
+    added = [(name, file_name, source) for name, files in new.items() for file_name, source in files.items()
+             if current.get(name, {}).get(file_name) != source]
+
+    # Photos that only change folders are moved aside first, then moved into place.
+    staging_dir = job.temp_dir / f"resort-{uuid.uuid4().hex[:8]}"
+    staging_dir.mkdir(parents=True)
+    staged = {}
+    arriving = {source for _, _, source in added}
+    for name, file_name in removed:
+        path = job.output_dir / name / file_name
+        source = current[name][file_name]
+        if source in arriving and source not in staged:
+            staged[source] = staging_dir / f"{len(staged)}{path.suffix}"
+            path.rename(staged[source])
+        else:
+            path.unlink(missing_ok=True)
+    for n, (name, file_name, source) in enumerate(added):
+        progress_callback(n + 1, len(added), file_name)
+        person_dir = job.output_dir / name
+        person_dir.mkdir(exist_ok=True)
+        if source in staged:
+            staged.pop(source).rename(person_dir / file_name)
+        else:
+            shutil.copy2(source, person_dir / file_name)
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    for name in {name for name, _ in removed}:
+        person_dir = job.output_dir / name
+        if name not in new and person_dir.is_dir() and not any(person_dir.iterdir()):
+            person_dir.rmdir()
+
+    _update_download_zip(job, current, new, renames, removed, added)
+    _save_sort_manifest(job, new)
+    print(f"--- Re-sorted {len(renames)} renamed folder(s), {len(removed)} removed and {len(added)} added photo(s) ---")
+    return len(removed) + len(added)
+
+def _update_download_zip(job, current, new, renames, removed, added):
+    """
+    Brings the zip in line with a re-sort by dropping and appending only the changed entries, in
+    place (see zip_append). Entries of a renamed folder count as changed, since their names do.
+    The zip is written anew when it is missing or damaged, or when dropped entries have piled up.
+    """
+    drop = {f"{name}/{file_name}" for name, file_name in removed}
+    drop |= {f"{name}/" for name in current if name not in new}
+    write = [f"{name}/{file_name}" for name, file_name, _ in added]
+    write += [f"{name}/" for name in new if name not in current]
+    for old_name, name in renames.items():
+        drop |= {f"{old_name}/"} | {f"{old_name}/{file_name}" for file_name in current[name]}
+        write += [f"{name}/"] + [f"{name}/{file_name}" for file_name in new[name]
+                                 if f"{name}/{file_name}" not in write]
+    additions = [(arcname, job.output_dir / arcname) for arcname in sorted(set(write))]
+    try:
+        if job.download_zip_path.exists() and append_entries(job.download_zip_path, drop, additions):
+            return
+    except (OSError, zipfile.BadZipFile) as e:
+        print(f"  > Could not update the zip in place ({e}), writing it anew.")
+    create_download_zip(job.output_dir, job.download_zip_path)
+
+# --- Headless Runs ---
+
+def prepare_references(reference_source, job):
+    """Returns a folder of reference photos, extracting them first if a .zip was given."""
+    reference_dir = Path(reference_source)
+    if not reference_dir.is_dir():
+        extract_zip(reference_dir, job.extracted_references_dir)
+        reference_dir = job.extracted_references_dir
+    return reference_dir
+
+def load_references_or_fail(reference_dir, preset=DEFAULT_PRESET):
+    known_encodings, known_names = load_reference_encodings(reference_dir, preset)
+    if not known_encodings:
+        print("Processing stopped: No reference faces were loaded.")
+        raise WorkflowError("No reference faces found.")
+    return known_encodings, known_names
+
+def sort_unknown_people(progress_callback, unknown_store, job, prefix="Unknown_"):
+    """Sorts the people no reference matched as Unknown_1, Unknown_2, ... in discovery order, for runs without a tagging step."""
+    user_names = {person: f"{prefix}{n}" for n, person in enumerate(unknown_store.people, 1)}
+    sort_photos_by_discovered_faces(progress_callback, unknown_store, user_names, job=job)
+
+def finish_reference_run(image_faces, reference_dir, known_encodings, known_names, job, progress_callback=None,
+                         unknown_people=False):
+    """
+    Sorts encoded images by reference, adds the reference photos and zips the output.
+    With unknown_people, the faces no reference matched are sorted into Unknown_N folders too.
+    """
+    unknown_store = sort_faces_by_reference(image_faces, known_encodings, known_names, job)
+    if unknown_people:
+        sort_unknown_people(progress_callback or (lambda *args: None), unknown_store, job)
+    copy_reference_photos(reference_dir, job=job)
+    create_download_zip(job.output_dir, job.download_zip_path)
+    return job.download_zip_path
+
+def finish_discovery_run(progress_callback, face_store, job, reference_dir=None):
+    """
+    Names discovered people Person_1, Person_2, ... in discovery order, sorts and zips the output.
+    People seeded from references keep their names, and their reference photos are added from reference_dir.
+    """
+    if len(face_store) == face_store.seeded:
+        raise WorkflowError("Could not find any faces in the provided photos.")
+    user_names = {person: f"Person_{n}" for n, person in enumerate(face_store.unnamed_people, 1)}
+    sort_photos_by_discovered_faces(progress_callback, face_store, user_names, job=job)
+    if reference_dir is not None:
+        copy_reference_photos(reference_dir, job=job)
+    create_download_zip(job.output_dir, job.download_zip_path)
+    return job.download_zip_path
+
+def run_reference_workflow(progress_callback, event_source, reference_source, job, detection_policy='adaptive',
+                           quality_gate=None, workers=1, preset=DEFAULT_PRESET, governor=None,
+                           index_quantization=DEFAULT_QUANTIZATION, unknown_people=False):
+    """
+    Runs Workflow 1 end to end on a .zip or folder of events and references. Returns the result zip path.
+    With unknown_people, faces that match no reference are sorted into Unknown_1, Unknown_2, ... folders.
+    """
+    setup_directories(job)
+    image_paths = collect_images(event_source, job.extracted_events_dir, job)
+    reference_dir = prepare_references(reference_source, job)
+    known_encodings, known_names = load_references_or_fail(reference_dir, preset)
+
+    with _reference_image_faces(progress_callback, image_paths, known_encodings, quality_gate, detection_policy, job,
+                                workers, preset, governor, index_quantization) as image_faces:
+        return finish_reference_run(image_faces, reference_dir, known_encodings, known_names, job,
+                                    progress_callback, unknown_people)
+
+def run_discovery_workflow(progress_callback, event_source, job, tolerance=DEFAULT_TOLERANCE,
+                           detection_policy='adaptive', quality_gate=None, workers=1, preset=DEFAULT_PRESET,
+                           governor=None, index_quantization=DEFAULT_QUANTIZATION):
+    """
+    Runs Workflow 2 without a tagging step: discovered people are named Person_1, Person_2, ...
+    in discovery order. Returns the result zip path.
+    """
+    setup_directories(job)
+    image_paths = collect_images(event_source, job.extracted_events_dir, job)
+    face_store = find_unique_faces(progress_callback, image_paths, tolerance, quality_gate=quality_gate,
+                                   detection_policy=detection_policy, job=job, workers=workers, preset=preset,
+                                   governor=governor, index_quantization=index_quantization)
+    return finish_discovery_run(progress_callback, face_store, job)
+
+def run_hybrid_workflow(progress_callback, event_source, reference_source, job, tolerance=DEFAULT_TOLERANCE,
+                        detection_policy='adaptive', quality_gate=None, workers=1, preset=DEFAULT_PRESET,
+                        governor=None, index_quantization=DEFAULT_QUANTIZATION):
+    """
+    Runs discovery seeded with reference people in a single detection pass. Faces of the
+    reference people are sorted under their names, everyone else as Person_1, Person_2, ...
+    Returns the result zip path.
+    """
+    setup_directories(job)
+    image_paths = collect_images(event_source, job.extracted_events_dir, job)
+    reference_dir = prepare_references(reference_source, job)
+    known_encodings, known_names = load_references_or_fail(reference_dir, preset)
+    face_store = find_unique_faces(progress_callback, image_paths, tolerance, quality_gate=quality_gate,
+                                   detection_policy=detection_policy, job=job, workers=workers, preset=preset,
+                                   governor=governor, index_quantization=index_quantization,
+                                   known_encodings=known_encodings, known_names=known_names)
+    return finish_discovery_run(progress_callback, face_store, job, reference_dir)
@@ -0,0 +1,243 @@
+"""
+A persisted index of every face found in one run, for finding a guest's photos later
+without detecting and encoding the event again.
+
+The index is one .npz file: a manifest (the images, relative to the event root, and
+each face's image and location) and the face encodings. The encodings can be kept
+quantized to save memory on large libraries:
+
+    float32  exact vectors, 512 bytes per face
+    float16  half precision, 256 bytes per face
+    int8     one byte per value, scaled per dimension, 128 bytes per face
+    pq       product quantization: one byte for each of 16 sub-vectors, 16 bytes per face
+
+Quantized distances are approximate, so every face that comes close enough is scored
+again against its exact vector. Those are stored in a separate .npy file next to the
+index that is memory-mapped, so only the rows being re-ranked are ever read.
+"""
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from face_store import DEFAULT_TOLERANCE
+
+FACE_INDEX_VERSION = 2
+DEFAULT_TOP_K = 10
+
+QUANTIZATIONS = ['float32', 'float16', 'int8', 'pq']
+DEFAULT_QUANTIZATION = 'float32'
+# Faces whose quantized distance is within this factor of the tolerance are re-ranked exactly.
+RERANK_SLACK = {'float32': 1.0, 'float16': 1.01, 'int8': 1.05, 'pq': 1.3}
+# Product quantization: the 128 values are cut into sub-vectors, each replaced by the
+# nearest of up to 256 centroids learned with k-means on a sample of the faces.
+PQ_SUBSPACES = 16
+PQ_CENTROIDS = 256
+PQ_TRAINING_SAMPLE = 20000
+PQ_ITERATIONS = 12
+# Quantized rows are compared in slices of this many, to bound the temporary memory.
+SEARCH_CHUNK_ROWS = 65536
+
+def image_root(image_paths):
+    """The deepest folder holding all the images, which they are named relative to when no event root is known."""
+    paths = [Path(path).resolve() for path in image_paths]
+    if not paths:
+        return Path('.')
+    root = Path(os.path.commonpath(paths))
+    return root.parent if len(paths) == 1 else root
+
+def exact_vectors_path(index_path):
+    """Where the exact vectors of a quantized index are kept."""
+    return Path(index_path).with_suffix('.exact.npy')
+
+# --- Quantization ---
+
+def _train_pq(encodings):
+    """Learns PQ_CENTROIDS centroids per sub-vector. Returns an (subspaces, centroids, width) array."""
+    rng = np.random.default_rng(0)
+    sample = encodings[rng.permutation(len(encodings))[:PQ_TRAINING_SAMPLE]].astype(np.float32)
+    width = sample.shape[1] // PQ_SUBSPACES
+    count = min(PQ_CENTROIDS, len(sample))
+    centroids = np.empty((PQ_SUBSPACES, count, width), dtype=np.float32)
+    for m in range(PQ_SUBSPACES):
+        vectors = sample[:, m * width:(m + 1) * width]
+        current = vectors[:count].copy()
+        for _ in range(PQ_ITERATIONS):
+            labels = _nearest_centroids(vectors, current)
+            sums = np.zeros_like(current)
+            np.add.at(sums, labels, vectors)
+            counts = np.bincount(labels, minlength=count)
+            filled = counts > 0
+            # Empty clusters keep their old centroid.
+            current[filled] = sums[filled] / counts[filled, None]
+        centroids[m] = current
+    return centroids
+
+def _nearest_centroids(vectors, centroids):
+    squared = (np.einsum('ij,ij->i', centroids, centroids)[None, :] - 2 * (vectors @ centroids.T))
+    return squared.argmin(axis=1)
+
+def train_codec(encodings, quantization):
+    """The parameters a quantization needs, learned from the encodings (empty for float formats)."""
+    if quantization == 'int8':
+        scale = np.abs(encodings).max(axis=0) / 127 if len(encodings) else np.ones(encodings.shape[1])
+        return {'scale': np.where(scale > 0, scale, 1).astype(np.float32)}
+    if quantization == 'pq':
+        return {'centroids': _train_pq(encodings)} if len(encodings) else {}
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Quantization must be one of: {', '.join(QUANTIZATIONS)}.")
+    return {}
+
+def quantize(encodings, quantization, codec):
+    """Turns exact encodings into the stored codes."""
+    if quantization == 'float16':
+        return encodings.astype(np.float16)
+    if quantization == 'int8':
+        return np.clip(np.rint(encodings / codec['scale']), -127, 127).astype(np.int8)
+    if quantization == 'pq':
+        centroids = codec.get('centroids')
+        if centroids is None:
+            return np.empty((0, PQ_SUBSPACES), dtype=np.uint8)
+        width = centroids.shape[2]
+        return np.stack([_nearest_centroids(encodings[:, m * width:(m + 1) * width].astype(np.float32), centroids[m])
+                         for m in range(PQ_SUBSPACES)], axis=1).astype(np.uint8)
+    return encodings.astype(np.float32)
+
+def _dequantize(codes, quantization, codec):
+    if quantization == 'int8':
+        return codes.astype(np.float32) * codec['scale']
+    return codes.astype(np.float32)
+
+# --- Face Index ---
+
+class FaceIndex:
+    """
+    The faces of one run: face i is in images[face_images[i]] at locations[i] with encodings[i].
+    Images without faces are listed too, so the index records everything the run looked at.
+
+    Searches scan the quantized codes; encodings (the exact vectors) are only read for the
+    faces that come close. The codes and codec of a loaded index are passed in as they were saved.
+    """
+
+    def __init__(self, root, images, face_images, locations, encodings, preset,
+                 quantization=DEFAULT_QUANTIZATION, codec=None, codes=None):
+        self.root = root
+        self.images = list(images)
+        self.face_images = np.asarray(face_images, dtype=np.int32)
+        self.locations = np.asarray(locations, dtype=np.int32).reshape(-1, 4)
+        # A memory-mapped file stays one; anything else becomes an in-memory float32 matrix.
+        if not isinstance(encodings, np.memmap):
+            encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, 128)
+        self.encodings = encodings
+        self.preset = preset
+        self.quantization = quantization
+        self.codec = train_codec(self.encodings, quantization) if codec is None else codec
+        self.codes = quantize(self.encodings, quantization, self.codec) if codes is None else codes
+        self._squared_norms = None
+        if quantization != 'pq':
+            self._squared_norms = np.concatenate(
+                [np.einsum('ij,ij->i', rows, rows) for rows in self._chunks()] or [np.empty(0, np.float32)])
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def bytes_per_face(self):
+        """Memory a search holds per face: the codes plus any precomputed norms."""
+        norms = self._squared_norms.nbytes if self._squared_norms is not None else 0
+        return (self.codes.nbytes + norms) / len(self) if len(self) else 0.0
+
+    @classmethod
+    def build(cls, image_faces, preset, quantization=DEFAULT_QUANTIZATION, root=None):
+        """
+        Builds an index from (image_path, face_locations, face_encodings) tuples. Images are
+        named relative to root, the event's folder; by default, the folder holding all of them.
+        """
+        paths, face_images, locations, encodings = [], [], [], []
+        for image_path, face_locations, face_encodings in image_faces:
+            for location, encoding in zip(face_locations, face_encodings):
+                face_images.append(len(paths))
+                locations.append(location)
+                encodings.append(encoding)
+            paths.append(Path(image_path).resolve())
+        root = Path(root).resolve() if root is not None else image_root(paths)
+        images = [path.relative_to(root).as_posix() for path in paths]
+        return cls(str(root), images, face_images, locations, encodings, preset, quantization)
+
+    def quantized(self, quantization):
+        """A copy of this index stored with another quantization."""
+        return FaceIndex(self.root, self.images, self.face_images, self.locations, self.encodings, self.preset,
+                         quantization)
+
+    def save(self, path):
+        meta = {'version': FACE_INDEX_VERSION, 'root': self.root, 'images': self.images, 'preset': self.preset,
+                'quantization': self.quantization}
+        codec = {f"codec_{name}": value for name, value in self.codec.items()}
+        with open(path, 'wb') as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), face_images=self.face_images,
+                     locations=self.locations, codes=self.codes, **codec)
+        if self.quantization != 'float32':
+            np.save(exact_vectors_path(path), np.asarray(self.encodings, dtype=np.float32))
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            if meta.get('version') not in (1, FACE_INDEX_VERSION):
+                raise ValueError(f"'{path}' has unsupported face index version {meta.get('version')}.")
+            codec = {name[len('codec_'):]: data[name] for name in data.files if name.startswith('codec_')}
+            # Version 1 indexes always held exact float32 encodings.
+            codes = data['codes'] if 'codes' in data.files else data['encodings']
+            face_images, locations = data['face_images'], data['locations']
+        quantization = meta.get('quantization', 'float32')
+        encodings = codes if quantization == 'float32' else np.load(exact_vectors_path(path), mmap_mode='r')
+        return cls(meta['root'], meta['images'], face_images, locations, encodings, meta['preset'],
+                   quantization, codec, codes)
+
+    def search(self, probe_encodings, top_k=DEFAULT_TOP_K, max_distance=DEFAULT_TOLERANCE):
+        """
+        Finds the images with a face close to any of the probe encodings. Returns up to top_k
+        dicts {'image', 'distance', 'location'}, closest first; each image is listed once,
+        with its closest face. Distances are always exact.
+        """
+        probes = np.asarray(probe_encodings, dtype=np.float32).reshape(-1, 128)
+        if not len(probes) or not len(self):
+            return []
+        squared = np.concatenate([self._squared_distances(probes, start, stop).min(axis=0)
+                                  for start, stop in self._chunk_ranges()])
+        close = np.flatnonzero(squared <= (max_distance * RERANK_SLACK[self.quantization]) ** 2)
+        if self.quantization != 'float32':
+            exact = np.asarray(self.encodings[close], dtype=np.float32)
+            squared[close] = (np.einsum('ij,ij->i', exact, exact)[None, :]
+                              + np.einsum('ij,ij->i', probes, probes)[:, None] - 2 * (probes @ exact.T)).min(axis=0)
+            close = close[squared[close] <= max_distance ** 2]
+        close = close[np.argsort(squared[close], kind='stable')]
+        # The first occurrence of an image among the sorted faces is its closest face.
+        _, first = np.unique(self.face_images[close], return_index=True)
+        best = close[np.sort(first)][:top_k]
+        return [{'image': self.images[self.face_images[i]],
+                 'distance': round(float(np.sqrt(max(squared[i], 0))), 4),
+                 'location': tuple(int(v) for v in self.locations[i])} for i in best]
+
+    def _chunk_ranges(self):
+        return [(start, min(start + SEARCH_CHUNK_ROWS, len(self))) for start in range(0, len(self), SEARCH_CHUNK_ROWS)]
+
+    def _chunks(self):
+        for start, stop in self._chunk_ranges():
+            yield _dequantize(self.codes[start:stop], self.quantization, self.codec)
+
+    def _squared_distances(self, probes, start, stop):
+        """Approximate squared distances from every probe to the faces start..stop."""
+        codes = self.codes[start:stop]
+        if self.quantization == 'pq':
+            # Asymmetric distance: probe sub-vectors against centroids, looked up per code.
+            centroids = self.codec['centroids']
+            width = centroids.shape[2]
+            table = ((probes.reshape(len(probes), PQ_SUBSPACES, 1, width) - centroids[None]) ** 2).sum(axis=3)
+            return table[:, np.arange(PQ_SUBSPACES)[None, :], codes].sum(axis=2)
+        # |a - b|^2 = |a|^2 + |b|^2 - 2ab, for every probe and face in one matrix product
+        rows = _dequantize(codes, self.quantization, self.codec)
+        return (self._squared_norms[None, start:stop] + np.einsum('ij,ij->i', probes, probes)[:, None]
+                - 2 * (probes @ rows.T))
@@ -0,0 +1,207 @@
+import numpy as np
+
+# Distances up to this value are kept in the neighbour graph, so the clustering
+# can be redone at any tolerance up to it without touching the images again.
+NEIGHBOUR_DISTANCE_CAP = 0.8
+DEFAULT_TOLERANCE = 0.6
+
+class FaceStore:
+    """
+    Holds every encoded face of a discovery run and groups them into people.
+
+    Each face keeps a sparse list of the earlier faces within NEIGHBOUR_DISTANCE_CAP.
+    Clustering is the same greedy pass discovery has always used: a face joins the
+    earliest person whose first face is within tolerance, otherwise it starts a new
+    person. Because that pass only needs distances to earlier faces, it can be redone
+    from the cached graph for any tolerance up to the cap.
+
+    People can also be merged and split by hand. Both only touch the faces of the
+    people involved; person ids stay stable, and a merged-away person keeps a None
+    representative so existing ids never shift. Re-clustering discards manual edits.
+
+    A store can be seeded with reference people before any face is added (see seed()).
+    They come first, so a face that is close enough to a reference joins it.
+    """
+
+    def __init__(self, tolerance=DEFAULT_TOLERANCE, distance_cap=NEIGHBOUR_DISTANCE_CAP):
+        self.distance_cap = distance_cap
+        self.tolerance = self._check_tolerance(tolerance)
+        self.faces = []               # dicts: {'path', 'location', 'encoding'}
+        self.assignments = []         # face index -> person id
+        self.representatives = []     # person id -> face used for the portrait (None once merged away)
+        self.members = []             # person id -> face indices
+        self._centroid_sums = []      # person id -> sum of member encodings
+        self._anchors = set()         # faces that new faces are compared against
+        self._matrix = np.empty((64, 128))
+        self._squared_norms = np.empty(64)
+        self._neighbour_indices = []
+        self._neighbour_distances = []
+        self.known_names = {}         # person id -> name, for people seeded from references
+        self.seeded = 0               # the first faces are reference faces, with no path
+
+    def __len__(self):
+        return len(self.faces)
+
+    @property
+    def encodings(self):
+        """All face encodings as an (n, 128) matrix."""
+        return self._matrix[:len(self.faces)]
+
+    def add_face(self, path, location, encoding, neighbours=None):
+        """
+        Adds a face, assigns it to a person and returns (face index, whether it started a new person).
+        neighbours may carry a (faces searched, indices, distances) result already computed against
+        the first faces of the store (e.g. by a worker process); only later faces are compared here.
+        """
+        face_index = len(self.faces)
+        if face_index == len(self._matrix):
+            self._matrix = np.concatenate([self._matrix, np.empty_like(self._matrix)])
+            self._squared_norms = np.concatenate([self._squared_norms, np.empty_like(self._squared_norms)])
+        searched, known_indices, known_distances = neighbours if neighbours is not None else (0, [], [])
+
+        # |a - b|^2 = |a|^2 + |b|^2 - 2ab, so one matrix-vector product covers every earlier face
+        squared_norm = float(np.dot(encoding, encoding))
+        squared = (self._squared_norms[searched:face_index] + squared_norm
+                   - 2 * (self._matrix[searched:face_index] @ encoding))
+        close = np.flatnonzero(squared <= self.distance_cap ** 2)
+        self._neighbour_indices.append(np.concatenate([np.asarray(known_indices, dtype=np.int32),
+                                                       (close + searched).astype(np.int32)]))
+        self._neighbour_distances.append(np.concatenate([np.asarray(known_distances, dtype=np.float32),
+                                                         np.sqrt(np.maximum(squared[close], 0)).astype(np.float32)]))
+
+        self._matrix[face_index] = encoding
+        self._squared_norms[face_index] = squared_norm
+        self.faces.append({'path': path, 'location': location, 'encoding': encoding})
+        is_new_person = self._assign(face_index)
+        return face_index, is_new_person
+
+    def match_distance(self, face_index):
+        """
+        How far a face is from the first face of the person it joined, or None if it is such a
+        first face itself (it started a person, or is a reference).
+        """
+        if face_index in self._anchors:
+            return None
+        person = self.assignments[face_index]
+        distances = [distance for neighbour, distance in zip(self._neighbour_indices[face_index],
+                                                             self._neighbour_distances[face_index])
+                     if neighbour in self._anchors and self.assignments[neighbour] == person]
+        return float(min(distances)) if distances else None
+
+    def seed(self, names, encodings):
+        """Adds one known person per reference encoding. Each stays a person of its own, even next to a look-alike."""
+        if self.faces:
+            raise ValueError("References must be seeded before any face is added.")
+        self.seeded = len(names)
+        for name, encoding in zip(names, encodings):
+            face_index, _ = self.add_face(None, None, np.asarray(encoding, dtype=np.float64))
+            self.known_names[self.assignments[face_index]] = name
+
+    def recluster(self, tolerance):
+        """Regroups all faces at a new tolerance using only the cached neighbour graph."""
+        self.tolerance = self._check_tolerance(tolerance)
+        self.assignments = []
+        self.representatives = []
+        self.members = []
+        self._centroid_sums = []
+        self._anchors = set()
+        for face_index in range(len(self.faces)):
+            self._assign(face_index)
+
+    @property
+    def people(self):
+        """Ids of the people that currently exist, in discovery order."""
+        return [person for person, face_index in enumerate(self.representatives) if face_index is not None]
+
+    @property
+    def unnamed_people(self):
+        """The people that were discovered rather than seeded from a reference."""
+        return [person for person in self.people if person not in self.known_names]
+
+    def faces_of(self, person):
+        """Returns the indices of the faces assigned to a person."""
+        return list(self.members[person])
+
+    def centroid(self, person):
+        """Mean encoding of a person's faces."""
+        return self._centroid_sums[person] / len(self.members[person])
+
+    def merge(self, people):
+        """Merges several people into the first one and returns its id."""
+        target, *others = people
+        for person in others:
+            if person == target or self.representatives[person] is None:
+                continue
+            for face_index in self.members[person]:
+                self.assignments[face_index] = target
+            self.members[target].extend(self.members[person])
+            self._centroid_sums[target] = self._centroid_sums[target] + self._centroid_sums[person]
+            self.members[person] = []
+            self._centroid_sums[person] = np.zeros(128)
+            self.representatives[person] = None
+        return target
+
+    def split(self, person, iterations=10):
+        """
+        Splits a person in two with a 2-means pass over their faces. The group holding
+        the current portrait face keeps the person id. Returns the new person's id,
+        or None if the faces could not be separated.
+        """
+        members = np.array(self.members[person])
+        if len(members) < 2:
+            return None
+        encodings = self.encodings[members]
+        representative = self.representatives[person]
+
+        # Seed with the portrait face and the face farthest from it
+        first = encodings[np.flatnonzero(members == representative)[0]]
+        second = encodings[np.argmax(np.linalg.norm(encodings - first, axis=1))]
+        labels = None
+        for _ in range(iterations):
+            new_labels = (np.linalg.norm(encodings - second, axis=1) < np.linalg.norm(encodings - first, axis=1))
+            if labels is not None and np.array_equal(new_labels, labels):
+                break
+            labels = new_labels
+            if labels.all() or not labels.any():
+                return None
+            first, second = encodings[~labels].mean(axis=0), encodings[labels].mean(axis=0)
+        if labels[members == representative][0]:
+            labels = ~labels
+
+        moved = members[labels]
+        new_person = len(self.representatives)
+        new_centroid = encodings[labels].mean(axis=0)
+        new_representative = int(moved[np.argmin(np.linalg.norm(encodings[labels] - new_centroid, axis=1))])
+        self.representatives.append(new_representative)
+        self.members.append(moved.tolist())
+        self._centroid_sums.append(encodings[labels].sum(axis=0))
+        self.members[person] = members[~labels].tolist()
+        self._centroid_sums[person] = encodings[~labels].sum(axis=0)
+        for face_index in moved:
+            self.assignments[face_index] = new_person
+        self._anchors.add(new_representative)
+        return new_person
+
+    def _assign(self, face_index):
+        neighbours = self._neighbour_indices[face_index]
+        within = neighbours[self._neighbour_distances[face_index] <= self.tolerance]
+        encoding = self._matrix[face_index]
+        # A face joins the earliest person whose first face is close enough. Reference faces never join anyone.
+        for neighbour in within if face_index >= self.seeded else []:
+            if neighbour in self._anchors:
+                person = self.assignments[neighbour]
+                self.assignments.append(person)
+                self.members[person].append(face_index)
+                self._centroid_sums[person] = self._centroid_sums[person] + encoding
+                return False
+        self.assignments.append(len(self.representatives))
+        self.representatives.append(face_index)
+        self.members.append([face_index])
+        self._centroid_sums.append(encoding.copy())
+        self._anchors.add(face_index)
+        return True
+
+    def _check_tolerance(self, tolerance):
+        if not 0 < tolerance <= self.distance_cap:
+            raise ValueError(f"Tolerance must be between 0 and {self.distance_cap}, got {tolerance}.")
+        return tolerance
@@ -0,0 +1,243 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import core
+from face_index import QUANTIZATIONS
+
+WORKFLOWS = ['reference', 'discovery', 'hybrid']
+# Options a job may set, per workflow. Anything else is rejected up front.
+WORKFLOW_OPTIONS = {
+    'reference': {'detection_policy', 'preset', 'min_face_size', 'min_sharpness', 'workers', 'index_quantization',
+                  'unknown_people'},
+    'discovery': {'detection_policy', 'preset', 'min_face_size', 'min_sharpness', 'tolerance', 'workers',
+                  'index_quantization'},
+    'hybrid': {'detection_policy', 'preset', 'min_face_size', 'min_sharpness', 'tolerance', 'workers',
+               'index_quantization'},
+}
+
+# The queue's memory governor, handed to each pool worker when it starts.
+_governor = None
+
+def _init_job_worker(governor, concurrent_jobs):
+    global _governor
+    _governor = governor
+    core.set_concurrent_runs(concurrent_jobs)
+
+def _run_job(job_id, spec, job_root, progress):
+    """Runs one job inside a pool worker process and returns the result zip path."""
+    def progress_callback(current, total, filename):
+        progress[job_id] = {'current': current, 'total': total, 'file': filename}
+
+    progress[job_id] = {'current': 0, 'total': 0, 'file': None}
+    job = core.JobContext(job_root, job_id)
+    options = dict(spec['options'])
+    quality_gate = core.FaceQualityGate(options.pop('min_face_size', core.MIN_FACE_SIZE),
+                                        options.pop('min_sharpness', core.MIN_FACE_SHARPNESS))
+    if spec['workflow'] == 'reference':
+        zip_path = core.run_reference_workflow(progress_callback, spec['event'], spec['references'], job,
+                                               quality_gate=quality_gate, governor=_governor, **options)
+    elif spec['workflow'] == 'hybrid':
+        zip_path = core.run_hybrid_workflow(progress_callback, spec['event'], spec['references'], job,
+                                            quality_gate=quality_gate, governor=_governor, **options)
+    else:
+        zip_path = core.run_discovery_workflow(progress_callback, spec['event'], job,
+                                               quality_gate=quality_gate, governor=_governor, **options)
+    return str(Path(zip_path).resolve())
+
+def _is_number(value):
+    # JSON true/false arrive as bools, which are ints to Python.
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def validate_spec(spec):
+    """Checks a job request and returns it normalised. Raises ValueError with a readable message."""
+    if not isinstance(spec, dict):
+        raise ValueError("A job must be a JSON object.")
+    workflow = spec.get('workflow')
+    if workflow not in WORKFLOWS:
+        raise ValueError(f"'workflow' must be one of: {', '.join(WORKFLOWS)}.")
+
+    normalised = {'workflow': workflow, 'options': dict(spec.get('options') or {})}
+    sources = ['event'] if workflow == 'discovery' else ['event', 'references']
+    for key in sources:
+        if not spec.get(key):
+            raise ValueError(f"'{key}' is required for the {workflow} workflow.")
+        path = Path(spec[key]).resolve()
+        if not path.exists():
+            raise ValueError(f"'{key}' does not exist: {path}")
+        normalised[key] = str(path)
+
+    unknown = set(normalised['options']) - WORKFLOW_OPTIONS[workflow]
+    if unknown:
+        raise ValueError(f"Unknown option(s) for the {workflow} workflow: {', '.join(sorted(unknown))}.")
+    policy = normalised['options'].get('detection_policy')
+    if policy is not None and policy not in core.DETECTION_POLICIES:
+        raise ValueError(f"'detection_policy' must be one of: {', '.join(core.DETECTION_POLICIES)}.")
+    preset = normalised['options'].get('preset')
+    if preset is not None and preset not in core.PRESETS:
+        raise ValueError(f"'preset' must be one of: {', '.join(core.PRESETS)}.")
+    quantization = normalised['options'].get('index_quantization')
+    if quantization is not None and quantization not in QUANTIZATIONS:
+        raise ValueError(f"'index_quantization' must be one of: {', '.join(QUANTIZATIONS)}.")
+    unknown_people = normalised['options'].get('unknown_people')
+    if unknown_people is not None and not isinstance(unknown_people, bool):
+        raise ValueError("'unknown_people' must be true or false.")
+    tolerance = normalised['options'].get('tolerance')
+    if tolerance is not None and not (_is_number(tolerance) and 0 < tolerance <= core.NEIGHBOUR_DISTANCE_CAP):
+        # Discovery only caches neighbours up to the cap, so a looser tolerance could not be honoured.
+        raise ValueError(f"'tolerance' must be a number above 0 and at most {core.NEIGHBOUR_DISTANCE_CAP}.")
+    min_face_size = normalised['options'].get('min_face_size')
+    if min_face_size is not None and not (_is_number(min_face_size) and min_face_size >= 0):
+        raise ValueError("'min_face_size' must be a number of pixels, 0 or more.")
+    min_sharpness = normalised['options'].get('min_sharpness')
+    if min_sharpness is not None and not (_is_number(min_sharpness) and min_sharpness >= 0):
+        raise ValueError("'min_sharpness' must be a number, 0 or more.")
+    workers = normalised['options'].get('workers')
+    if workers is not None and workers != core.AUTO_WORKERS and not (isinstance(workers, int) and workers >= 1):
+        raise ValueError(f"'workers' must be a positive integer or '{core.AUTO_WORKERS}'.")
+    return normalised
+
+def validate_search(query):
+    """Checks a face search request and returns (probe paths, top_k, tolerance). Raises ValueError."""
+    if not isinstance(query, dict):
+        raise ValueError("A search must be a JSON object.")
+    probes = query.get('probes')
+    if not (isinstance(probes, list) and probes and all(isinstance(probe, str) and probe for probe in probes)):
+        raise ValueError("'probes' must list at least one photo path.")
+    top_k = query.get('top_k', core.DEFAULT_TOP_K)
+    if not (isinstance(top_k, int) and not isinstance(top_k, bool) and top_k >= 1):
+        raise ValueError("'top_k' must be a positive integer.")
+    tolerance = query.get('tolerance', core.DEFAULT_TOLERANCE)
+    if not (_is_number(tolerance) and tolerance > 0):
+        raise ValueError("'tolerance' must be a number above 0.")
+    return probes, top_k, float(tolerance)
+
+class JobQueue:
+    """
+    Queues workflow jobs and runs them on a pool of worker processes. Each job gets its
+    own JobContext under jobs_root; progress is reported back through a managed dict.
+    All jobs share one memory budget for decoded images (see core.MemoryGovernor), and jobs
+    that size their detection workers automatically each get an equal share of the machine.
+    If a worker process dies, the pool and its budget are replaced for the jobs that follow.
+    """
+
+    def __init__(self, workers=2, jobs_root=core.JOBS_ROOT, memory_limit_mb=core.DEFAULT_MEMORY_LIMIT_MB):
+        self.workers = workers
+        self.memory_limit_mb = memory_limit_mb
+        self.jobs_root = Path(jobs_root).resolve()
+        self.jobs_root.mkdir(parents=True, exist_ok=True)
+        # Workspaces discarded just before an earlier server stopped may still be on disk.
+        core.sweep_trash(self.jobs_root)
+        self._manager = multiprocessing.Manager()
+        self._progress = self._manager.dict()
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._start_pool()
+
+    def _start_pool(self):
+        self.governor = core.MemoryGovernor(self.memory_limit_mb)
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_job_worker,
+                                             initargs=(self.governor, self.workers))
+
+    def submit(self, spec):
+        """Validates and queues a job. Returns its id."""
+        spec = validate_spec(spec)
+        job = core.JobContext.create(self.jobs_root)
+        record = {'id': job.job_id, 'workflow': spec['workflow'], 'spec': spec, 'root': job.root,
+                  'submitted': time.time(), 'finished': None, 'result': None, 'error': None}
+        with self._lock:
+            self._jobs[job.job_id] = record
+            record['executor'] = self._executor
+            record['future'] = self._executor.submit(_run_job, job.job_id, spec, str(job.root), self._progress)
+        record['future'].add_done_callback(lambda future: self._on_done(job.job_id, future))
+        print(f"--- Queued {spec['workflow']} job {job.job_id} ---")
+        return job.job_id
+
+    def status(self, job_id):
+        """Returns a JSON-friendly snapshot of a job, or None if it is unknown."""
+        with self._lock:
+            record = self._jobs.get(job_id)
+        if record is None:
+            return None
+
+        future = record['future']
+        if future.cancelled():
+            state = 'cancelled'
+        elif future.done():
+            state = 'failed' if record['error'] else 'done'
+        elif job_id in self._progress:
+            state = 'running'
+        else:
+            state = 'queued'
+        return {'id': job_id, 'workflow': record['workflow'], 'status': state,
+                'progress': self._progress.get(job_id), 'submitted': record['submitted'],
+                'finished': record['finished'], 'error': record['error'],
+                'result_available': state == 'done'}
+
+    def list(self):
+        with self._lock:
+            job_ids = list(self._jobs)
+        return [self.status(job_id) for job_id in job_ids]
+
+    def result_path(self, job_id):
+        """Returns the result zip of a finished job, or None."""
+        with self._lock:
+            record = self._jobs.get(job_id)
+        return Path(record['result']) if record and record['result'] else None
+
+    def face_index_path(self, job_id):
+        """Returns the face index of a finished job, or None."""
+        with self._lock:
+            record = self._jobs.get(job_id)
+        if not record or not record['result']:
+            return None
+        path = core.JobContext(record['root'], job_id).face_index_path
+        return path if path.exists() else None
+
+    def report_path(self, job_id):
+        """Returns the per-image run report of a finished job, or None."""
+        with self._lock:
+            record = self._jobs.get(job_id)
+        if not record or not record['future'].done():
+            return None
+        path = core.JobContext(record['root'], job_id).report_path
+        return path if path.exists() else None
+
+    def remove(self, job_id):
+        """Cancels a queued job or discards a finished one. Returns False if it is still running."""
+        with self._lock:
+            record = self._jobs.get(job_id)
+            if record is None:
+                return False
+            future = record['future']
+            if not future.done() and not future.cancel():
+                return False
+            del self._jobs[job_id]
+        self._progress.pop(job_id, None)
+        core.discard_job(core.JobContext(record['root'], job_id))
+        return True
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._manager.shutdown()
+
+    def _on_done(self, job_id, future):
+        with self._lock:
+            record = self._jobs.get(job_id)
+            if record is None or future.cancelled():
+                return
+            record['finished'] = time.time()
+            try:
+                record['result'] = future.result()
+            except Exception as e:
+                record['error'] = str(e) or type(e).__name__
+                # A worker died (e.g. killed for using too much memory) and took the pool with it, and
+                # whatever it had reserved from the memory budget. Every job in that pool fails with this.
+                if isinstance(e, BrokenProcessPool) and record['executor'] is self._executor:
+                    print("--- A worker process died: starting a new worker pool ---")
+                    self._executor.shutdown(wait=False)
+                    self._start_pool()
+        print(f"--- Job {job_id} {'failed: ' + record['error'] if record['error'] else 'finished'} ---")
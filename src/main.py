@@ -1,15 +1,23 @@
+import time
+# Launch time is measured from here; see --profile-startup below.
+_startup_marks = [("start", time.perf_counter())]
+
 import sys
 import os
+import multiprocessing
 from pathlib import Path
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QPushButton, QLabel, QFrame, 
                              QFileDialog, QStackedWidget, QProgressBar, QScrollArea,
-                             QLineEdit, QMessageBox)
-from PyQt6.QtCore import Qt, QThread, pyqtSignal
+                             QLineEdit, QMessageBox, QComboBox, QSlider, QCheckBox, QSpinBox)
+from PyQt6.QtCore import Qt, QThread, QTimer, pyqtSignal
 from PyQt6.QtGui import QPixmap, QIcon, QFontDatabase
+_startup_marks.append(("import PyQt6", time.perf_counter()))
 
 # --- Import the core logic ---
+# Cheap: face_recognition and its models are only loaded on first use (or by the warm-up below).
 import core
+_startup_marks.append(("import core", time.perf_counter()))
 
 # --- Helper function to get resource paths (works in both dev and frozen exe) ---
 def resource_path(relative_path):
@@ -50,34 +58,52 @@ class Worker(QThread):
 
 # --- Custom Widget for Face Tagging ---
 class FaceTagWidget(QWidget):
-    def __init__(self, image_path):
+    def __init__(self, portrait_data):
         super().__init__()
         layout = QHBoxLayout(self)
         layout.setSpacing(15)
 
+        self.select_box = QCheckBox()
+        self.select_box.setToolTip("Select this person to merge or split.")
+
         self.image_label = QLabel()
-        pixmap = QPixmap(str(image_path))
+        pixmap = QPixmap()
+        if portrait_data:
+            pixmap.loadFromData(portrait_data)
         self.image_label.setPixmap(pixmap.scaled(100, 100, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation))
         
         self.name_input = QLineEdit()
         self.name_input.setPlaceholderText("Enter person's name...")
         self.name_input.setStyleSheet("padding: 8px; border-radius: 4px; border: 1px solid #30363d;")
 
+        self.count_label = QLabel()
+        self.count_label.setStyleSheet("font-size: 12px; color: #7d8590;")
+
+        layout.addWidget(self.select_box)
         layout.addWidget(self.image_label)
         layout.addWidget(self.name_input, 1)
+        layout.addWidget(self.count_label)
 
     def get_name(self):
         return self.name_input.text().strip()
 
+    def set_face_count(self, count):
+        self.count_label.setText(f"{count} face{'s' if count != 1 else ''}")
+
 # --- Main Application Window ---
 class FaceFolioApp(QMainWindow):
     def __init__(self):
         super().__init__()
-        self.discovered_encodings = []
-        self.all_face_metadata = []
-        self.face_tag_widgets = []
+        self.job = core.DEFAULT_JOB
+        self.face_store = None
+        self.face_tag_widgets = {} # representative face index -> FaceTagWidget
+        self.next_person_number = 1
+        self.default_name_prefix = "Person_"
         self.w1_event_zip_path = None
         self.w1_ref_zip_path = None
+        self.w1_reference_dir = None # set while the unknown people of a Workflow 1 run are being tagged
+        self.sorter = None # applies tags entered while discovery is still running
+        self.discovering = False
         self.w2_event_zip_path = None
 
         self.setWindowTitle("FaceFolio - Photo Sorter")
@@ -157,6 +183,13 @@ class FaceFolioApp(QMainWindow):
                 background-color: #0d1117;
                 color: #e6edf3;
             }
+            QComboBox {
+                padding: 6px;
+                border-radius: 4px;
+                border: 1px solid #30363d;
+                background-color: #161b22;
+                color: #e6edf3;
+            }
             QMessageBox { background-color: #161b22; }
             QMessageBox QLabel { color: #e6edf3; }
             QMessageBox QPushButton { min-width: 80px; }
@@ -184,6 +217,7 @@ class FaceFolioApp(QMainWindow):
         
         self.setup_workflow1_ui(content_layout)
         self.setup_workflow2_ui(content_layout)
+        self.setup_settings_ui(content_layout)
         
         content_layout.addStretch()
         scroll_area.setWidget(content_widget)
@@ -214,6 +248,11 @@ class FaceFolioApp(QMainWindow):
         btn_select_w1_ref.setToolTip("Select a .zip file of photos, where each filename is the person's name (e.g., 'Alice.jpg').")
         btn_select_w1_ref.clicked.connect(self.select_w1_ref_zip)
 
+        self.w1_hybrid_check = QCheckBox("Find everyone in one pass (hybrid)")
+        self.w1_hybrid_check.setToolTip("Discovers every person with your references as known people from the start,\n"
+                                        "so people not in your references can be named while the photos are still being processed.\n"
+                                        "Off: photos are sorted by reference first, then the faces no reference matched are offered for naming.")
+
         self.w1_start_button = QPushButton("Start Sorting")
         self.w1_start_button.setToolTip("Begin the sorting process for Workflow 1.")
         self.w1_start_button.setEnabled(False)
@@ -223,6 +262,7 @@ class FaceFolioApp(QMainWindow):
         layout.addWidget(desc_label)
         layout.addWidget(self.create_file_selector_row(btn_select_w1_event, self.w1_event_path_label))
         layout.addWidget(self.create_file_selector_row(btn_select_w1_ref, self.w1_ref_path_label))
+        layout.addWidget(self.w1_hybrid_check)
         layout.addWidget(self.w1_start_button)
         
         parent_layout.addWidget(frame)
@@ -256,6 +296,51 @@ class FaceFolioApp(QMainWindow):
         
         parent_layout.addWidget(frame)
 
+    def setup_settings_ui(self, parent_layout):
+        frame = QFrame()
+        layout = QVBoxLayout(frame)
+        layout.setSpacing(15)
+
+        title_label = QLabel("Detection Settings")
+        title_label.setStyleSheet("font-size: 20px; font-weight: bold; color: #58a6ff;")
+        desc_label = QLabel("Applies to both workflows.")
+        desc_label.setStyleSheet("font-size: 14px; color: #7d8590;")
+
+        self.detection_policy_combo = QComboBox()
+        self.detection_policy_combo.addItems(core.DETECTION_POLICIES)
+        self.detection_policy_combo.setToolTip("'adaptive' picks the detection scale and upsampling per image from its size.\n"
+                                               "'fixed' detects every image at the same scale with one upsample.")
+
+        self.preset_combo = QComboBox()
+        self.preset_combo.addItems(list(core.PRESETS))
+        self.preset_combo.setCurrentText(core.DEFAULT_PRESET)
+        self.preset_combo.setToolTip("'fast' detects at a lower resolution and may miss the smallest faces.\n"
+                                     "'balanced' is FaceFolio's standard setting.\n"
+                                     "'accurate' uses the CNN detector and a finer face encoding; it is much slower.")
+
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(0, os.cpu_count() or 1)
+        self.workers_spin.setSpecialValueText("Auto")
+        self.workers_spin.setToolTip("Number of processes that detect faces in parallel.\n"
+                                     "More processes finish sooner but use more memory.\n"
+                                     "'Auto' picks the number from your processor cores and free memory.")
+
+        layout.addWidget(title_label)
+        layout.addWidget(desc_label)
+        layout.addWidget(self.create_setting_row("Speed / quality:", self.preset_combo))
+        layout.addWidget(self.create_setting_row("Face detection policy:", self.detection_policy_combo))
+        layout.addWidget(self.create_setting_row("Worker processes:", self.workers_spin))
+
+        parent_layout.addWidget(frame)
+
+    def create_setting_row(self, text, control):
+        row_widget = QWidget()
+        row_layout = QHBoxLayout(row_widget)
+        row_layout.setContentsMargins(0,0,0,0)
+        row_layout.addWidget(QLabel(text))
+        row_layout.addWidget(control, 1)
+        return row_widget
+
     def create_file_selector_row(self, button, label):
         row_widget = QWidget()
         row_layout = QHBoxLayout(row_widget)
@@ -270,8 +355,25 @@ class FaceFolioApp(QMainWindow):
         main_layout.setContentsMargins(20, 20, 20, 20)
         main_layout.setSpacing(15)
 
-        title = QLabel("Name the Discovered People")
-        title.setStyleSheet("font-size: 24px; font-weight: bold; color: #58a6ff;")
+        self.tagging_title = QLabel("Name the Discovered People")
+        self.tagging_title.setStyleSheet("font-size: 24px; font-weight: bold; color: #58a6ff;")
+
+        self.tolerance_slider = QSlider(Qt.Orientation.Horizontal)
+        self.tolerance_slider.setRange(30, int(core.NEIGHBOUR_DISTANCE_CAP * 100))
+        self.tolerance_slider.setValue(int(core.DEFAULT_TOLERANCE * 100))
+        self.tolerance_slider.setToolTip("Lower values split look-alikes into separate people, higher values group more faces together.\n"
+                                         "Photos are not scanned again.")
+        self.tolerance_value_label = QLabel(f"{core.DEFAULT_TOLERANCE:.2f}")
+        self.tolerance_slider.valueChanged.connect(self.on_tolerance_changed)
+
+        # Re-cluster once the slider settles rather than on every intermediate value
+        self.tolerance_timer = QTimer(self)
+        self.tolerance_timer.setSingleShot(True)
+        self.tolerance_timer.setInterval(200)
+        self.tolerance_timer.timeout.connect(self.apply_tolerance)
+
+        tolerance_row = self.create_setting_row("Match tolerance:", self.tolerance_slider)
+        tolerance_row.layout().addWidget(self.tolerance_value_label)
         
         scroll_area = QScrollArea()
         scroll_area.setWidgetResizable(True)
@@ -281,13 +383,38 @@ class FaceFolioApp(QMainWindow):
         self.tagging_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
         scroll_area.setWidget(self.scroll_content_widget)
 
-        btn_finish_tagging = QPushButton("Finish Tagging and Sort Photos")
-        btn_finish_tagging.setToolTip("Sorts all photos into folders using the names you've provided.")
-        btn_finish_tagging.clicked.connect(self.start_final_sorting)
+        # Shown while discovery continues in the background
+        self.tagging_progress_label = QLabel(" ")
+        self.tagging_progress_label.setStyleSheet("font-size: 12px; color: #7d8590;")
+        self.tagging_progress_label.hide()
+
+        # New people are picked up from the running discovery at this interval
+        self.discovery_timer = QTimer(self)
+        self.discovery_timer.setInterval(500)
+        self.discovery_timer.timeout.connect(self.show_discovered_people)
+
+        edit_row = QWidget()
+        edit_layout = QHBoxLayout(edit_row)
+        edit_layout.setContentsMargins(0,0,0,0)
+        self.btn_merge = QPushButton("Merge Selected")
+        self.btn_merge.setToolTip("Combine the selected people into one (keeps the first one's name).")
+        self.btn_merge.clicked.connect(self.merge_selected_people)
+        self.btn_split = QPushButton("Split Selected")
+        self.btn_split.setToolTip("Separate the selected person into two groups of faces.")
+        self.btn_split.clicked.connect(self.split_selected_person)
+        edit_layout.addWidget(self.btn_merge)
+        edit_layout.addWidget(self.btn_split)
+
+        self.btn_finish_tagging = QPushButton("Finish Tagging and Sort Photos")
+        self.btn_finish_tagging.setToolTip("Sorts all photos into folders using the names you've provided.")
+        self.btn_finish_tagging.clicked.connect(self.start_final_sorting)
         
-        main_layout.addWidget(title)
+        main_layout.addWidget(self.tagging_title)
+        main_layout.addWidget(tolerance_row)
+        main_layout.addWidget(self.tagging_progress_label)
         main_layout.addWidget(scroll_area, 1)
-        main_layout.addWidget(btn_finish_tagging)
+        main_layout.addWidget(edit_row)
+        main_layout.addWidget(self.btn_finish_tagging)
         
         return widget
 
@@ -295,42 +422,175 @@ class FaceFolioApp(QMainWindow):
         # Clear previous widgets
         for i in reversed(range(self.tagging_layout.count())): 
             self.tagging_layout.itemAt(i).widget().setParent(None)
-        self.face_tag_widgets = []
+        self.face_tag_widgets = {}
+        self.next_person_number = 1
+        if self.w1_reference_dir is not None:
+            self.tagging_title.setText("Name the People Not in Your References")
+            self.default_name_prefix = "Unknown_"
+        else:
+            self.tagging_title.setText("Name the Discovered People")
+            self.default_name_prefix = "Person_"
+
+        self.tolerance_slider.blockSignals(True)
+        self.tolerance_slider.setValue(int(round(self.face_store.tolerance * 100)))
+        self.tolerance_value_label.setText(f"{self.face_store.tolerance:.2f}")
+        self.tolerance_slider.blockSignals(False)
+
+        self.refresh_tagging_screen()
+
+    def refresh_tagging_screen(self):
+        """Adds and removes tag widgets to match the current people, keeping names already typed."""
+        # While discovery runs, only people whose portrait is saved are shown.
+        people = list(self.sorter.new_people) if self.discovering else self.face_store.unnamed_people
+        representatives = [self.face_store.representatives[person] for person in people]
+        current = set(representatives)
+        for face_index in list(self.face_tag_widgets):
+            if face_index not in current:
+                self.face_tag_widgets.pop(face_index).setParent(None)
+
+        for position, (person, face_index) in enumerate(zip(people, representatives)):
+            tag_widget = self.face_tag_widgets.get(face_index)
+            if tag_widget is None:
+                tag_widget = FaceTagWidget(core.read_portrait(face_index, self.job))
+                tag_widget.name_input.setText(f"{self.default_name_prefix}{self.next_person_number}")
+                tag_widget.name_input.editingFinished.connect(lambda face_index=face_index: self.apply_tag_early(face_index))
+                self.next_person_number += 1
+                self.face_tag_widgets[face_index] = tag_widget
+            if self.tagging_layout.indexOf(tag_widget) != position:
+                self.tagging_layout.removeWidget(tag_widget)
+                self.tagging_layout.insertWidget(position, tag_widget)
+            tag_widget.set_face_count(len(self.face_store.members[person]))
+
+    def apply_tag_early(self, face_index):
+        """Passes a name typed while discovery runs on, so the person's photos are sorted right away."""
+        if self.discovering:
+            person = self.face_store.assignments[face_index]
+            self.sorter.name_person(person, self.face_tag_widgets[face_index].get_name())
+
+    def set_discovering(self, discovering):
+        """Locks the edits that regroup people while discovery is still adding faces."""
+        self.discovering = discovering
+        for control in [self.tolerance_slider, self.btn_merge, self.btn_split, self.btn_finish_tagging]:
+            control.setEnabled(not discovering)
+        self.tagging_progress_label.setVisible(discovering)
+        if discovering:
+            self.discovery_timer.start()
+        else:
+            self.discovery_timer.stop()
 
-        portrait_paths = sorted(list(core.UNKNOWN_PORTRAITS_DIR.glob("*.png")))
-        for i, path in enumerate(portrait_paths):
-            person_index = int(path.stem.split('_')[1])
-            tag_widget = FaceTagWidget(path)
-            tag_widget.name_input.setText(f"Person_{person_index + 1}")
-            self.tagging_layout.addWidget(tag_widget)
-            self.face_tag_widgets.append((person_index, tag_widget))
+    def show_discovered_people(self):
+        """Streams people found by the running discovery to the tagging screen."""
+        if not self.sorter.new_people:
+            return
+        if self.stacked_widget.currentIndex() != 2:
+            self.face_store = self.sorter.face_store
+            self.populate_tagging_screen()
+            self.switch_screen(2)
+        else:
+            self.refresh_tagging_screen()
+
+    def selected_people(self):
+        """Returns the ids of the people whose select box is ticked, in display order."""
+        selected = []
+        for person in self.face_store.unnamed_people:
+            tag_widget = self.face_tag_widgets.get(self.face_store.representatives[person])
+            if tag_widget is not None and tag_widget.select_box.isChecked():
+                selected.append(person)
+        return selected
+
+    def merge_selected_people(self):
+        people = self.selected_people()
+        if len(people) < 2:
+            self.show_error_message("Select at least two people to merge.")
+            return
+        target = self.face_store.merge(people)
+        self.face_tag_widgets[self.face_store.representatives[target]].select_box.setChecked(False)
+        self.refresh_tagging_screen()
+
+    def split_selected_person(self):
+        people = self.selected_people()
+        if len(people) != 1:
+            self.show_error_message("Select exactly one person to split.")
+            return
+        new_person = self.face_store.split(people[0])
+        if new_person is None:
+            self.show_error_message("This person's faces could not be split any further.")
+            return
+        self.face_tag_widgets[self.face_store.representatives[people[0]]].select_box.setChecked(False)
+
+        # Only the new person needs a portrait
+        self.save_missing_portraits_in_background()
+
+    def on_tolerance_changed(self, value):
+        self.tolerance_value_label.setText(f"{value / 100:.2f}")
+        self.tolerance_timer.start()
+
+    def apply_tolerance(self):
+        tolerance = self.tolerance_slider.value() / 100
+        if self.face_store is None or tolerance == self.face_store.tolerance:
+            return
+        self.face_store.recluster(tolerance)
+        print(f"--- Re-clustered at tolerance {tolerance:.2f}: {len(self.face_store.people)} people ---")
+
+        # Only people whose first face has no portrait yet need one cropped
+        self.save_missing_portraits_in_background()
+
+    def save_missing_portraits_in_background(self):
+        self.tagging_screen.setEnabled(False)
+        self.portrait_worker = Worker(core.save_missing_portraits, self.face_store, self.job)
+        self.portrait_worker.finished.connect(self.on_portraits_ready)
+        self.portrait_worker.start()
+
+    def on_portraits_ready(self, result):
+        self.refresh_tagging_screen()
+        self.tagging_screen.setEnabled(True)
+        # The slider may have moved again while portraits were being saved
+        if self.tolerance_slider.value() / 100 != self.face_store.tolerance:
+            self.apply_tolerance()
+
+    def start_progressive_discovery(self):
+        """Discovery shows people on the tagging screen as they are found; tags apply as photos arrive."""
+        self.sorter = core.ProgressiveSorter(self.job)
+        self.set_discovering(True)
 
     def start_workflow2(self):
         if not self.w2_event_zip_path: return
         self.switch_screen(1)
         self.status_label.setText("Discovering unique faces...")
-        self.worker = Worker(self.run_w2_discovery)
+        self.start_progressive_discovery()
+        self.worker = Worker(self.run_w2_discovery, self.detection_policy_combo.currentText(),
+                             self.workers_spin.value() or core.AUTO_WORKERS, self.preset_combo.currentText())
         self.worker.progress.connect(self.update_progress)
         self.worker.finished.connect(self.on_discovery_finished)
         self.worker.start()
 
-    def run_w2_discovery(self, progress_callback):
-        core.setup_directories()
-        image_paths = core.extract_zip(self.w2_event_zip_path, core.EXTRACTED_EVENTS_DIR)
-        return core.find_unique_faces(progress_callback, image_paths)
+    def run_w2_discovery(self, progress_callback, detection_policy, workers, preset):
+        core.setup_directories(self.job)
+        image_paths = core.extract_zip(self.w2_event_zip_path, self.job.extracted_events_dir)
+        return core.find_unique_faces(progress_callback, image_paths, detection_policy=detection_policy, job=self.job,
+                                      workers=workers, preset=preset, listener=self.sorter,
+                                      sample_fraction=core.PREVIEW_SAMPLE_FRACTION)
 
     def on_discovery_finished(self, result):
+        self.set_discovering(False)
         if result is None:
             self.show_error_message("An error occurred during face discovery.")
             self.reset_to_main_screen()
             return
             
-        self.discovered_encodings, self.all_face_metadata = result
-        print(f"--- DISCOVERY FINISHED: Found {len(self.discovered_encodings)} unique people ---")
+        self.face_store = result
+        print(f"--- DISCOVERY FINISHED: Found {len(self.face_store.people)} unique people ---")
 
-        if not self.discovered_encodings:
+        if not self.face_store.people:
             QMessageBox.information(self, "No Faces Found", "Could not find any faces in the provided photos.")
             self.reset_to_main_screen()
+        else:
+            self.show_final_people()
+
+    def show_final_people(self):
+        """Shows every discovered person for tagging, keeping the names typed while discovery ran."""
+        if self.stacked_widget.currentIndex() == 2:
+            self.refresh_tagging_screen()
         else:
             self.populate_tagging_screen()
             self.switch_screen(2)
@@ -338,15 +598,30 @@ class FaceFolioApp(QMainWindow):
     def start_final_sorting(self):
         self.switch_screen(1)
         self.status_label.setText("Sorting photos based on your tags...")
-        user_names = {index: widget.get_name() for index, widget in self.face_tag_widgets}
-        self.worker = Worker(self.run_w2_final_sort, user_names)
+        user_names = {person: self.face_tag_widgets[self.face_store.representatives[person]].get_name()
+                      for person in self.face_store.unnamed_people}
+        self.worker = Worker(self.run_final_sort, user_names)
         self.worker.progress.connect(self.update_progress)
         self.worker.finished.connect(self.on_processing_finished)
         self.worker.start()
 
-    def run_w2_final_sort(self, progress_callback, user_names):
-        core.sort_photos_by_discovered_faces(progress_callback, self.all_face_metadata, self.discovered_encodings, user_names)
-        core.create_download_zip(core.OUTPUT_DIR, core.DOWNLOAD_ZIP_PATH)
+    def run_final_sort(self, progress_callback, user_names):
+        # Tags edited after a sort only move the photos they affect.
+        if self.job.sort_manifest_path.exists():
+            core.resort_photos(progress_callback, self.face_store, user_names, self.job, self.w1_reference_dir)
+            return True
+        # Tagged people join the same output; in Workflow 1, next to the reference people's folders.
+        if self.sorter is not None:
+            self.sorter.finish(progress_callback, self.face_store, user_names)
+        else:
+            core.sort_photos_by_discovered_faces(progress_callback, self.face_store, user_names, job=self.job)
+        if self.w1_reference_dir is not None:
+            core.copy_reference_photos(self.w1_reference_dir, job=self.job)
+        core.create_download_zip(self.job.output_dir, self.job.download_zip_path)
+        # After a plain reference sort the face store only holds the unknown people, so it cannot
+        # describe the reference people's folders; tags are then final once sorted.
+        if self.sorter is not None:
+            core.write_sort_manifest(self.job, self.face_store, user_names, self.w1_reference_dir)
         return True # Indicate success
 
     def create_processing_screen(self):
@@ -371,11 +646,17 @@ class FaceFolioApp(QMainWindow):
         self.btn_download.setToolTip("Opens the folder containing the final 'FaceFolio_Sorted.zip' file.")
         self.btn_download.clicked.connect(self.open_download_location)
         
+        self.btn_edit_tags = QPushButton("Edit Tags")
+        self.btn_edit_tags.setToolTip("Go back to the tagging screen to fix names.\n"
+                                      "Only the photos affected by your changes are sorted again.")
+        self.btn_edit_tags.clicked.connect(self.edit_tags)
+
         self.btn_back = QPushButton("Back to Main Menu")
         self.btn_back.setToolTip("Return to the main screen to start a new task.")
         self.btn_back.clicked.connect(self.reset_to_main_screen)
 
         finish_layout.addWidget(self.btn_download)
+        finish_layout.addWidget(self.btn_edit_tags)
         finish_layout.addWidget(self.btn_back)
         self.finish_buttons_widget.hide()
 
@@ -389,27 +670,84 @@ class FaceFolioApp(QMainWindow):
         if not (self.w1_event_zip_path and self.w1_ref_zip_path): return
         self.switch_screen(1)
         self.status_label.setText("Sorting photos...")
-        self.worker = Worker(self.run_w1_logic)
+        settings = (self.detection_policy_combo.currentText(), self.workers_spin.value() or core.AUTO_WORKERS,
+                    self.preset_combo.currentText())
+        if self.w1_hybrid_check.isChecked():
+            self.start_progressive_discovery()
+            self.worker = Worker(self.run_w1_hybrid_logic, *settings)
+            self.worker.finished.connect(self.on_reference_discovery_finished)
+        else:
+            self.worker = Worker(self.run_w1_logic, *settings)
+            self.worker.finished.connect(self.on_reference_sorting_finished)
         self.worker.progress.connect(self.update_progress)
-        self.worker.finished.connect(self.on_processing_finished)
         self.worker.start()
 
-    def run_w1_logic(self, progress_callback):
-        core.setup_directories()
-        image_paths = core.extract_zip(self.w1_event_zip_path, core.EXTRACTED_EVENTS_DIR)
-        core.extract_zip(self.w1_ref_zip_path, core.EXTRACTED_REFERENCES_DIR)
-        known_encodings, known_names = core.load_reference_encodings(core.EXTRACTED_REFERENCES_DIR)
-        
-        if known_encodings:
-            core.find_and_sort_faces_by_reference(progress_callback, image_paths, known_encodings, known_names)
-            core.copy_reference_photos(core.EXTRACTED_REFERENCES_DIR)
-            core.create_download_zip(core.OUTPUT_DIR, core.DOWNLOAD_ZIP_PATH)
-            return True # Indicate success
-        else:
-            print("Processing stopped: No reference faces were loaded.")
-            return "No reference faces found."
+    def run_w1_logic(self, progress_callback, detection_policy, workers, preset):
+        """Sorts by reference. Returns the FaceStore of unknown people if there are any to tag, else True."""
+        try:
+            core.setup_directories(self.job)
+            image_paths = core.collect_images(self.w1_event_zip_path, self.job.extracted_events_dir, self.job)
+            reference_dir = core.prepare_references(self.w1_ref_zip_path, self.job)
+            known_encodings, known_names = core.load_references_or_fail(reference_dir, preset)
+            unknown_store = core.find_and_sort_faces_by_reference(progress_callback, image_paths, known_encodings,
+                                                                  known_names, detection_policy=detection_policy,
+                                                                  job=self.job, workers=workers, preset=preset)
+        except core.WorkflowError as e:
+            return str(e)
+        self.w1_reference_dir = reference_dir
+        if unknown_store.people:
+            return unknown_store
+        core.copy_reference_photos(reference_dir, job=self.job)
+        core.create_download_zip(self.job.output_dir, self.job.download_zip_path)
+        return True # Indicate success
+
+    def on_reference_sorting_finished(self, result):
+        if not isinstance(result, core.FaceStore):
+            self.on_processing_finished(result)
+            return
+        # Faces that matched no reference were already grouped; offer them for tagging before zipping.
+        self.face_store = result
+        print(f"--- REFERENCE SORTING FINISHED: {len(self.face_store.people)} unknown people to tag ---")
+        self.populate_tagging_screen()
+        self.switch_screen(2)
+
+    def run_w1_hybrid_logic(self, progress_callback, detection_policy, workers, preset):
+        """
+        Discovers people with the references as known people from the start, in one pass.
+        Returns the FaceStore, or an error message.
+        """
+        try:
+            core.setup_directories(self.job)
+            image_paths = core.collect_images(self.w1_event_zip_path, self.job.extracted_events_dir, self.job)
+            reference_dir = core.prepare_references(self.w1_ref_zip_path, self.job)
+            known_encodings, known_names = core.load_references_or_fail(reference_dir, preset)
+            # Set before discovery starts, so people streamed to the tagging screen are shown as unknown people.
+            self.w1_reference_dir = reference_dir
+            face_store = core.find_unique_faces(progress_callback, image_paths, detection_policy=detection_policy,
+                                                job=self.job, workers=workers, preset=preset,
+                                                known_encodings=known_encodings, known_names=known_names,
+                                                listener=self.sorter, sample_fraction=core.PREVIEW_SAMPLE_FRACTION)
+        except core.WorkflowError as e:
+            return str(e)
+        return face_store
+
+    def on_reference_discovery_finished(self, result):
+        self.set_discovering(False)
+        if not isinstance(result, core.FaceStore):
+            self.on_processing_finished(result)
+            return
+        self.face_store = result
+        print(f"--- REFERENCE DISCOVERY FINISHED: {len(self.face_store.unnamed_people)} unknown people to tag ---")
+        if not self.face_store.unnamed_people:
+            self.start_final_sorting()
+            return
+        # Only the people no reference matched need names.
+        self.show_final_people()
 
     def update_progress(self, current, total, filename):
+        if self.discovering:
+            self.tagging_progress_label.setText(f"Still looking for people: {current} of {total} photos processed. "
+                                                "Names you enter now are applied right away.")
         if total > 0:
             percentage = int((current / total) * 100)
             self.progress_bar.setValue(percentage)
@@ -434,21 +772,28 @@ class FaceFolioApp(QMainWindow):
         self.progress_bar.setValue(100)
         self.progress_details_label.setText("All photos have been sorted.")
         self.btn_download.show()
+        self.btn_edit_tags.setVisible(self.job.sort_manifest_path.exists() and self.face_store is not None
+                                      and bool(self.face_store.unnamed_people))
         self.finish_buttons_widget.show()
         
         msg_box = QMessageBox(self)
         msg_box.setWindowTitle("Success")
         msg_box.setText("Your photos have been successfully sorted!")
-        msg_box.setInformativeText(f"You can find the final zip file at:\n{os.path.abspath(core.DOWNLOAD_ZIP_PATH)}")
+        msg_box.setInformativeText(f"You can find the final zip file at:\n{os.path.abspath(self.job.download_zip_path)}")
         msg_box.setIcon(QMessageBox.Icon.Information)
         msg_box.exec()
 
+    def edit_tags(self):
+        """Returns to the tagging screen of the finished sort; finishing again applies only the changes."""
+        self.finish_buttons_widget.hide()
+        self.switch_screen(2)
+
     def show_error_message(self, message):
         QMessageBox.critical(self, "Error", message)
 
     def open_download_location(self):
         try:
-            os.startfile(os.path.abspath(core.DOWNLOAD_ZIP_PATH.parent))
+            os.startfile(os.path.abspath(self.job.download_zip_path.parent))
         except Exception as e:
             print(f"Could not open file explorer: {e}")
             self.show_error_message("Could not open the download folder. Please navigate to it manually.")
@@ -457,6 +802,8 @@ class FaceFolioApp(QMainWindow):
         self.switch_screen(0)
         self.w1_event_zip_path = None
         self.w1_ref_zip_path = None
+        self.w1_reference_dir = None
+        self.sorter = None
         self.w2_event_zip_path = None
         self.update_path_label(self.w1_event_path_label, None)
         self.update_path_label(self.w1_ref_path_label, None)
@@ -506,11 +853,43 @@ class FaceFolioApp(QMainWindow):
     def check_workflow2_ready(self):
         self.w2_start_button.setEnabled(bool(self.w2_event_zip_path))
 
+# --- Startup Profiling ---
+def mark_startup(label):
+    _startup_marks.append((label, time.perf_counter()))
+
+def print_startup_report():
+    """Prints how long each launch phase took, measured from the start of main.py."""
+    print("--- Startup profile ---")
+    start = _startup_marks[0][1]
+    for (_, previous), (label, at) in zip(_startup_marks, _startup_marks[1:]):
+        print(f"  {label:<36} {(at - previous) * 1000:8.1f} ms   (at {(at - start) * 1000:8.1f} ms)")
+
 # --- Application Entry Point ---
 if __name__ == "__main__":
     # Before running, ensure you have the necessary libraries installed:
     # pip install PyQt6 face_recognition Pillow cmake dlib
+    # Detection worker processes re-launch the frozen executable on Windows.
+    multiprocessing.freeze_support()
+    # --profile-startup prints where launch time goes and exits once the models are loaded.
+    profile_startup = '--profile-startup' in sys.argv
     app = QApplication(sys.argv)
+    mark_startup("create QApplication")
     window = FaceFolioApp()
+    mark_startup("build main window")
     window.show()
+
+    def on_models_loaded(result):
+        mark_startup("load recognition models (background)")
+        if profile_startup:
+            print_startup_report()
+            app.quit()
+
+    def on_window_shown():
+        mark_startup("show window (first event loop pass)")
+        # Load dlib's models while the user is still choosing files.
+        window.model_loader = Worker(lambda progress_callback: core.load_recognition_models())
+        window.model_loader.finished.connect(on_models_loaded)
+        window.model_loader.start()
+
+    QTimer.singleShot(0, on_window_shown)
     sys.exit(app.exec())
@@ -0,0 +1,86 @@
+"""
+Face portraits for the tagging screen, kept in one pack instead of one image file per person.
+
+A pack is two append-only files: the portraits' JPEG data back to back, and an index of
+fixed-size (face index, offset, length) records. Saving a portrait is one append to each,
+and reading one is a single seek and read; nothing is ever listed or globbed. A face whose
+portrait is saved again gets a newer record, and the last record for a face counts.
+"""
+import io
+import os
+import struct
+import threading
+from pathlib import Path
+
+# Portraits are stored with this longest side, twice the size the tagging screen shows them at.
+PORTRAIT_SIZE = 200
+PORTRAIT_QUALITY = 90
+_RECORD = struct.Struct('<qqq')
+
+def pack_index_path(pack_path):
+    """Where the index of a portrait pack is kept."""
+    return Path(pack_path).with_suffix('.idx')
+
+class PortraitPack:
+    """
+    The portraits of one run, keyed by the index of the face each was cropped from. Safe to use
+    from several threads, e.g. discovery adding portraits while the tagging screen reads them.
+    The files are opened on first use; close() releases them.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._entries = {}            # face index -> (offset, length) in the data file
+        self._data = None
+        self._index = None
+        self._lock = threading.Lock()
+        index_path = pack_index_path(self.path)
+        if self.path.exists() and index_path.exists():
+            records = index_path.read_bytes()
+            for start in range(0, len(records) - _RECORD.size + 1, _RECORD.size):
+                face_index, offset, length = _RECORD.unpack_from(records, start)
+                self._entries[face_index] = (offset, length)
+
+    def __contains__(self, face_index):
+        return face_index in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, face_index, image):
+        """Shrinks a portrait (a PIL image) to PORTRAIT_SIZE, encodes it as JPEG and appends it."""
+        image = image.convert('RGB')
+        image.thumbnail((PORTRAIT_SIZE, PORTRAIT_SIZE))
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=PORTRAIT_QUALITY)
+        data = buffer.getvalue()
+        with self._lock:
+            self._open()
+            offset = self._data.seek(0, os.SEEK_END)
+            self._data.write(data)
+            self._data.flush()
+            self._index.write(_RECORD.pack(face_index, offset, len(data)))
+            self._index.flush()
+            self._entries[face_index] = (offset, len(data))
+
+    def read(self, face_index):
+        """Returns the JPEG data of a face's portrait, or None if the pack has none."""
+        with self._lock:
+            entry = self._entries.get(face_index)
+            if entry is None:
+                return None
+            self._open()
+            self._data.seek(entry[0])
+            return self._data.read(entry[1])
+
+    def close(self):
+        with self._lock:
+            for f in (self._data, self._index):
+                if f is not None:
+                    f.close()
+            self._data = self._index = None
+
+    def _open(self):
+        if self._data is None:
+            self._data = open(self.path, 'a+b')
+            self._index = open(pack_index_path(self.path), 'ab')
@@ -0,0 +1,40 @@
+"""
+Finds every photo of a guest in an event that was already processed, using the face
+index the run wrote next to its result (face_index.npz in the job folder).
+
+Usage:
+    python src/search.py jobs/<job id>/face_index.npz guest.jpg --top-k 20
+    python src/search.py face_index.npz guest_1.jpg guest_2.jpg --tolerance 0.5 --json matches.json
+"""
+import argparse
+import json
+import sys
+
+import core
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search a FaceFolio face index by probe photos.")
+    parser.add_argument('index', help="Face index (.npz) written by a run.")
+    parser.add_argument('probes', nargs='+', help="Photos of the person to look for.")
+    parser.add_argument('--top-k', type=int, default=core.DEFAULT_TOP_K, help="Number of images to return.")
+    parser.add_argument('--tolerance', type=float, default=core.DEFAULT_TOLERANCE,
+                        help="Largest face distance that counts as a match.")
+    parser.add_argument('--json', dest='json_path', help="Also write the matches to this JSON file.")
+    args = parser.parse_args(argv)
+
+    try:
+        results, milliseconds = core.search_face_index(args.index, args.probes, args.top_k, args.tolerance)
+    except (OSError, ValueError, core.WorkflowError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    print(f"--- {len(results)} matching image(s), searched in {milliseconds:.2f} ms ---")
+    for result in results:
+        print(f"{result['distance']:.4f}  {result['image']}")
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump({'search_ms': round(milliseconds, 3), 'matches': results}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""
+Local HTTP/JSON job server around FaceFolio's core workflows.
+
+Usage:
+    python src/server.py --port 8765 --workers 2
+
+Endpoints:
+    POST   /uploads             Upload a .zip (raw request body); returns {"path": ...} to use in a job.
+    POST   /jobs                {"workflow": "reference" | "discovery" | "hybrid", "event": path,
+                                 "references": path (reference and hybrid), "options": {...}}
+    GET    /jobs                List all jobs.
+    GET    /jobs/<id>           Status and progress of one job.
+    GET    /jobs/<id>/result    Download the sorted zip of a finished job.
+    GET    /jobs/<id>/report    Download the per-image results of a finished job (JSON Lines).
+    POST   /jobs/<id>/search    {"probes": [path, ...], "top_k": 10, "tolerance": 0.6}: the job's images
+                                showing the person in the probe photos, closest first.
+    DELETE /jobs/<id>           Cancel a queued job or discard a finished one.
+"""
+import argparse
+import json
+import shutil
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import core
+from jobs import JobQueue, validate_search
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    server_version = "FaceFolio"
+
+    def do_GET(self):
+        parts = self._path_parts()
+        queue = self.server.job_queue
+        if parts == ['jobs']:
+            self._send_json(200, {'jobs': queue.list()})
+        elif len(parts) == 2 and parts[0] == 'jobs':
+            status = queue.status(parts[1])
+            if status is None:
+                self._send_json(404, {'error': "Unknown job."})
+            else:
+                self._send_json(200, status)
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'result':
+            self._send_result(parts[1])
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'report':
+            self._send_report(parts[1])
+        else:
+            self._send_json(404, {'error': "Not found."})
+
+    def do_POST(self):
+        parts = self._path_parts()
+        if parts == ['uploads']:
+            self._receive_upload()
+        elif parts == ['jobs']:
+            try:
+                spec = json.loads(self._read_body() or b'null')
+                job_id = self.server.job_queue.submit(spec)
+            except (ValueError, json.JSONDecodeError) as e:
+                self._send_json(400, {'error': str(e)})
+                return
+            self._send_json(202, {'id': job_id})
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'search':
+            self._search(parts[1])
+        else:
+            self._send_json(404, {'error': "Not found."})
+
+    def do_DELETE(self):
+        parts = self._path_parts()
+        if len(parts) == 2 and parts[0] == 'jobs':
+            if self.server.job_queue.remove(parts[1]):
+                self._send_json(200, {'id': parts[1], 'removed': True})
+            else:
+                self._send_json(409, {'error': "Unknown job, or the job is still running."})
+        else:
+            self._send_json(404, {'error': "Not found."})
+
+    def _path_parts(self):
+        return [part for part in self.path.split('?', 1)[0].split('/') if part]
+
+    def _read_body(self):
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def _receive_upload(self):
+        length = int(self.headers.get('Content-Length', 0))
+        if length <= 0:
+            self._send_json(400, {'error': "Send the .zip as the request body."})
+            return
+        upload_path = self.server.upload_dir / f"{uuid.uuid4().hex}.zip"
+        with open(upload_path, 'wb') as target:
+            remaining = length
+            while remaining:
+                chunk = self.rfile.read(min(UPLOAD_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                target.write(chunk)
+                remaining -= len(chunk)
+        self._send_json(201, {'path': str(upload_path.resolve()), 'bytes': length})
+
+    def _send_result(self, job_id):
+        result = self.server.job_queue.result_path(job_id)
+        if result is None or not result.exists():
+            self._send_json(409, {'error': "The job has no result (yet)."})
+            return
+        self._send_file(result, 'application/zip', f"FaceFolio_{job_id}.zip")
+
+    def _send_report(self, job_id):
+        report = self.server.job_queue.report_path(job_id)
+        if report is None:
+            self._send_json(409, {'error': "The job has no report (yet)."})
+            return
+        self._send_file(report, 'application/x-ndjson', f"FaceFolio_{job_id}_report.jsonl")
+
+    def _send_file(self, path, content_type, filename):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(path.stat().st_size))
+        self.send_header('Content-Disposition', f'attachment; filename="{filename}"')
+        self.end_headers()
+        with open(path, 'rb') as source:
+            shutil.copyfileobj(source, self.wfile)
+
+    def _search(self, job_id):
+        index_path = self.server.job_queue.face_index_path(job_id)
+        if index_path is None:
+            self._send_json(409, {'error': "The job has no face index (yet)."})
+            return
+        try:
+            probes, top_k, tolerance = validate_search(json.loads(self._read_body() or b'null'))
+            results, milliseconds = core.search_face_index(index_path, probes, top_k, tolerance)
+        except (OSError, ValueError, core.WorkflowError) as e:
+            self._send_json(400, {'error': str(e)})
+            return
+        self._send_json(200, {'search_ms': round(milliseconds, 3), 'matches': results})
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def create_server(host='127.0.0.1', port=8765, workers=2, jobs_root=core.JOBS_ROOT,
+                  memory_limit_mb=core.DEFAULT_MEMORY_LIMIT_MB):
+    """Creates (but does not start) a job server with its own queue and upload folder."""
+    server = ThreadingHTTPServer((host, port), JobRequestHandler)
+    server.job_queue = JobQueue(workers, jobs_root, memory_limit_mb)
+    server.upload_dir = server.job_queue.jobs_root / "uploads"
+    server.upload_dir.mkdir(exist_ok=True)
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the FaceFolio job server.")
+    parser.add_argument('--host', default='127.0.0.1', help="Interface to listen on (default: localhost only).")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=2, help="Number of jobs processed at the same time.")
+    parser.add_argument('--jobs-root', default=str(core.JOBS_ROOT), help="Folder for job workspaces and uploads.")
+    parser.add_argument('--memory-limit-mb', type=int, default=core.DEFAULT_MEMORY_LIMIT_MB,
+                        help="Memory for decoded images, shared by all running jobs.")
+    args = parser.parse_args(argv)
+
+    server = create_server(args.host, args.port, args.workers, args.jobs_root, args.memory_limit_mb)
+    print(f"--- FaceFolio job server listening on http://{args.host}:{server.server_port} "
+          f"with {args.workers} worker(s) ---")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.job_queue.shutdown()
+
+if __name__ == "__main__":
+    main()
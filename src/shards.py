@@ -0,0 +1,239 @@
+"""
+Sharded detection and encoding for events too large for one machine.
+
+Every node runs the detect/encode stage on its own slice of the event and writes a
+self-contained shard file. A merge step then sorts or clusters the combined encodings.
+
+Usage:
+    python src/shards.py detect EVENT --shard-index 0 --shard-count 4 --out shard_0.npz --report shard_0.jsonl
+    python src/shards.py merge EVENT shard_*.npz --workflow discovery --out FaceFolio_Sorted.zip --report merged.jsonl
+    python src/shards.py merge EVENT shard_*.npz --workflow reference --references refs.zip
+"""
+import argparse
+import json
+import shutil
+import sys
+from pathlib import Path
+
+import numpy as np
+
+import core
+from face_index import QUANTIZATIONS
+
+SHARD_FORMAT_VERSION = 1
+
+def image_keys(image_paths, root):
+    """Stable, node-independent names for the images of an event: their path relative to the event root."""
+    return [Path(path).relative_to(root).as_posix() for path in image_paths]
+
+def partition(keys, shard_count, shard_index):
+    """
+    Returns the keys that belong to one shard. Keys are sorted and cut into contiguous
+    ranges, so every node computes the same split and burst sequences mostly stay together.
+    """
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(f"Shard index must be between 0 and {shard_count - 1}, got {shard_index}.")
+    ordered = sorted(keys)
+    start = len(ordered) * shard_index // shard_count
+    end = len(ordered) * (shard_index + 1) // shard_count
+    return ordered[start:end]
+
+def _event_images(event_source, job):
+    """Collects an event's images and returns (key -> path, event root)."""
+    image_paths = core.collect_images(event_source, job.extracted_events_dir, job)
+    return dict(zip(image_keys(image_paths, job.event_root), image_paths)), job.event_root
+
+def run_shard(progress_callback, event_source, shard_index, shard_count, shard_path, job,
+              detection_policy='adaptive', quality_gate=None, workers=1, preset=core.DEFAULT_PRESET, governor=None):
+    """Runs the detect/encode stage on one shard of an event and writes it to shard_path."""
+    core.setup_directories(job)
+    images, _ = _event_images(event_source, job)
+    keys = partition(list(images), shard_count, shard_index)
+    print(f"--- Shard {shard_index + 1} of {shard_count}: {len(keys)} of {len(images)} images ---")
+
+    key_of = {images[key]: key for key in keys}
+    key_index = {key: i for i, key in enumerate(keys)}
+    face_images, face_locations, face_encodings = [], [], []
+    processed = []
+    for image_path, locations, encodings, _ in core.iter_image_faces(progress_callback, [images[key] for key in keys],
+                                                                    quality_gate, detection_policy, job, workers,
+                                                                    preset=preset, governor=governor):
+        processed.append(key_of[image_path])
+        for location, encoding in zip(locations, encodings):
+            face_images.append(key_index[key_of[image_path]])
+            face_locations.append(location)
+            face_encodings.append(encoding)
+
+    meta = {'version': SHARD_FORMAT_VERSION, 'shard_index': shard_index, 'shard_count': shard_count,
+            'total_images': len(images), 'images': keys, 'failed': sorted(set(keys) - set(processed)),
+            'detection_policy': detection_policy, 'preset': preset}
+    with open(shard_path, 'wb') as f:
+        np.savez_compressed(f, meta=np.array(json.dumps(meta)),
+                            face_images=np.array(face_images, dtype=np.int32),
+                            locations=np.array(face_locations, dtype=np.int32).reshape(-1, 4),
+                            encodings=np.array(face_encodings, dtype=np.float64).reshape(-1, 128))
+    print(f"--- Wrote {len(face_encodings)} faces to '{shard_path}' ---")
+    return shard_path
+
+def load_shard(shard_path):
+    """Reads a shard file. Returns (meta, list of (image key, location, encoding))."""
+    with np.load(shard_path) as data:
+        meta = json.loads(str(data['meta']))
+        if meta.get('version') != SHARD_FORMAT_VERSION:
+            raise ValueError(f"'{shard_path}' has unsupported shard format version {meta.get('version')}.")
+        faces = [(meta['images'][image], tuple(int(v) for v in location), encoding)
+                 for image, location, encoding in zip(data['face_images'], data['locations'], data['encodings'])]
+    return meta, faces
+
+def merge_shards(shard_paths):
+    """
+    Combines shard files into one list of (image key, location, encoding), ordered by image key.
+    Returns (faces, preset the encodings were made with, keys of the images that failed on their
+    node). Raises ValueError unless the shards form exactly one complete set made with the same preset.
+    """
+    loaded = [load_shard(path) for path in shard_paths]
+    if not loaded:
+        raise ValueError("No shard files given.")
+    shard_count = loaded[0][0]['shard_count']
+    total_images = loaded[0][0]['total_images']
+    indices = sorted(meta['shard_index'] for meta, _ in loaded)
+    if any(meta['shard_count'] != shard_count or meta['total_images'] != total_images for meta, _ in loaded):
+        raise ValueError("The shard files come from different partitions of the event.")
+    if indices != list(range(shard_count)):
+        raise ValueError(f"Expected shards 0-{shard_count - 1} exactly once, got {indices}.")
+    # Encodings made with different landmark models or jitters are not comparable.
+    presets = {meta.get('preset', core.DEFAULT_PRESET) for meta, _ in loaded}
+    if len(presets) > 1:
+        raise ValueError(f"The shard files were made with different presets: {', '.join(sorted(presets))}.")
+
+    failed = sorted(key for meta, _ in loaded for key in meta['failed'])
+    if failed:
+        print(f"  > {len(failed)} image(s) could not be processed on their node: {', '.join(failed[:10])}")
+    faces = [face for _, shard_faces in loaded for face in shard_faces]
+    faces.sort(key=lambda face: face[0])
+    return faces, presets.pop(), failed
+
+def _image_faces(faces, images, failed, report):
+    """
+    Regroups merged faces per image in the (image_path, locations, encodings, matches) form core
+    consumes, recording each image in the run report. Images that failed on their node are only reported.
+    """
+    grouped = {}
+    for key, location, encoding in faces:
+        locations, encodings = grouped.setdefault(key, ([], []))
+        locations.append(location)
+        encodings.append(encoding)
+    failed = set(failed)
+    for key in sorted(images):
+        if key in failed:
+            report.failed(images[key], "Could not be processed on its node.", {})
+            continue
+        locations, encodings = grouped.get(key, ([], []))
+        report.detected(images[key], locations, {})
+        yield images[key], locations, encodings, None
+
+def run_merge(progress_callback, event_source, shard_paths, job, workflow='discovery', reference_source=None,
+              tolerance=core.DEFAULT_TOLERANCE, index_quantization=core.DEFAULT_QUANTIZATION, unknown_people=False):
+    """
+    Merges shards and runs reference sorting, discovery or hybrid discovery on the combined encodings.
+    Every image and the identities found in it go to the job's run report. Returns the zip path.
+    """
+    faces, preset, failed = merge_shards(shard_paths)
+    core.setup_directories(job)
+    images, root = _event_images(event_source, job)
+    missing = {key for key, _, _ in faces} - set(images)
+    if missing:
+        raise ValueError(f"{len(missing)} image(s) in the shards are not part of this event, e.g. '{min(missing)}'.")
+    print(f"--- Merged {len(shard_paths)} shard(s): {len(faces)} faces in {len(images)} images ---")
+
+    report = job.report = core.RunReport(job.report_path, root)
+    try:
+        image_faces = core.index_image_faces(_image_faces(faces, images, failed, report), job, preset,
+                                             index_quantization)
+        zip_path = _sort_merged(progress_callback, image_faces, job, workflow, reference_source, tolerance, preset,
+                                unknown_people)
+        report.finish(workflow=workflow, shards=len(shard_paths), preset=preset)
+        return zip_path
+    finally:
+        report.close()
+        job.report = None
+
+def _sort_merged(progress_callback, image_faces, job, workflow, reference_source, tolerance, preset, unknown_people):
+    """Runs the merge's workflow on the merged (image_path, locations, encodings, matches) stream."""
+    if workflow == 'discovery':
+        face_store = core.discover_people(image_faces, tolerance, job)
+        return core.finish_discovery_run(progress_callback, face_store, job)
+
+    reference_dir = core.prepare_references(reference_source, job)
+    known_encodings, known_names = core.load_references_or_fail(reference_dir, preset)
+    if workflow == 'hybrid':
+        face_store = core.discover_people(image_faces, tolerance, job, known_encodings=known_encodings,
+                                          known_names=known_names)
+        return core.finish_discovery_run(progress_callback, face_store, job, reference_dir)
+    return core.finish_reference_run(image_faces, reference_dir, known_encodings, known_names, job,
+                                     progress_callback, unknown_people)
+
+def _print_progress(current, total, filename):
+    print(f"[{current}/{total}] {filename}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sharded face detection and encoding.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    detect = commands.add_parser('detect', help="Detect and encode one shard of an event.")
+    detect.add_argument('event', help="Event photos (.zip or folder), identical on every node.")
+    detect.add_argument('--shard-index', type=int, required=True)
+    detect.add_argument('--shard-count', type=int, required=True)
+    detect.add_argument('--out', required=True, help="Shard file to write (.npz).")
+    detect.add_argument('--detection-policy', default='adaptive', choices=core.DETECTION_POLICIES)
+    detect.add_argument('--workers', type=core.parse_workers, default=1,
+                        help="Worker processes for detection on this node, or 'auto' to size them from its cores and memory.")
+    detect.add_argument('--preset', default=core.DEFAULT_PRESET, choices=list(core.PRESETS),
+                        help="Speed/quality preset. Every shard of an event must use the same one.")
+    detect.add_argument('--report', help="Also keep the per-image results of this shard (JSON Lines) here.")
+    detect.add_argument('--memory-limit-mb', type=int, default=core.DEFAULT_MEMORY_LIMIT_MB,
+                        help="Memory for decoded images on this node, shared by its workers.")
+
+    merge = commands.add_parser('merge', help="Merge shard files and sort the event.")
+    merge.add_argument('event', help="Event photos (.zip or folder) the shards were made from.")
+    merge.add_argument('shards', nargs='+', help="Shard files (.npz) from every node.")
+    merge.add_argument('--workflow', choices=['discovery', 'reference', 'hybrid'], default='discovery')
+    merge.add_argument('--references', help="Reference photos (.zip or folder) for the reference and hybrid workflows.")
+    merge.add_argument('--tolerance', type=float, default=core.DEFAULT_TOLERANCE)
+    merge.add_argument('--unknown-people', action='store_true',
+                       help="Reference workflow: also sort faces that match no reference into Unknown_N folders.")
+    merge.add_argument('--index-quantization', default=core.DEFAULT_QUANTIZATION, choices=QUANTIZATIONS,
+                       help="How the merged face index stores encodings.")
+    merge.add_argument('--out', default=str(core.DEFAULT_JOB.download_zip_path), help="Where to put the sorted zip.")
+    merge.add_argument('--report', help="Also keep the per-image identities of the merged event (JSON Lines) here.")
+
+    args = parser.parse_args(argv)
+    job = core.JobContext.create()
+    try:
+        if args.command == 'detect':
+            run_shard(_print_progress, args.event, args.shard_index, args.shard_count, args.out, job,
+                      detection_policy=args.detection_policy, workers=args.workers, preset=args.preset,
+                      governor=core.MemoryGovernor(args.memory_limit_mb))
+            if args.report:
+                shutil.copy(job.report_path, args.report)
+        else:
+            if args.workflow != 'discovery' and not args.references:
+                parser.error(f"--references is required for the {args.workflow} workflow.")
+            zip_path = run_merge(_print_progress, args.event, args.shards, job, args.workflow,
+                                 args.references, args.tolerance, args.index_quantization, args.unknown_people)
+            shutil.move(str(zip_path), args.out)
+            print(f"--- Sorted zip written to '{args.out}' ---")
+            if args.report:
+                shutil.copy(job.report_path, args.report)
+    except (ValueError, core.WorkflowError) as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        # The cleanup runs on a daemon thread, which would die with this process and leave the workspace behind.
+        cleanup = core.discard_job(job)
+        if cleanup is not None:
+            cleanup.join()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""
+Encoding matrices shared between processes without copying.
+
+The owning process publishes a matrix into shared memory once. Pool workers attach to
+it by name and read it in place as a NumPy array, instead of receiving a pickled copy
+with every task. The owner may keep appending rows while workers read.
+"""
+from multiprocessing import shared_memory
+
+import numpy as np
+
+ENCODING_DIMENSIONS = 128
+
+# Header layout (int64 fields): [sequence, version, rows, capacity, dimensions], followed
+# by the name of the shared memory block that currently holds the rows.
+_HEADER_FIELDS = 5
+_NAME_OFFSET = 64
+_NAME_SIZE = 64
+_HEADER_SIZE = _NAME_OFFSET + _NAME_SIZE
+
+def _attach(name):
+    """Attaches to an existing block without taking over its cleanup."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 every attach is registered with the resource tracker. Pool workers
+        # share the owner's tracker, so the owner's unlink() clears that registration again.
+        return shared_memory.SharedMemory(name=name)
+
+def _close(block):
+    try:
+        block.close()
+    except BufferError:
+        # A caller still holds a view of the block; the mapping goes away with the view.
+        pass
+
+class SharedEncodingMatrix:
+    """
+    The owner's side of a shared (n, 128) float64 matrix.
+
+    Rows only ever get appended. A reader that took a snapshot of the first n rows can keep
+    using it while more rows arrive, because those rows are never written again. When the
+    block is full, the rows move to a block twice the size; the old block stays alive until
+    close() so readers that still map it are unaffected. Every change bumps `version`.
+    """
+
+    def __init__(self, encodings=None, capacity=1024, dimensions=ENCODING_DIMENSIONS):
+        encodings = np.asarray(encodings if encodings is not None and len(encodings) else
+                               np.empty((0, dimensions)), dtype=np.float64).reshape(-1, dimensions)
+        self.dimensions = dimensions
+        self._header = shared_memory.SharedMemory(create=True, size=_HEADER_SIZE)
+        self._fields = np.ndarray((_HEADER_FIELDS,), dtype=np.int64, buffer=self._header.buf)
+        self._fields[:] = 0
+        self._blocks = []
+        self._rows = 0
+        self._allocate(max(capacity, 2 * len(encodings)))
+        self.append(encodings)
+
+    @property
+    def descriptor(self):
+        """What a worker needs to attach: the name of the header block."""
+        return self._header.name
+
+    @property
+    def version(self):
+        return int(self._fields[1])
+
+    def __len__(self):
+        return self._rows
+
+    @property
+    def array(self):
+        """The published rows, as seen by the owner."""
+        return self._matrix[:self._rows]
+
+    def append(self, encodings):
+        """Appends rows and publishes them to readers. Returns the new version."""
+        encodings = np.asarray(encodings, dtype=np.float64).reshape(-1, self.dimensions)
+        if self._rows + len(encodings) > len(self._matrix):
+            self._allocate(2 * (self._rows + len(encodings)))
+        self._matrix[self._rows:self._rows + len(encodings)] = encodings
+        self._rows += len(encodings)
+        self._publish()
+        return self.version
+
+    def close(self):
+        """Releases every block. Readers must not take new snapshots afterwards."""
+        self._fields = None
+        self._matrix = None
+        for block in self._blocks + [self._header]:
+            _close(block)
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _allocate(self, capacity):
+        block = shared_memory.SharedMemory(create=True, size=capacity * self.dimensions * 8)
+        matrix = np.ndarray((capacity, self.dimensions), dtype=np.float64, buffer=block.buf)
+        if self._blocks:
+            matrix[:self._rows] = self._matrix[:self._rows]
+        self._blocks.append(block)
+        self._matrix = matrix
+        self._publish()
+
+    def _publish(self):
+        # An odd sequence number tells readers the header is being rewritten.
+        fields = self._fields
+        fields[0] += 1
+        name = self._blocks[-1].name.encode('ascii')
+        self._header.buf[_NAME_OFFSET:_NAME_OFFSET + _NAME_SIZE] = name.ljust(_NAME_SIZE, b'\0')
+        fields[1] += 1
+        fields[2] = self._rows
+        fields[3] = len(self._matrix)
+        fields[4] = self.dimensions
+        fields[0] += 1
+
+class SharedEncodingReader:
+    """
+    A worker's read-only, zero-copy view of a SharedEncodingMatrix.
+    Attaching is cheap, so workers keep one reader per descriptor for their lifetime.
+    """
+
+    def __init__(self, descriptor):
+        self._header = _attach(descriptor)
+        self._fields = np.ndarray((_HEADER_FIELDS,), dtype=np.int64, buffer=self._header.buf)
+        self._blocks = []
+        self._block_name = None
+        self._matrix = None
+        self._squared_norms = np.empty(0)
+
+    def snapshot(self):
+        """Returns (version, rows) for the rows published so far. The rows are a read-only view."""
+        while True:
+            sequence = int(self._fields[0])
+            if sequence % 2:
+                continue
+            version, rows, capacity, dimensions = (int(value) for value in self._fields[1:])
+            name = bytes(self._header.buf[_NAME_OFFSET:_NAME_OFFSET + _NAME_SIZE]).rstrip(b'\0').decode('ascii')
+            if int(self._fields[0]) == sequence:
+                break
+
+        if name != self._block_name:
+            # Earlier blocks stay mapped: snapshots handed out before the move may still use them.
+            self._blocks.append(_attach(name))
+            self._matrix = np.ndarray((capacity, dimensions), dtype=np.float64, buffer=self._blocks[-1].buf)
+            self._matrix.flags.writeable = False
+            self._block_name = name
+        return version, self._matrix[:rows]
+
+    def neighbours(self, encoding, max_distance):
+        """
+        Compares an encoding with every published row. Returns (rows searched, indices, distances)
+        of the rows within max_distance, in row order.
+        """
+        _, matrix = self.snapshot()
+        rows = len(matrix)
+        if rows > len(self._squared_norms):
+            # Rows never change once published, so their norms are computed only once.
+            added = matrix[len(self._squared_norms):rows]
+            self._squared_norms = np.concatenate([self._squared_norms, np.einsum('ij,ij->i', added, added)])
+        squared = self._squared_norms[:rows] + float(np.dot(encoding, encoding)) - 2 * (matrix @ encoding)
+        close = np.flatnonzero(squared <= max_distance ** 2)
+        return rows, close, np.sqrt(np.maximum(squared[close], 0))
+
+    def close(self):
+        self._matrix = None
+        self._fields = None
+        for block in self._blocks + [self._header]:
+            _close(block)
+        self._blocks = []
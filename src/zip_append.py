@@ -0,0 +1,156 @@
+"""
+Changing a zip in place: dropping entries and appending new ones without rewriting the rest.
+
+zipfile can only append after the old central directory and cannot drop entries. Here the old
+central directory is cut off, the new entries are written where it was, and a new central
+directory lists the kept entries where they already are, followed by the new ones. A dropped
+entry's data stays in the file as dead bytes that no directory points to; once those would make
+up more than MAX_DEAD_FRACTION of the file, append_entries declines and the zip should be
+written anew.
+"""
+import struct
+import zipfile
+import zlib
+
+# Past this fraction of dead bytes, a zip is written anew rather than appended to.
+MAX_DEAD_FRACTION = 0.5
+
+_LOCAL_HEADER = struct.Struct('<4s5H3L2H')
+_CENTRAL_HEADER = struct.Struct('<4s4B4H3L5H2L')
+_END = struct.Struct('<4s4H2LH')
+_ZIP64_END = struct.Struct('<4sQ2H2L4Q')
+_ZIP64_LOCATOR = struct.Struct('<4sLQL')
+_ZIP64_EXTRA = 0x0001
+_DATA_DESCRIPTOR = 0x08
+_UTF8_NAME = 0x800
+_COPY_CHUNK = 1024 * 1024
+# Sizes, offsets and entry counts from these on need Zip64 records.
+_ZIP64_LIMIT = 0xFFFFFFFF
+_ZIP64_ENTRY_LIMIT = 0xFFFF
+
+def append_entries(zip_path, drop, additions):
+    """
+    Drops the entries named in drop from a zip and appends additions, a list of (arcname, path)
+    like ZipFile.write takes, stored uncompressed. An addition replaces any entry of its name.
+    Returns False, leaving the zip untouched, if it cannot be changed this way: an entry was
+    written with a data descriptor, or the dead bytes would pass MAX_DEAD_FRACTION.
+    """
+    with zipfile.ZipFile(zip_path) as archive:
+        infos = archive.infolist()
+        comment = archive.comment
+    replaced = set(drop) | {arcname for arcname, _ in additions}
+    new_infos = [zipfile.ZipInfo.from_file(path, arcname) for arcname, path in additions]
+    with open(zip_path, 'r+b') as f:
+        data_end = live = 0
+        for info in infos:
+            if info.flag_bits & _DATA_DESCRIPTOR:
+                return False
+            end = info.header_offset + _local_header_size(f, info) + info.compress_size
+            data_end = max(data_end, end)
+            if info.filename not in replaced:
+                live += end - info.header_offset
+        appended = sum(_LOCAL_HEADER.size + len(info.filename) + info.file_size for info in new_infos)
+        if data_end - live > MAX_DEAD_FRACTION * (data_end + appended):
+            return False
+
+        f.seek(data_end)
+        f.truncate()
+        for info, (_, path) in zip(new_infos, additions):
+            _write_entry(f, info, path)
+        _write_central_directory(f, [info for info in infos if info.filename not in replaced] + new_infos, comment)
+    return True
+
+def _local_header_size(f, info):
+    f.seek(info.header_offset)
+    header = f.read(_LOCAL_HEADER.size)
+    if len(header) != _LOCAL_HEADER.size or header[:4] != b'PK\x03\x04':
+        raise zipfile.BadZipFile(f"Bad local header for '{info.filename}'.")
+    name_length, extra_length = struct.unpack('<2H', header[26:])
+    return _LOCAL_HEADER.size + name_length + extra_length
+
+def _write_entry(f, info, path):
+    """Writes a local header and the data of path, then fills in the CRC once it is known."""
+    info.compress_type = zipfile.ZIP_STORED
+    info.header_offset = f.tell()
+    name, flags = _encoded_name(info)
+    size = stored_size = info.file_size
+    extra = b''
+    if size >= _ZIP64_LIMIT:
+        extra = struct.pack('<2H2Q', _ZIP64_EXTRA, 16, size, size)
+        stored_size = 0xFFFFFFFF
+        info.extract_version = max(info.extract_version, 45)
+    date, time = _dos_date_time(info.date_time)
+    f.write(_LOCAL_HEADER.pack(b'PK\x03\x04', info.extract_version, flags, zipfile.ZIP_STORED, time, date,
+                               0, stored_size, stored_size, len(name), len(extra)) + name + extra)
+    crc = written = 0
+    if not info.is_dir():
+        with open(path, 'rb') as source:
+            for chunk in iter(lambda: source.read(_COPY_CHUNK), b''):
+                crc = zlib.crc32(chunk, crc)
+                written += len(chunk)
+                f.write(chunk)
+    if written != size:
+        raise OSError(f"'{path}' changed while it was added to the zip.")
+    info.CRC, info.compress_size = crc, size
+    end = f.tell()
+    f.seek(info.header_offset + 14)
+    f.write(struct.pack('<L', crc))
+    f.seek(end)
+
+def _write_central_directory(f, infos, comment):
+    start = f.tell()
+    for info in infos:
+        f.write(_central_record(info))
+    end = f.tell()
+    count, size, offset = len(infos), end - start, start
+    if count >= _ZIP64_ENTRY_LIMIT or size >= _ZIP64_LIMIT or offset >= _ZIP64_LIMIT:
+        f.write(_ZIP64_END.pack(b'PK\x06\x06', _ZIP64_END.size - 12, 45, 45, 0, 0, count, count, size, offset))
+        f.write(_ZIP64_LOCATOR.pack(b'PK\x06\x07', 0, end, 1))
+        count, size, offset = 0xFFFF, 0xFFFFFFFF, 0xFFFFFFFF
+    f.write(_END.pack(b'PK\x05\x06', 0, 0, count, count, size, offset, len(comment)) + comment)
+
+def _central_record(info):
+    name, flags = _encoded_name(info)
+    file_size, compress_size, offset = info.file_size, info.compress_size, info.header_offset
+    # Values too large for their field go to a Zip64 extra field, in this order.
+    zip64 = []
+    if file_size >= _ZIP64_LIMIT:
+        zip64.append(file_size)
+        file_size = 0xFFFFFFFF
+    if compress_size >= _ZIP64_LIMIT:
+        zip64.append(compress_size)
+        compress_size = 0xFFFFFFFF
+    if offset >= _ZIP64_LIMIT:
+        zip64.append(offset)
+        offset = 0xFFFFFFFF
+    extra = _without_zip64(info.extra)
+    extract_version = info.extract_version
+    if zip64:
+        extra = struct.pack(f'<2H{len(zip64)}Q', _ZIP64_EXTRA, 8 * len(zip64), *zip64) + extra
+        extract_version = max(extract_version, 45)
+    date, time = _dos_date_time(info.date_time)
+    return _CENTRAL_HEADER.pack(b'PK\x01\x02', info.create_version, info.create_system, extract_version,
+                                info.reserved, flags, info.compress_type, time, date, info.CRC,
+                                compress_size, file_size, len(name), len(extra), len(info.comment), 0,
+                                info.internal_attr, info.external_attr, offset) + name + extra + info.comment
+
+def _encoded_name(info):
+    """The entry name as bytes and the flag bits to go with it, as zipfile encodes names."""
+    try:
+        return info.filename.encode('ascii'), info.flag_bits & ~_UTF8_NAME
+    except UnicodeEncodeError:
+        return info.filename.encode('utf-8'), info.flag_bits | _UTF8_NAME
+
+def _without_zip64(extra):
+    """An entry's extra data without its Zip64 field, which is written anew."""
+    kept = b''
+    while len(extra) >= 4:
+        kind, length = struct.unpack('<2H', extra[:4])
+        if kind != _ZIP64_EXTRA:
+            kept += extra[:4 + length]
+        extra = extra[4 + length:]
+    return kept
+
+def _dos_date_time(date_time):
+    year, month, day, hour, minute, second = date_time
+    return (year - 1980) << 9 | month << 5 | day, hour << 11 | minute << 5 | second // 2
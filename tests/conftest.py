@@ -0,0 +1,38 @@
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# The modules live flat in src/ and import each other by name, as they do when run from there.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import core  # noqa: E402
+import shards  # noqa: E402
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+def unit(vector):
+    return vector / np.linalg.norm(vector)
+
+def person_encodings(rng, people, faces_per_person, spread=0.1):
+    """Synthetic 128-d encodings: tight groups around well separated centres, listed person by person."""
+    centres = [unit(rng.normal(size=128)) for _ in range(people)]
+    return [centre + rng.normal(scale=spread / np.sqrt(128), size=128)
+            for centre in centres for _ in range(faces_per_person)]
+
+def write_shard(path, shard_index, shard_count, all_keys, faces, failed=(), preset=core.DEFAULT_PRESET):
+    """A shard file as shards.run_shard writes it; faces are (key, location, encoding)."""
+    keys = shards.partition(all_keys, shard_count, shard_index)
+    meta = {'version': shards.SHARD_FORMAT_VERSION, 'shard_index': shard_index, 'shard_count': shard_count,
+            'total_images': len(all_keys), 'images': keys, 'failed': list(failed),
+            'detection_policy': 'adaptive', 'preset': preset}
+    faces = [face for face in faces if face[0] in keys]
+    np.savez(path, meta=np.array(json.dumps(meta)),
+             face_images=np.array([keys.index(key) for key, _, _ in faces], dtype=np.int32),
+             locations=np.array([location for _, location, _ in faces], dtype=np.int32).reshape(-1, 4),
+             encodings=np.array([encoding for _, _, encoding in faces]).reshape(-1, 128))
+    return path
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import core
+
+FACE = 60
+
+class SquareDetector:
+    """Stands in for face_recognition: every pure white square is a face."""
+
+    def __init__(self):
+        self.calls = []
+
+    def face_locations(self, image, upsample=1, model='hog'):
+        self.calls.append(image.shape[:2])
+        mask = image[..., 0] == 255
+        locations = []
+        for band_top, band_bottom in _runs(mask.any(axis=1)):
+            for left, right in _runs(mask[band_top:band_bottom].any(axis=0)):
+                (top, bottom), = _runs(mask[band_top:band_bottom, left:right].any(axis=1))
+                locations.append((band_top + top, right, band_top + bottom, left))
+        return locations
+
+def _runs(flags):
+    """(start, stop) of each run of True values."""
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], flags.astype(int), [0]])))
+    return list(zip(edges[::2], edges[1::2]))
+
+def frame(*corners):
+    image = np.full((480, 640, 3), 100, dtype=np.uint8)
+    for top, left in corners:
+        image[top:top + FACE, left:left + FACE] = 255
+    return image
+
+@pytest.fixture
+def detector(monkeypatch):
+    detector = SquareDetector()
+    monkeypatch.setattr(core, 'face_recognition', detector)
+    return detector
+
+def run_burst(tracker, frames):
+    start = datetime(2025, 6, 1, 12, 0, 0)
+    results = []
+    for n, image in enumerate(frames):
+        path = Path(f"burst_{n}.jpg")
+        tracker.capture_times[path] = start + timedelta(seconds=0.2 * n)
+        results.append(sorted(tracker.face_locations(path, image)))
+    return results
+
+def test_still_burst_reuses_locations(detector):
+    tracker = core.BurstTracker()
+    results = run_burst(tracker, [frame((100, 100 + 2 * n)) for n in range(4)])
+    assert results[-1] == [(100, 166, 160, 106)]
+    assert tracker.searched == 3 and tracker.fallbacks == 0
+    # Only the first frame was searched in full.
+    assert detector.calls.count((480, 640)) == 1
+
+def test_face_entering_mid_burst_is_found(detector):
+    tracker = core.BurstTracker()
+    frames = [frame((100, 100))] * 3 + [frame((100, 100), (300, 480))] * 2
+    results = run_burst(tracker, frames)
+    assert results[3] == [(100, 160, 160, 100), (300, 540, 360, 480)]
+    assert results[4] == results[3]
+
+def test_face_stepping_in_next_to_another_is_kept(detector):
+    tracker = core.BurstTracker()
+    # Small enough to fit in the first face's search window together with it.
+    frames = [frame((100, 100)), frame((100, 100))]
+    frames[1][110:140, 166:196] = 255
+    results = run_burst(tracker, frames)
+    assert results[1] == [(100, 160, 160, 100), (110, 196, 140, 166)]
+
+def test_reuse_can_be_turned_off(detector):
+    tracker = core.BurstTracker(reuse=False)
+    run_burst(tracker, [frame((100, 100))] * 3)
+    assert tracker.searched == 0
+    assert detector.calls == [(480, 640)] * 3
+    assert core.PRESETS['accurate']['burst_reuse'] is False
+
+def test_reuse_is_capped(detector):
+    tracker = core.BurstTracker()
+    run_burst(tracker, [frame((100, 100))] * (core.BURST_MAX_REUSED_FRAMES + 2))
+    assert detector.calls.count((480, 640)) == 2
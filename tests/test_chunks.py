@@ -0,0 +1,45 @@
+import pytest
+
+from core import CHUNKS_PER_WORKER, PARALLEL_CHUNK_SIZE, _estimated_wall_time, plan_chunks
+
+def covers_in_order(chunks, count):
+    return [i for start, stop in sorted(chunks) for i in range(start, stop)] == list(range(count))
+
+def test_chunks_are_contiguous_and_bounded():
+    costs = [1.0] * 100
+    chunks, chunk_costs, order = plan_chunks(costs, workers=2)
+    assert covers_in_order(chunks, len(costs))
+    assert all(0 < stop - start <= PARALLEL_CHUNK_SIZE for start, stop in chunks)
+    assert chunk_costs == [sum(costs[start:stop]) for start, stop in chunks]
+    assert sorted(order) == list(range(len(chunks)))
+
+def test_chunks_are_cut_by_cost():
+    # Two expensive images, each worth a whole target's share, get chunks of their own.
+    costs = [1.0] * 6 + [50.0, 50.0] + [1.0] * 6
+    chunks, _, _ = plan_chunks(costs, workers=1)
+    assert (6, 7) in chunks and (7, 8) in chunks
+    assert len(chunks) >= CHUNKS_PER_WORKER
+
+def test_largest_chunks_are_dispatched_first():
+    costs = [1.0, 1.0, 9.0, 1.0, 5.0, 1.0, 1.0, 3.0]
+    _, chunk_costs, order = plan_chunks(costs, workers=2)
+    dispatched = [chunk_costs[c] for c in order]
+    assert dispatched == sorted(dispatched, reverse=True)
+
+def test_leading_sample_is_dispatched_ahead_of_the_rest():
+    costs = [1.0] * 4 + [10.0] * 20
+    chunks, _, order = plan_chunks(costs, workers=2, leading=4)
+    assert covers_in_order(chunks, len(costs))
+    assert all(stop <= 4 or start >= 4 for start, stop in chunks)
+    leading = [c for c in order if chunks[c][0] < 4]
+    assert order[:len(leading)] == leading
+
+def test_largest_first_beats_arrival_order():
+    costs = [1.0] * 30 + [40.0, 40.0]
+    _, chunk_costs, order = plan_chunks(costs, workers=4)
+    in_order = _estimated_wall_time(chunk_costs, range(len(chunk_costs)), 4)
+    assert _estimated_wall_time(chunk_costs, order, 4) < in_order
+    assert _estimated_wall_time(chunk_costs, order, 4) == pytest.approx(max(max(chunk_costs), sum(costs) / 4))
+
+def test_no_images():
+    assert plan_chunks([], workers=4) == ([], [], [])
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+import core
+from core import HOG_MIN_FACE_SIZE, DetectionPolicy
+
+def smallest_face_found(policy, size):
+    """The smallest face (in full-image pixels) the plan for an image of this size lets HOG find."""
+    max_dimension, upsample = policy.plan(size)
+    return HOG_MIN_FACE_SIZE * max(size) / max_dimension / 2 ** upsample
+
+def test_fixed_plan_ignores_the_image():
+    for size in [(800, 600), (4000, 3000), (20000, 1000)]:
+        assert DetectionPolicy('fixed').plan(size) == (core.DETECTION_MAX_DIMENSION, 1)
+        assert DetectionPolicy('fixed', preset='fast').plan(size) == (round(core.DETECTION_MAX_DIMENSION * 0.75), 1)
+
+@pytest.mark.parametrize('size, plan', [
+    ((800, 600), (800, 1)),          # small photo: upsampled rather than left at 40px faces
+    ((4000, 3000), (2667, 0)),       # camera photo: downscaled, faces of 4% of the short side stay at 80px
+    ((12000, 9000), (2667, 0)),
+    ((20000, 1000), (4000, 2)),      # panorama: capped at ADAPTIVE_MAX_DIMENSION, then upsampled
+])
+def test_adaptive_plan(size, plan):
+    assert DetectionPolicy().plan(size) == plan
+
+@pytest.mark.parametrize('preset', list(core.PRESETS))
+@pytest.mark.parametrize('size', [(640, 480), (1600, 1200), (3000, 2000), (4000, 3000), (8000, 6000)])
+def test_adaptive_plan_finds_the_target_faces(preset, size):
+    policy = DetectionPolicy(preset=preset)
+    target = max(core.MIN_FACE_SIZE, core.TARGET_MIN_FACE_FRACTION * min(size)) / core.PRESETS[preset]['resolution']
+    assert smallest_face_found(policy, size) <= target + 1
+    # Without the upsample it needed, the plan would miss them.
+    max_dimension, upsample = policy.plan(size)
+    if upsample:
+        assert HOG_MIN_FACE_SIZE * max(size) / max_dimension / 2 ** (upsample - 1) > target
+
+def test_larger_minimum_face_needs_less_work():
+    assert DetectionPolicy(min_face_size=80).plan((800, 600)) == (800, 0)
+    assert DetectionPolicy(min_face_size=20).plan((800, 600)) == (800, 2)
+
+class EmptyTracker:
+    """A burst tracker that never finds anything and remembers what the retry found."""
+
+    def __init__(self):
+        self.remembered = None
+
+    def face_locations(self, image_path, image_data, upsample=1):
+        return []
+
+    def remember_locations(self, locations):
+        self.remembered = locations
+
+class RetryDetector:
+    def __init__(self):
+        self.calls = []
+
+    def face_locations(self, image, upsample=1, model='hog'):
+        self.calls.append((image.shape[:2], upsample, model))
+        return [(1, 11, 11, 1)]
+
+@pytest.fixture
+def detector(monkeypatch):
+    detector = RetryDetector()
+    monkeypatch.setattr(core, 'face_recognition', detector)
+    return detector
+
+def test_empty_images_are_retried_at_one_more_upsample(detector):
+    policy, tracker = DetectionPolicy(), EmptyTracker()
+    image = np.zeros((600, 800, 3), dtype=np.uint8)
+    assert policy.detect("a.jpg", image, 1, tracker) == [(1, 11, 11, 1)]
+    assert detector.calls == [((600, 800), 2, 'hog')] and tracker.remembered == [(1, 11, 11, 1)]
+    # Not past MAX_UPSAMPLE, nor when the retry would exceed RETRY_MAX_PIXELS.
+    assert policy.detect("b.jpg", image, core.MAX_UPSAMPLE, tracker) == []
+    assert policy.detect("c.jpg", np.zeros((3000, 4000, 3), dtype=np.uint8), 0, tracker) == []
+    stats = policy.stats()
+    assert (stats['images'], stats['retries'], stats['retry_hits']) == (3, 1, 1)
+    assert stats['upsample_counts'] == {0: 1, 1: 1, 2: 1}
+
+def test_fixed_policy_does_not_retry(detector):
+    assert DetectionPolicy('fixed').detect("a.jpg", np.zeros((600, 800, 3), dtype=np.uint8), 1, EmptyTracker()) == []
+    assert detector.calls == []
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        DetectionPolicy('exhaustive')
@@ -0,0 +1,52 @@
+import random
+import zipfile
+from pathlib import Path
+from types import SimpleNamespace
+
+import core
+
+def members(sizes):
+    return [SimpleNamespace(compress_size=size) for size in sizes]
+
+def test_split_ranges_are_contiguous_and_balanced():
+    rng = random.Random(0)
+    for _ in range(200):
+        sizes = [rng.choice([0, rng.randint(1, 5_000_000)]) for _ in range(rng.randint(0, 60))]
+        parts = rng.randint(1, 8)
+        ranges = core._split_ranges(members(sizes), parts)
+        assert len(ranges) <= parts
+        assert [index for first, last in ranges for index in range(first, last)] == list(range(len(sizes)))
+        assert all(first < last for first, last in ranges)
+        # No range holds more than its share plus the one member that pushed it over.
+        share = sum(sizes) / parts
+        assert all(sum(sizes[first:last]) <= share + max(sizes[first:last]) for first, last in ranges)
+
+def test_split_ranges_of_equal_members():
+    assert core._split_ranges(members([10] * 8), 4) == [(0, 2), (2, 4), (4, 6), (6, 8)]
+    assert core._split_ranges(members([10] * 3), 4) == [(0, 1), (1, 2), (2, 3)]
+    assert core._split_ranges([], 4) == []
+
+def test_flattened_names_never_collide():
+    paths = ["a/IMG_1.jpg", "b/IMG_1.jpg", "c/img_1.JPG", "IMG_1_2.jpg", "d/IMG_1.jpg", "e/IMG_1_2.jpg"]
+    names = core._flattened_names(paths)
+    assert names == ["IMG_1.jpg", "IMG_1_2.jpg", "img_1_3.JPG", "IMG_1_2_2.jpg", "IMG_1_4.jpg", "IMG_1_2_3.jpg"]
+    rng = random.Random(0)
+    for _ in range(100):
+        paths = [f"{rng.choice('abc')}/{rng.choice(['x', 'X', 'x_2', 'x_3'])}.jpg" for _ in range(30)]
+        names = core._flattened_names(paths)
+        assert len({name.lower() for name in names}) == len(paths)
+        # Only names are changed, never extensions, and the first photo keeps its name.
+        assert all(Path(name).suffix == '.jpg' for name in names) and names[0] == Path(paths[0]).name
+
+def test_extract_zip_with_several_threads(tmp_path):
+    zip_path = tmp_path / "event.zip"
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        for n in range(20):
+            zip_file.writestr(f"day{n % 2}/IMG_{n // 2}.jpg", bytes([n]) * (1000 * (n + 1)))
+        zip_file.writestr("notes.txt", b"not a photo")
+    extract_to = tmp_path / "extracted"
+    extract_to.mkdir()
+    paths = core.extract_zip(zip_path, extract_to, threads=3)
+    assert len(paths) == len(set(paths)) == 20
+    assert sorted(path.read_bytes()[0] for path in paths) == list(range(20))
+    assert all(len(path.read_bytes()) == 1000 * (path.read_bytes()[0] + 1) for path in paths)
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from conftest import person_encodings
+from face_index import FaceIndex, QUANTIZATIONS, exact_vectors_path
+
+PEOPLE = 20
+FACES_PER_PERSON = 5
+
+@pytest.fixture
+def encodings(rng):
+    return person_encodings(rng, PEOPLE, FACES_PER_PERSON)
+
+def build_index(tmp_path, encodings, quantization='float32'):
+    """One image per face; every fifth image also holds a second face, of the next person."""
+    image_faces = []
+    for i, encoding in enumerate(encodings):
+        faces = [encoding]
+        if i % 5 == 0:
+            faces.append(encodings[(i + FACES_PER_PERSON) % len(encodings)] + np.linspace(-0.01, 0.01, 128))
+        image_faces.append((tmp_path / "event" / f"img_{i:03d}.jpg", [(0, 10, 10, 0)] * len(faces), faces))
+    return FaceIndex.build(image_faces, 'balanced', quantization)
+
+def test_search_finds_each_image_of_the_person_once(tmp_path, encodings):
+    index = build_index(tmp_path, encodings)
+    results = index.search(encodings[7], top_k=10)
+    # Person 1 is faces 5-9, and image 0 holds a second face of person 1.
+    assert sorted(result['image'] for result in results) == ['img_000.jpg'] + [f'img_{i:03d}.jpg' for i in range(5, 10)]
+    assert results[0]['image'] == 'img_007.jpg' and results[0]['location'] == (0, 10, 10, 0)
+    assert results[0]['distance'] == pytest.approx(0, abs=1e-3)
+    assert [result['distance'] for result in results] == sorted(result['distance'] for result in results)
+    assert len(index.search(encodings[7], top_k=2)) == 2
+    assert index.search(-encodings[7]) == []
+
+@pytest.mark.parametrize('quantization', QUANTIZATIONS)
+def test_quantized_search_matches_the_exact_search(tmp_path, encodings, quantization):
+    exact = build_index(tmp_path, encodings)
+    path = tmp_path / "face_index.npz"
+    build_index(tmp_path, encodings, quantization).save(path)
+    index = FaceIndex.load(path)
+
+    assert index.quantization == quantization
+    assert exact_vectors_path(path).exists() == (quantization != 'float32')
+    assert index.bytes_per_face <= exact.bytes_per_face
+    for probe in encodings[::3]:
+        # Close candidates are re-ranked against the exact vectors, so even distances agree.
+        results, expected = index.search(probe), exact.search(probe)
+        assert [result['image'] for result in results] == [result['image'] for result in expected]
+        assert [result['distance'] for result in results] == pytest.approx([result['distance'] for result in expected],
+                                                                          abs=1e-3)
+
+def test_quantized_copy_keeps_the_manifest(tmp_path, encodings):
+    index = build_index(tmp_path, encodings)
+    copy = index.quantized('int8')
+    assert copy.images == index.images and copy.root == index.root
+    np.testing.assert_array_equal(copy.face_images, index.face_images)
+    assert len(copy) == len(index) == PEOPLE * FACES_PER_PERSON + PEOPLE
+
+def test_empty_index(tmp_path, encodings):
+    path = tmp_path / "face_index.npz"
+    FaceIndex.build([(tmp_path / "empty.jpg", [], [])], 'balanced', 'pq').save(path)
+    index = FaceIndex.load(path)
+    assert index.images == ['empty.jpg'] and len(index) == 0
+    assert index.search(encodings[0]) == []
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from conftest import person_encodings
+from face_store import FaceStore
+
+def build_store(encodings, tolerance=0.6):
+    store = FaceStore(tolerance)
+    for i, encoding in enumerate(encodings):
+        store.add_face(f"img_{i}.jpg", (0, 10, 10, 0), encoding)
+    return store
+
+def test_faces_of_one_person_are_grouped(rng):
+    store = build_store(person_encodings(rng, people=3, faces_per_person=4))
+    assert len(store.people) == 3
+    assert store.assignments == [0] * 4 + [1] * 4 + [2] * 4
+
+def test_recluster_matches_a_fresh_store_at_that_tolerance(rng):
+    encodings = [rng.normal(scale=0.04, size=128) for _ in range(40)]
+    store = build_store(encodings, tolerance=0.6)
+    for tolerance in (0.55, 0.65, 0.8, 0.6):
+        store.recluster(tolerance)
+        assert store.assignments == build_store(encodings, tolerance).assignments
+
+def test_recluster_rejects_tolerances_past_the_cached_graph():
+    with pytest.raises(ValueError):
+        FaceStore().recluster(0.9)
+
+def test_merge_moves_faces_and_keeps_ids_stable(rng):
+    store = build_store(person_encodings(rng, people=3, faces_per_person=3))
+    assert store.merge([0, 2]) == 0
+    assert store.people == [0, 1]
+    assert store.representatives[2] is None
+    assert sorted(store.faces_of(0)) == [0, 1, 2, 6, 7, 8]
+    assert store.assignments == [0, 0, 0, 1, 1, 1, 0, 0, 0]
+    np.testing.assert_allclose(store.centroid(0), store.encodings[[0, 1, 2, 6, 7, 8]].mean(axis=0))
+
+def test_split_undoes_a_merge(rng):
+    store = build_store(person_encodings(rng, people=2, faces_per_person=4))
+    store.merge([0, 1])
+    new_person = store.split(0)
+    assert new_person == 2
+    # The group holding the portrait face keeps the id.
+    assert sorted(store.faces_of(0)) == [0, 1, 2, 3]
+    assert sorted(store.faces_of(new_person)) == [4, 5, 6, 7]
+    assert store.representatives[new_person] in store.faces_of(new_person)
+    assert store.people == [0, 2]
+
+def test_split_needs_two_faces(rng):
+    store = build_store(person_encodings(rng, people=1, faces_per_person=1))
+    assert store.split(0) is None
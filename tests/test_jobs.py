@@ -0,0 +1,56 @@
+import pytest
+
+import core
+from jobs import validate_search, validate_spec
+
+@pytest.fixture
+def event(tmp_path):
+    path = tmp_path / "event"
+    path.mkdir()
+    return path
+
+def spec(event, workflow='discovery', **options):
+    return {'workflow': workflow, 'event': str(event), 'references': str(event), 'options': options}
+
+def test_valid_spec_is_normalised(event):
+    normalised = validate_spec(spec(event, tolerance=0.5, min_face_size=30, min_sharpness=5.5, workers='auto'))
+    assert normalised == {'workflow': 'discovery', 'event': str(event.resolve()),
+                          'options': {'tolerance': 0.5, 'min_face_size': 30, 'min_sharpness': 5.5, 'workers': 'auto'}}
+    assert validate_spec(spec(event, 'hybrid'))['references'] == str(event.resolve())
+
+@pytest.mark.parametrize('options', [
+    {'tolerance': 0}, {'tolerance': core.NEIGHBOUR_DISTANCE_CAP + 0.01}, {'tolerance': True}, {'tolerance': '0.5'},
+    {'min_face_size': -1}, {'min_sharpness': 'sharp'}, {'workers': 0}, {'workers': 'many'},
+    {'detection_policy': 'fastest'}, {'preset': 'best'}, {'index_quantization': 'int4'},
+])
+def test_invalid_options_are_rejected(event, options):
+    with pytest.raises(ValueError):
+        validate_spec(spec(event, **options))
+
+def test_options_must_belong_to_the_workflow(event):
+    with pytest.raises(ValueError, match='unknown_people'):
+        validate_spec(spec(event, unknown_people=True))
+    with pytest.raises(ValueError, match='tolerance'):
+        validate_spec(spec(event, 'reference', tolerance=0.5))
+
+def test_sources_must_exist(event, tmp_path):
+    with pytest.raises(ValueError, match="'references' is required"):
+        validate_spec({'workflow': 'reference', 'event': str(event)})
+    with pytest.raises(ValueError, match='does not exist'):
+        validate_spec({'workflow': 'discovery', 'event': str(tmp_path / "missing")})
+    with pytest.raises(ValueError):
+        validate_spec({'workflow': 'sorting', 'event': str(event)})
+
+def test_search_defaults():
+    assert validate_search({'probes': ['a.jpg']}) == (['a.jpg'], core.DEFAULT_TOP_K, core.DEFAULT_TOLERANCE)
+    assert validate_search({'probes': ['a.jpg', 'b.jpg'], 'top_k': 3, 'tolerance': 1}) == (['a.jpg', 'b.jpg'], 3, 1.0)
+
+@pytest.mark.parametrize('query', [
+    None, [], {}, {'probes': 'a.jpg'}, {'probes': []}, {'probes': ['']}, {'probes': [1]},
+    {'probes': ['a.jpg'], 'top_k': [3]}, {'probes': ['a.jpg'], 'top_k': 0}, {'probes': ['a.jpg'], 'top_k': 2.5},
+    {'probes': ['a.jpg'], 'top_k': True}, {'probes': ['a.jpg'], 'tolerance': {'max': 1}},
+    {'probes': ['a.jpg'], 'tolerance': '0.5'}, {'probes': ['a.jpg'], 'tolerance': 0},
+])
+def test_invalid_searches_are_rejected(query):
+    with pytest.raises(ValueError):
+        validate_search(query)
@@ -0,0 +1,62 @@
+import os
+import threading
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import core
+
+MB = 1_000_000
+
+def in_flight(governor):
+    return governor._in_flight.value
+
+def die_holding(nbytes, governor=None):
+    """Runs in a worker process: dies in the middle of a reservation."""
+    with (governor or core._worker_governor).reserve(nbytes):
+        os._exit(1)
+
+def test_reservations_wait_for_budget():
+    governor = core.MemoryGovernor(10)
+    admitted, release = threading.Event(), threading.Event()
+
+    def reserve():
+        with governor.reserve(4 * MB):
+            admitted.set()
+            release.wait(5)
+
+    with governor.reserve(8 * MB):
+        waiter = threading.Thread(target=reserve)
+        waiter.start()
+        assert not admitted.wait(0.1)
+    assert admitted.wait(5) and in_flight(governor) == 4 * MB
+    release.set()
+    waiter.join(5)
+    assert in_flight(governor) == 0
+
+def test_an_oversized_image_is_admitted_alone():
+    governor = core.MemoryGovernor(10)
+    with governor.reserve(50 * MB):
+        assert in_flight(governor) == 50 * MB
+    assert in_flight(governor) == 0
+
+def test_scoped_view_reclaims_what_its_holders_kept():
+    governor = core.MemoryGovernor(10)
+    view = governor.scoped()
+    with view.reserve(2 * MB):
+        pass
+    holder = core._worker_context.Process(target=die_holding, args=(3 * MB, view))
+    holder.start()
+    holder.join(30)
+    with governor.reserve(1 * MB):
+        assert in_flight(governor) == 4 * MB
+        assert view.reclaim() == 3 * MB
+        assert in_flight(governor) == 1 * MB
+    assert view.reclaim() == 0 and in_flight(governor) == 0
+
+def test_pool_gives_back_the_budget_of_a_dead_worker():
+    governor = core.MemoryGovernor(10)
+    with pytest.raises(BrokenProcessPool):
+        with core._detection_pool(1, governor, 1) as pool:
+            pool.submit(die_holding, 6 * MB).result()
+    assert in_flight(governor) == 0
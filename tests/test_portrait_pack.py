@@ -0,0 +1,46 @@
+import io
+
+from PIL import Image
+
+from portrait_pack import PORTRAIT_SIZE, PortraitPack, pack_index_path
+
+def portrait(colour, size=(300, 240)):
+    return Image.new('RGB', size, colour)
+
+def decode(data):
+    return Image.open(io.BytesIO(data))
+
+def test_portraits_round_trip(tmp_path):
+    pack = PortraitPack(tmp_path / "portraits.pack")
+    pack.add(3, portrait('red'))
+    pack.add(7, portrait('blue', (50, 80)))
+    assert 3 in pack and 7 in pack and 5 not in pack and len(pack) == 2
+    assert pack.read(5) is None
+
+    red = decode(pack.read(3))
+    assert red.format == 'JPEG' and max(red.size) == PORTRAIT_SIZE
+    assert red.getpixel((10, 10))[0] > 200
+    # Small portraits are not enlarged.
+    assert decode(pack.read(7)).size == (50, 80)
+
+def test_pack_reopens_and_last_portrait_wins(tmp_path):
+    path = tmp_path / "portraits.pack"
+    pack = PortraitPack(path)
+    pack.add(1, portrait('red'))
+    pack.add(2, portrait('green'))
+    pack.add(1, portrait('blue'))
+    pack.close()
+    assert pack_index_path(path).exists()
+
+    reopened = PortraitPack(path)
+    assert len(reopened) == 2
+    assert decode(reopened.read(1)).getpixel((10, 10))[2] > 200
+    reopened.add(4, portrait('white'))
+    assert len(PortraitPack(path)) == 3
+    reopened.close()
+
+def test_missing_pack_is_empty(tmp_path):
+    pack = PortraitPack(tmp_path / "none.pack")
+    assert len(pack) == 0 and pack.read(0) is None
+    pack.close()
+    assert not (tmp_path / "none.pack").exists()
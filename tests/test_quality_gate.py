@@ -0,0 +1,52 @@
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+import core
+from core import FaceQualityGate, _sharpness
+
+def stripes(levels, size=60):
+    """A gray crop of vertical stripes that alternate by `levels` gray levels."""
+    row = np.where(np.arange(size) % 2, 100 + levels, 100)
+    return np.repeat(np.repeat(row[None, :, None], size, axis=0), 3, axis=2).astype(np.uint8)
+
+def test_sharpness_of_known_patterns():
+    # Every pixel of a stripe pattern has a Laplacian of +-2 levels, so its variance is 4 levels^2.
+    assert _sharpness(stripes(0)) == 0.0
+    assert _sharpness(stripes(1)) == 4.0
+    assert _sharpness(stripes(2)) == 16.0
+    assert _sharpness(stripes(2)[:2]) == 0.0
+
+def test_blur_falls_below_the_threshold(rng):
+    face = rng.normal(128, 40, size=(80, 80, 3)).clip(0, 255).astype(np.uint8)
+    blurred = np.asarray(Image.fromarray(face).filter(ImageFilter.GaussianBlur(4)))
+    assert _sharpness(face) > core.MIN_FACE_SHARPNESS > _sharpness(blurred)
+
+def test_gate_drops_small_and_blurry_faces():
+    image = np.full((200, 300, 3), 100, dtype=np.uint8)
+    image[0:60, 0:60] = stripes(2)
+    image[0:60, 100:160] = stripes(1)
+    image[100:125, 0:25] = stripes(2, 25)
+    sharp, blurry, small = (0, 60, 60, 0), (0, 160, 60, 100), (100, 25, 125, 0)
+
+    gate = FaceQualityGate()
+    # The image was detected at half size, so the faces are twice as large in the full image.
+    assert gate.filter(Path("a.jpg"), image, [sharp, blurry, small], 2.0) == [sharp, small]
+    assert gate.filter(Path("b.jpg"), image, [sharp, blurry, small], 1.0) == [sharp]
+    assert [(face['path'], face['reason']) for face in gate.filtered] == [
+        ("a.jpg", "too blurry"), ("b.jpg", "too blurry"), ("b.jpg", "too small")]
+    assert gate.filtered[0]['location'] == [0, 320, 120, 200] and gate.filtered[0]['sharpness'] == 4.0
+    assert gate.passed == 3
+
+    # A gate at 0 keeps every face.
+    assert FaceQualityGate(0, 0).filter(Path("a.jpg"), image, [sharp, blurry, small], 1.0) == [sharp, blurry, small]
+
+def test_gates_of_workers_merge():
+    image = stripes(1)
+    gate, other = FaceQualityGate(), FaceQualityGate()
+    gate.filter(Path("a.jpg"), image, [(0, 60, 60, 0)], 1.0)
+    other.filter(Path("b.jpg"), stripes(3), [(0, 60, 60, 0)], 1.0)
+    gate.merge(other)
+    assert (gate.passed, len(gate.filtered)) == (1, 1)
+    assert "1 face(s) skipped" in gate.summary() and "1 encoded" in gate.summary()
@@ -0,0 +1,105 @@
+import hashlib
+import zipfile
+
+import pytest
+
+import core
+from conftest import person_encodings
+from face_store import FaceStore
+
+PEOPLE = 8
+FACES_PER_PERSON = 3
+
+@pytest.fixture
+def event(tmp_path, rng):
+    """
+    Photos of PEOPLE people in two subfolders that reuse the same file names, one reference
+    photo of the first person, and a FaceStore seeded with it as 'alice'.
+    """
+    event_dir, reference_dir = tmp_path / "event", tmp_path / "references"
+    for folder in ("day1", "day2"):
+        (event_dir / folder).mkdir(parents=True)
+    reference_dir.mkdir()
+    (reference_dir / "alice.jpg").write_bytes(b"reference photo of alice")
+
+    encodings = person_encodings(rng, PEOPLE, FACES_PER_PERSON)
+    image_paths = []
+    for i in range(len(encodings)):
+        path = event_dir / ("day1" if i % 2 else "day2") / f"IMG_{i // 2:04d}.jpg"
+        path.write_bytes(f"event photo {i}".encode())
+        image_paths.append(path)
+
+    store = FaceStore()
+    store.seed(["alice"], [encodings[0]])
+    for path, encoding in zip(image_paths, encodings):
+        store.add_face(path, (0, 10, 10, 0), encoding)
+    return event_dir, reference_dir, store
+
+def sorted_job(root, event_dir, reference_dir, store, names):
+    job = core.JobContext(root)
+    core.setup_directories(job)
+    core.collect_images(event_dir, job.extracted_events_dir, job)
+    core.sort_photos_by_discovered_faces(lambda *args: None, store, names, job=job)
+    core.copy_reference_photos(reference_dir, job=job)
+    core.create_download_zip(job.output_dir, job.download_zip_path)
+    return job
+
+def output_state(job):
+    """The output folder and the zip, each as {relative path: content hash or 'dir'}."""
+    def digest(data):
+        return hashlib.md5(data).hexdigest()
+    files = {path.relative_to(job.output_dir).as_posix(): digest(path.read_bytes()) if path.is_file() else 'dir'
+             for path in job.output_dir.rglob('*')}
+    with zipfile.ZipFile(job.download_zip_path) as zip_file:
+        assert zip_file.testzip() is None
+        entries = {info.filename.rstrip('/'): 'dir' if info.is_dir() else digest(zip_file.read(info))
+                   for info in zip_file.infolist()}
+    return files, entries
+
+def test_resort_matches_a_fresh_sort(tmp_path, event):
+    event_dir, reference_dir, store = event
+    people = store.unnamed_people
+    names = {person: f"Person_{n}" for n, person in enumerate(people, 1)}
+    job = sorted_job(tmp_path / "job", event_dir, reference_dir, store, names)
+    core.write_sort_manifest(job, store, names, reference_dir)
+    # Same-named photos of the two folders were both kept.
+    assert len(list((job.output_dir / "Person_1").iterdir())) == FACES_PER_PERSON
+
+    def check(edit, changes, n):
+        nonlocal names
+        names = {**names, **changes}
+        changed = core.resort_photos(lambda *args: None, store, names, job, reference_dir)
+        fresh = sorted_job(tmp_path / f"fresh_{n}", event_dir, reference_dir, store, names)
+        files, entries = output_state(job)
+        assert (files, entries) == output_state(fresh), edit
+        assert files == entries, edit
+        return changed
+
+    assert check("rename", {people[0]: "Fixed_Name"}, 0) == 0
+    assert check("merge by name", {people[1]: "Person_3"}, 1)
+    assert check("into reference", {people[3]: "alice"}, 2)
+    assert check("untag", {people[4]: ""}, 3)
+    assert check("swap", {people[5]: names[people[6]], people[6]: names[people[5]]}, 4)
+    assert check("retag", {people[4]: "Back"}, 5)
+    # Faces split off a person lose its name until they are given one.
+    assert check("split", {store.split(people[2]): "Split_off"}, 6)
+
+def test_resort_leaves_unchanged_entries_in_place(tmp_path, event):
+    event_dir, reference_dir, store = event
+    people = store.unnamed_people
+    names = {person: f"Person_{n}" for n, person in enumerate(people, 1)}
+    job = sorted_job(tmp_path / "job", event_dir, reference_dir, store, names)
+    core.write_sort_manifest(job, store, names, reference_dir)
+
+    def offsets():
+        with zipfile.ZipFile(job.download_zip_path) as zip_file:
+            return {info.filename: info.header_offset for info in zip_file.infolist()}
+
+    before = offsets()
+    core.resort_photos(lambda *args: None, store, {**names, people[1]: "Person_3"}, job, reference_dir)
+    after = offsets()
+    moved = {name for name in after if before.get(name) != after[name]}
+    # Only the photos that joined Person_3 were appended; everything else kept its place.
+    assert moved == {name.replace("Person_2/", "Person_3/") for name in before
+                     if name.startswith("Person_2/") and name != "Person_2/"}
+    assert output_state(job)[0] == output_state(job)[1]
@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+import core
+
+@pytest.fixture
+def machine(monkeypatch):
+    """Pretends to run on a machine with the given cores and available memory."""
+    def configure(cores, memory_mb):
+        monkeypatch.setattr(core, 'available_cores', lambda: cores)
+        monkeypatch.setattr(core, 'available_memory_mb', lambda: memory_mb)
+    monkeypatch.setattr(core, '_concurrent_runs', 1)
+    return configure
+
+def test_auto_takes_a_worker_per_core(machine):
+    machine(8, 64000)
+    plan = core.plan_resources('auto', 1000)
+    assert (plan.mode, plan.workers, plan.threads_per_worker) == ('auto', 8, 1)
+
+def test_auto_is_bounded_by_memory(machine):
+    machine(8, 2000)
+    assert core.plan_resources('auto', 1000).workers == 2000 // core.WORKER_MEMORY_MB['hog']
+    # The cnn detector's workers need more memory each.
+    assert core.plan_resources('auto', 1000, 'accurate').workers == 2000 // core.WORKER_MEMORY_MB['cnn']
+
+def test_auto_is_bounded_by_chunks(machine):
+    machine(8, 64000)
+    plan = core.plan_resources('auto', 2 * core.PARALLEL_CHUNK_SIZE)
+    assert (plan.workers, plan.threads_per_worker) == (2, 4)
+    assert core.plan_resources('auto', 0).workers == 1
+
+def test_auto_without_memory_information(machine):
+    machine(4, None)
+    assert core.plan_resources('auto', 1000).workers == 4
+
+def test_concurrent_runs_share_the_machine(machine):
+    machine(8, 64000)
+    core.set_concurrent_runs(2)
+    plan = core.plan_resources('auto', 1000)
+    assert (plan.workers, plan.cores, plan.memory_mb) == (4, 4, 32000)
+
+def test_manual_workers_get_their_share_of_threads(machine):
+    machine(8, 64000)
+    plan = core.plan_resources(3, 1000)
+    assert (plan.mode, plan.workers, plan.threads_per_worker) == ('manual', 3, 2)
+    with pytest.raises(ValueError):
+        core.plan_resources(0, 1000)
+
+def test_workers_start_with_their_thread_limit(monkeypatch):
+    monkeypatch.setenv('OMP_NUM_THREADS', '16')
+    monkeypatch.delenv('OPENBLAS_NUM_THREADS', raising=False)
+    with core._detection_pool(1, core.MemoryGovernor(), 3) as pool:
+        assert pool.submit(os.getenv, 'OMP_NUM_THREADS').result() == '3'
+        assert pool.submit(os.getenv, 'OPENBLAS_NUM_THREADS').result() == '3'
+    assert os.environ['OMP_NUM_THREADS'] == '16'
+    assert 'OPENBLAS_NUM_THREADS' not in os.environ
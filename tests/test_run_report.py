@@ -0,0 +1,90 @@
+import json
+from pathlib import Path
+
+from PIL import Image
+
+import core
+import shards
+from core import RunReport
+from conftest import person_encodings, write_shard
+
+def read_lines(path):
+    return [json.loads(line) for line in Path(path).read_text().splitlines()]
+
+def test_report_lines(tmp_path):
+    # The job root may not exist yet, e.g. for benchmark runs.
+    path = tmp_path / "job" / "run_report.jsonl"
+    report = RunReport(path)
+    report.detected(Path("a.jpg"), [(1, 20, 21, 0), (5, 60, 65, 40)], {'decode': 0.010, 'detect': 0.030})
+    report.identified(Path("a.jpg"), [{'name': 'alice', 'person': None, 'distance': 0.412345},
+                                      {'name': None, 'person': 3, 'distance': None}], 0.002)
+    report.failed(Path("b.jpg"), "cannot identify image file", {'decode': 0.001})
+    report.detected(Path("c.jpg"), [], {'decode': 0.005, 'detect': 0.010})
+    report.finish(workers=2)
+    report.close()
+
+    image_a, image_b, image_c, run = read_lines(path)
+    assert image_a == {'type': 'image', 'image': 'a.jpg', 'error': None,
+                       'faces': [{'location': [1, 20, 21, 0], 'name': 'alice', 'person': None, 'distance': 0.4123},
+                                 {'location': [5, 60, 65, 40], 'name': None, 'person': 3, 'distance': None}],
+                       'ms': {'decode': 10.0, 'detect': 30.0, 'match': 2.0}}
+    assert image_b == {'type': 'image', 'image': 'b.jpg', 'error': 'cannot identify image file', 'faces': [],
+                       'ms': {'decode': 1.0}}
+    assert image_c['faces'] == [] and image_c['error'] is None
+    assert run == {'type': 'run', 'images': 3, 'faces': 2, 'errors': 1,
+                   'ms': {'decode': 16.0, 'detect': 40.0, 'match': 2.0}, 'workers': 2}
+
+def test_identities_only_apply_to_the_pending_image(tmp_path):
+    report = RunReport(tmp_path / "run_report.jsonl")
+    report.detected(Path("a.jpg"), [(0, 1, 1, 0)], {})
+    report.identified(Path("other.jpg"), [{'name': 'bob', 'person': None, 'distance': 0.3}], 0.001)
+    report.close()
+    (image,) = read_lines(tmp_path / "run_report.jsonl")
+    assert image['faces'] == [{'location': [0, 1, 1, 0]}] and image['ms'] == {}
+
+def test_records_are_written_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(core, 'REPORT_BUFFER_RECORDS', 4)
+    path = tmp_path / "run_report.jsonl"
+    report = RunReport(path)
+    for i in range(6):
+        report.detected(Path(f"{i}.jpg"), [], {})
+    # Five images are complete: one batch of four has been written, the fifth is buffered.
+    report._file.flush()
+    assert len(read_lines(path)) == 4
+    report.close()
+    assert [line['image'] for line in read_lines(path)] == [f"{i}.jpg" for i in range(6)]
+
+def test_images_are_named_relative_to_the_event(tmp_path):
+    event = tmp_path / "event"
+    report = RunReport(tmp_path / "run_report.jsonl", event)
+    report.detected(event / "ceremony" / "IMG_0001.jpg", [], {})
+    report.identified(event / "ceremony" / "IMG_0001.jpg", [], 0.001)
+    report.failed(event / "IMG_0002.jpg", "truncated", {})
+    report.close()
+    first, second = read_lines(tmp_path / "run_report.jsonl")
+    assert (first['image'], first['ms']) == ('ceremony/IMG_0001.jpg', {'match': 1.0})
+    assert second['image'] == 'IMG_0002.jpg'
+
+def test_merge_reports_identities(tmp_path, rng):
+    event = tmp_path / "event"
+    keys = ['a/1.jpg', 'a/2.jpg', 'b/1.jpg', 'b/2.jpg']
+    for key in keys:
+        (event / key).parent.mkdir(parents=True, exist_ok=True)
+        Image.new('RGB', (120, 120), (128, 100, 90)).save(event / key)
+    alice = person_encodings(rng, 1, 3)
+    location = (10, 60, 60, 10)
+    faces = [('a/1.jpg', location, alice[0]), ('b/1.jpg', location, alice[1]), ('b/2.jpg', location, alice[2])]
+    shard_paths = [write_shard(tmp_path / "shard_0.npz", 0, 2, keys, faces),
+                   write_shard(tmp_path / "shard_1.npz", 1, 2, keys, faces, failed=['b/2.jpg'])]
+
+    job = core.JobContext(tmp_path / "job")
+    shards.run_merge(lambda *args: None, event, shard_paths, job)
+    records = read_lines(job.report_path)
+    assert [record.get('image') for record in records] == keys + [None]
+    a1, a2, b1, b2, run = records
+    assert a1['faces'] == [{'location': list(location), 'name': None, 'person': 0, 'distance': None}]
+    assert b1['faces'][0]['person'] == 0 and b1['faces'][0]['distance'] < core.DEFAULT_TOLERANCE
+    assert a2['faces'] == [] and a2['error'] is None
+    assert b2['error'] and b2['faces'] == []
+    assert run == {'type': 'run', 'images': 4, 'faces': 2, 'errors': 1, 'ms': run['ms'],
+                   'workflow': 'discovery', 'shards': 2, 'preset': core.DEFAULT_PRESET}
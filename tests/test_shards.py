@@ -0,0 +1,64 @@
+import random
+
+import numpy as np
+import pytest
+
+import core
+import shards
+from conftest import write_shard
+
+KEYS = [f"day{day}/IMG_{n:04d}.jpg" for day in (1, 2) for n in range(23)]
+
+def test_partition_covers_every_key_once():
+    for shard_count in (1, 2, 3, 7, len(KEYS), len(KEYS) + 5):
+        parts = [shards.partition(KEYS, shard_count, index) for index in range(shard_count)]
+        assert [key for part in parts for key in part] == sorted(KEYS)
+        sizes = [len(part) for part in parts]
+        assert max(sizes) - min(sizes) <= 1
+
+def test_partition_is_the_same_on_every_node():
+    shuffled = KEYS[:]
+    random.Random(0).shuffle(shuffled)
+    assert all(shards.partition(shuffled, 4, index) == shards.partition(KEYS, 4, index) for index in range(4))
+    # Contiguous ranges keep a burst of consecutive frames on one node.
+    assert shards.partition(KEYS, 2, 0) == sorted(KEYS)[:len(KEYS) // 2]
+
+def test_partition_rejects_an_index_outside_the_shards():
+    for index in (-1, 3):
+        with pytest.raises(ValueError):
+            shards.partition(KEYS, 3, index)
+
+@pytest.fixture
+def faces(rng):
+    """Two faces in every third image, one in the others, none in every fifth."""
+    faces = []
+    for n, key in enumerate(KEYS):
+        for face in range(0 if n % 5 == 0 else 2 if n % 3 == 0 else 1):
+            faces.append((key, (n, 10 * face + 20, n + 10, 10 * face), rng.normal(size=128)))
+    return faces
+
+def test_merge_is_lossless_and_ordered(tmp_path, faces):
+    paths = [write_shard(tmp_path / f"shard_{index}.npz", index, 3, KEYS, faces, failed=[KEYS[index]] if index else ())
+             for index in range(3)]
+    merged, preset, failed = shards.merge_shards(paths)
+    assert preset == core.DEFAULT_PRESET and failed == KEYS[1:3]
+    # Every face comes back once, and faces of one image keep their order.
+    expected = sorted(faces, key=lambda face: face[0])
+    assert [(key, location) for key, location, _ in merged] == [(key, location) for key, location, _ in expected]
+    assert all(np.array_equal(a[2], b[2]) for a, b in zip(merged, expected))
+    # The order the shard files are given in does not matter.
+    reordered, _, _ = shards.merge_shards(paths[::-1])
+    assert [(key, location) for key, location, _ in reordered] == [(key, location) for key, location, _ in merged]
+
+def test_merge_rejects_incomplete_or_mixed_sets(tmp_path, faces):
+    paths = [write_shard(tmp_path / f"shard_{index}.npz", index, 3, KEYS, faces) for index in range(3)]
+    other_split = write_shard(tmp_path / "other_split.npz", 1, 4, KEYS, faces)
+    accurate = write_shard(tmp_path / "accurate.npz", 2, 3, KEYS, faces, preset='accurate')
+    for shard_paths in ([], paths[:2], paths + [paths[0]], [paths[0], other_split, paths[2]],
+                        [paths[0], paths[1], accurate]):
+        with pytest.raises(ValueError):
+            shards.merge_shards(shard_paths)
+
+def test_image_keys_are_relative_to_the_event(tmp_path):
+    paths = [tmp_path / "event" / "day1" / "a.jpg", tmp_path / "event" / "b.jpg"]
+    assert shards.image_keys(paths, tmp_path / "event") == ["day1/a.jpg", "b.jpg"]
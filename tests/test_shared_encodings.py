@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+import core
+from shared_encodings import SharedEncodingMatrix, SharedEncodingReader, _attach
+
+ROWS = 100_000
+
+def numbered_rows(start, stop, dimensions=4):
+    """Rows whose every value is the row's own index, so a torn or misplaced row shows."""
+    return np.repeat(np.arange(start, stop, dtype=np.float64)[:, None], dimensions, axis=1)
+
+def read_while_appended(descriptor, total, attached, snapshots):
+    """Runs in a reader process: takes snapshots until every row is published, checking each one."""
+    reader = SharedEncodingReader(descriptor)
+    attached.set()
+    last_version = seen = 0
+    while seen < total:
+        version, rows = reader.snapshot()
+        if version < last_version or not np.array_equal(rows[seen:], numbered_rows(seen, len(rows))):
+            raise SystemExit(1)
+        if len(rows) > seen:
+            snapshots.value += 1
+        last_version, seen = version, len(rows)
+    reader.close()
+
+def test_snapshots_survive_growth():
+    with SharedEncodingMatrix(numbered_rows(0, 3), capacity=4, dimensions=4) as matrix:
+        reader = SharedEncodingReader(matrix.descriptor)
+        version, before = reader.snapshot()
+        assert (version, len(before)) == (matrix.version, 3)
+        matrix.append(numbered_rows(3, 20))
+        version, after = reader.snapshot()
+        assert version == matrix.version and np.array_equal(after, numbered_rows(0, 20))
+        # The rows moved to a larger block, but the earlier snapshot still reads the old one.
+        assert np.array_equal(before, numbered_rows(0, 3))
+        assert not after.flags.writeable
+        reader.close()
+
+def test_reader_never_sees_half_written_rows():
+    with SharedEncodingMatrix(capacity=8, dimensions=4) as matrix:
+        attached, snapshots = core._worker_context.Event(), core._worker_context.Value('i', 0)
+        reader = core._worker_context.Process(target=read_while_appended,
+                                              args=(matrix.descriptor, ROWS, attached, snapshots))
+        reader.start()
+        assert attached.wait(30)
+        for start in range(0, ROWS, 7):
+            matrix.append(numbered_rows(start, min(start + 7, ROWS)))
+        reader.join(60)
+        assert reader.exitcode == 0
+        # The reader saw the rows arrive over many snapshots, not all at once.
+        assert snapshots.value > 1
+
+def test_neighbours_follow_appended_rows(rng):
+    encodings = rng.normal(size=(50, 128))
+    with SharedEncodingMatrix(encodings[:30]) as matrix:
+        reader = SharedEncodingReader(matrix.descriptor)
+        probe = encodings[40] + 0.01
+        rows, close, _ = reader.neighbours(probe, 0.5)
+        assert rows == 30 and len(close) == 0
+        matrix.append(encodings[30:])
+        rows, close, distances = reader.neighbours(probe, 0.5)
+        assert rows == 50 and list(close) == [40]
+        assert distances[0] == pytest.approx(np.linalg.norm(probe - encodings[40]))
+        reader.close()
+
+def test_close_unlinks_every_block():
+    matrix = SharedEncodingMatrix(capacity=2, dimensions=4)
+    matrix.append(numbered_rows(0, 10))
+    names = [matrix.descriptor] + [block.name for block in matrix._blocks]
+    assert len(names) == 3
+    reader = SharedEncodingReader(matrix.descriptor)
+    reader.snapshot()
+    # Closing a reader leaves the matrix to its owner.
+    reader.close()
+    matrix.append(numbered_rows(10, 11))
+    matrix.close()
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            _attach(name)
@@ -0,0 +1,28 @@
+import pytest
+
+from core import _stratified_sample_size, stratified_order
+
+@pytest.mark.parametrize('count', [0, 1, 2, 3, 9, 10, 11, 100, 1001])
+@pytest.mark.parametrize('fraction', [0.0, 0.05, 0.1, 0.3, 0.5, 1.0, 2.0])
+def test_every_image_comes_once(count, fraction):
+    images = [f"IMG_{n:04d}.jpg" for n in range(count)]
+    ordered = stratified_order(images, fraction)
+    assert sorted(ordered) == images
+    sample_size = _stratified_sample_size(count, fraction)
+    sample, rest = ordered[:sample_size], ordered[sample_size:]
+    # Both the sample and the rest keep the event's order.
+    assert sample == sorted(sample) and rest == sorted(rest)
+
+@pytest.mark.parametrize('count, fraction', [(100, 0.1), (1001, 0.05), (37, 0.25), (10, 0.5)])
+def test_sample_is_spread_over_the_event(count, fraction):
+    images = list(range(count))
+    step = round(1 / fraction)
+    sample = stratified_order(images, fraction)[:_stratified_sample_size(count, fraction)]
+    # One image from the middle of every stretch of `step` images, so no part of the event is left out.
+    assert sample == list(range(step // 2, count, step))
+    assert sample[0] < step and count - sample[-1] <= step
+
+def test_no_sample_keeps_the_order():
+    images = [f"IMG_{n}.jpg" for n in range(10)]
+    assert stratified_order(images, 0.0) == images
+    assert _stratified_sample_size(10, 0.0) == 0
@@ -0,0 +1,18 @@
+import core
+
+def test_sweep_trash_only_takes_facefolio_trash(tmp_path):
+    ours = tmp_path / f"{core.TRASH_PREFIX}0123"
+    (ours / "output").mkdir(parents=True)
+    foreign = tmp_path / ".trash-0123"
+    foreign.mkdir()
+    core.sweep_trash(tmp_path).join()
+    assert not ours.exists()
+    assert foreign.exists()
+    assert core.sweep_trash(tmp_path) is None
+
+def test_discarded_workspace_is_swept_by_the_next_job(tmp_path):
+    job = core.JobContext.create(tmp_path)
+    core.setup_directories(job)
+    (job.output_dir / "photo.jpg").write_bytes(b"jpeg")
+    core.discard_job(job).join()
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,58 @@
+import zipfile
+
+import pytest
+
+import zip_append
+from zip_append import append_entries
+
+@pytest.fixture
+def folder(tmp_path):
+    """A folder of a few files and the stored zip of it."""
+    folder = tmp_path / "folder"
+    (folder / "a").mkdir(parents=True)
+    for n in range(4):
+        (folder / "a" / f"{n}.jpg").write_bytes(bytes([n]) * 1000)
+    zip_path = tmp_path / "folder.zip"
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_STORED) as zip_file:
+        for path in sorted(folder.rglob('*')):
+            zip_file.write(path, path.relative_to(folder))
+    return folder, zip_path
+
+def contents(zip_path):
+    with zipfile.ZipFile(zip_path) as zip_file:
+        assert zip_file.testzip() is None
+        return {info.filename: zip_file.read(info) for info in zip_file.infolist()}
+
+def test_entries_are_dropped_and_appended(folder):
+    folder, zip_path = folder
+    (folder / "b").mkdir()
+    (folder / "b" / "ü.jpg").write_bytes(b"new photo")
+    expected = contents(zip_path)
+    del expected["a/1.jpg"]
+    expected.update({"b/": b"", "b/ü.jpg": b"new photo", "a/2.jpg": b"changed"})
+    (folder / "a" / "2.jpg").write_bytes(b"changed")
+    size = zip_path.stat().st_size
+
+    assert append_entries(zip_path, {"a/1.jpg"}, [("b/", folder / "b"), ("b/ü.jpg", folder / "b" / "ü.jpg"),
+                                                  ("a/2.jpg", folder / "a" / "2.jpg")])
+    assert contents(zip_path) == expected
+    # The old entries stay where they were; only the new ones and the directory were added.
+    assert zip_path.stat().st_size < size + 300
+
+def test_zip64_records_are_written_past_the_limits(folder, monkeypatch):
+    folder, zip_path = folder
+    monkeypatch.setattr(zip_append, '_ZIP64_LIMIT', 500)
+    monkeypatch.setattr(zip_append, '_ZIP64_ENTRY_LIMIT', 3)
+    (folder / "a" / "4.jpg").write_bytes(b"x" * 800)
+    expected = {**contents(zip_path), "a/4.jpg": b"x" * 800}
+    assert append_entries(zip_path, set(), [("a/4.jpg", folder / "a" / "4.jpg")])
+    assert b'PK\x06\x06' in zip_path.read_bytes()
+    assert contents(zip_path) == expected
+
+def test_declines_once_dead_bytes_pile_up(folder):
+    folder, zip_path = folder
+    before = zip_path.read_bytes()
+    assert not append_entries(zip_path, {"a/0.jpg", "a/1.jpg", "a/2.jpg"}, [])
+    assert zip_path.read_bytes() == before
+    assert append_entries(zip_path, {"a/0.jpg"}, [])
+    assert set(contents(zip_path)) == {"a/", "a/1.jpg", "a/2.jpg", "a/3.jpg"}